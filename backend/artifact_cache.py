@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Cached pipeline stage outputs (set TALKTAGGER_PIPELINE_CACHE_DIR="" to disable)
+PIPELINE_CACHE_DIR = os.environ.get("TALKTAGGER_PIPELINE_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "pipeline"))
+# Artifacts kept per stage; beyond this the least recently used are evicted
+PIPELINE_CACHE_MAX_ENTRIES = int(os.environ.get("TALKTAGGER_PIPELINE_CACHE_MAX_ENTRIES", "20"))
+
+
+def content_digest(path: str) -> Optional[str]:
+    """SHA-256 of a file's bytes, or of every file under a directory (names and bytes, in sorted order); None if missing."""
+    if os.path.isfile(path):
+        files = [(os.path.basename(path), path)]
+    elif os.path.isdir(path):
+        files = sorted((os.path.relpath(os.path.join(folder, name), path), os.path.join(folder, name))
+                       for folder, _, names in os.walk(path) for name in names)
+    else:
+        return None
+    digest = hashlib.sha256()
+    for name, file_path in files:
+        digest.update(f"{name}\x1f".encode("utf-8"))
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of pipeline stage outputs.
+
+    The key of an artifact is the SHA-256 of the stage name, the digests of its input files
+    and its config, so the same inputs always map to the same entry. An entry is a directory
+    `<stage>/<key>/` holding a copy of each output file and a manifest.json with their
+    digests; it is only valid if every file is present and still matches its digest. Entries
+    are written to a temporary directory and renamed into place, so a crashed run never
+    leaves a partial entry. Beyond `max_entries` per stage, the least recently used entries
+    (manifest mtime, touched on every hit) are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = PIPELINE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(stage: str, input_digests: Dict[str, Optional[str]], config: Dict) -> str:
+        request = {"stage": stage, "inputs": input_digests, "config": config}
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _entry(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, stage, key)
+
+    def restore(self, stage: str, key: str, outputs: List[str]) -> bool:
+        """Copy a valid cached artifact to the `outputs` paths; False (nothing copied) if there is none."""
+        entry = self._entry(stage, key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return False
+        files = manifest.get("files", {})
+        if sorted(files) != sorted(outputs) or any(
+                content_digest(os.path.join(entry, stored["name"])) != stored["digest"] for stored in files.values()):
+            print(f"[WARNING] Discarding invalid {stage} artifact: {entry}")
+            shutil.rmtree(entry, ignore_errors=True)
+            self.misses += 1
+            return False
+        for output, stored in files.items():
+            if os.path.dirname(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            shutil.copyfile(os.path.join(entry, stored["name"]), output)
+        os.utime(manifest_path)
+        self.hits += 1
+        return True
+
+    def store(self, stage: str, key: str, outputs: List[str]) -> bool:
+        """Save copies of the `outputs` files as the stage's artifact for `key` (False if one is missing)."""
+        missing = [output for output in outputs if not os.path.isfile(output)]
+        if missing:
+            print(f"[WARNING] Not caching {stage}: missing output {', '.join(missing)}")
+            return False
+        stage_dir = os.path.join(self.cache_dir, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=stage_dir, prefix=".tmp-")
+        files = {}
+        for i, output in enumerate(outputs):
+            name = f"{i}-{os.path.basename(output)}"
+            shutil.copyfile(output, os.path.join(tmp_dir, name))
+            files[output] = {"name": name, "digest": content_digest(os.path.join(tmp_dir, name))}
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump({"stage": stage, "key": key, "created": time.time(), "files": files}, f, indent=2)
+        entry = self._entry(stage, key)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_dir, entry)
+        self._evict(stage_dir)
+        return True
+
+    def _evict(self, stage_dir: str):
+        entries = []
+        for name in os.listdir(stage_dir):
+            manifest_path = os.path.join(stage_dir, name, "manifest.json")
+            if not name.startswith(".") and os.path.exists(manifest_path):
+                entries.append((os.path.getmtime(manifest_path), name))
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            shutil.rmtree(os.path.join(stage_dir, name), ignore_errors=True)
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def open_artifact_cache() -> Optional[ArtifactCache]:
+    """The configured pipeline artifact cache, or None if disabled."""
+    return ArtifactCache(PIPELINE_CACHE_DIR) if PIPELINE_CACHE_DIR else None
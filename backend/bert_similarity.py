@@ -1,18 +1,527 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import re
+import json
+import heapq
+import hashlib
+import threading
+import contextlib
 import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
-# Load a pre-trained sentence transformer model (do this once)
-model = SentenceTransformer('all-MiniLM-L6-v2')
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Name or local path of the sentence transformer model
+MODEL_NAME = os.environ.get("TALKTAGGER_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+MODEL_SLUG = re.sub(r"\W+", "_", MODEL_NAME.strip("/\\")).strip("_")
+# Embedding width of known models, so an empty batch does not load the model to find it
+MODEL_DIMENSIONS = {"all-MiniLM-L6-v2": 384, "sentence-transformers/all-MiniLM-L6-v2": 384}
+
+# Embedding backend: "torch" (SentenceTransformer) or "onnx" (int8 ONNX Runtime on CPU,
+# exported with `python -m backend.onnx_embedder export`)
+EMBEDDING_BACKEND = os.environ.get("TALKTAGGER_EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.environ.get(
+    "TALKTAGGER_ONNX_MODEL_DIR",
+    os.path.join(BACKEND_DIR, "cache", "onnx", MODEL_SLUG)
+)
+# Max allowed |bert_similarity(onnx) - bert_similarity(torch)| in percentage points,
+# enforced by benchmarks/bench_onnx_backend.py. Provisional: not yet measured on the
+# real all-MiniLM-L6-v2 int8 export (see the README's ONNX section)
+ONNX_SIMILARITY_TOLERANCE = 2.0
+
+# Default number of texts per forward pass when embedding in bulk
+DEFAULT_BATCH_SIZE = 32
+
+# Sampled profile centroids (estimate_profile_centroid): first sample size and the
+# relative centroid change below which sampling stops
+CENTROID_INITIAL_SAMPLE = 512
+CENTROID_TOLERANCE = 0.01
+
+# On-disk embedding cache location (set TALKTAGGER_EMBEDDING_CACHE_DIR="" to disable)
+EMBEDDING_CACHE_DIR = os.environ.get(
+    "TALKTAGGER_EMBEDDING_CACHE_DIR",
+    os.path.join(BACKEND_DIR, "cache", "embeddings")
+)
+EMBEDDING_CACHE_DTYPE = os.environ.get("TALKTAGGER_EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get("TALKTAGGER_EMBEDDING_CACHE_MAX_ROWS", 500_000))
+
+# The sentence transformer model and the embedding cache are loaded on first use,
+# so importing this module (and the selector/generator) stays cheap
+_model = None
+_embedding_cache = None
+_load_lock = threading.Lock()
+
+# Counters for the current process, see embedding_stats()
+_stats = {"forward_passes": 0, "encoded_texts": 0, "cache_hits": 0}
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding store keyed by message hash.
+    Embeddings live in a memory-mapped (rows, dim) matrix; index.json maps each
+    message hash to its row. When `max_rows` is reached the least recently used
+    rows are evicted and reused. Hits are kept in `touched` and saved to index.json
+    with the next write (or save_usage()), so recency survives restarts.
+
+    A `read_only` cache (used by worker processes) never writes to disk: new
+    embeddings are kept in `pending`, and hits in `touched`, for the owning process
+    to store.
+
+    Several processes can share the files (the game server and its pipeline worker both
+    embed messages): every read and write holds a file lock (shared for reads, exclusive for
+    writes) and first re-reads index.json if another process has written since (each write
+    leaves a new version token in the lock file), so a writer always extends the latest
+    index instead of overwriting it with its own stale copy.
+    """
+
+    def __init__(self, cache_dir: str, dtype: str = "float16", max_rows: int = 500_000,
+                 read_only: bool = False):
+        self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype)
+        self.max_rows = max_rows
+        self.read_only = read_only
+        self.pending = {}  # read-only mode: message hash -> new float32 embedding
+        self.touched = set()  # message hashes hit since the last write
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.matrix_path = os.path.join(cache_dir, "embeddings.bin")
+        self.lock_path = os.path.join(cache_dir, "cache.lock")
+        self.entries = {}  # message hash -> [row, last used tick]
+        self.next_row = 0  # first row never handed out (rows below it are in use or were evicted and reused)
+        self.tick = 0
+        self.dim = None
+        self.capacity = 0
+        self.matrix = None
+        self._version = None  # lock file token of the write this view was loaded after
+        self._lock = threading.RLock()
+        with self._file_lock(exclusive=False) as lock_file:
+            self._refresh(lock_file)
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock the cache files against other processes and yield the lock file (None for a cache not written yet)."""
+        if not os.path.isdir(self.cache_dir):
+            if not exclusive:
+                yield None
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _refresh(self, lock_file):
+        """Re-read the index if another process has written it since this view was loaded."""
+        version = b""
+        if lock_file is not None:
+            lock_file.seek(0)
+            version = lock_file.read()
+        if version != self._version:
+            self._load()
+            self._version = version
+
+    def _load(self):
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            if self.entries:  # the files were deleted: start over
+                self.entries, self.next_row, self.capacity, self.matrix = {}, 0, 0, None
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Ignoring unreadable embedding cache index: {e}")
+            return
+        if index.get("dtype") != self.dtype.name:
+            return  # written with another dtype, start over
+        self.dim = index["dim"]
+        self.capacity = index["capacity"]
+        self.tick = index["tick"]
+        self.entries = index["entries"]
+        self.next_row = index.get("next_row", max((row for row, _ in self.entries.values()), default=-1) + 1)
+        if self.matrix is not None:
+            del self.matrix
+        self.matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode="r" if self.read_only else "r+",
+                                shape=(self.capacity, self.dim))
+
+    def _grow(self, needed_rows: int):
+        new_capacity = min(self.max_rows, max(1024, self.capacity * 2, needed_rows))
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * self.dtype.itemsize)
+        self.capacity = new_capacity
+        self.matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode="r+",
+                                shape=(self.capacity, self.dim))
+
+    def _allocate_rows(self, count: int) -> list:
+        """Return `count` free row numbers, growing the file or evicting LRU entries."""
+        free_rows = list(range(self.next_row, min(self.next_row + count, self.max_rows)))
+        if free_rows and free_rows[-1] >= self.capacity:
+            self._grow(free_rows[-1] + 1)
+        self.next_row += len(free_rows)
+        shortfall = count - len(free_rows)
+        if shortfall > 0:
+            evicted = heapq.nsmallest(shortfall, self.entries.items(), key=lambda item: item[1][1])
+            for key, (row, _) in evicted:
+                del self.entries[key]
+                free_rows.append(row)
+        return free_rows
+
+    def get_many(self, keys: list) -> dict:
+        """Return {key: float32 embedding} for the keys present in the cache."""
+        with self._lock, self._file_lock(exclusive=False) as lock_file:
+            self._refresh(lock_file)
+            self.tick += 1
+            found = {}
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    entry[1] = self.tick
+                    self.touched.add(key)
+                    found[key] = np.asarray(self.matrix[entry[0]], dtype=np.float32)
+                elif key in self.pending:
+                    found[key] = self.pending[key]
+            return found
+
+    def put_many(self, keys: list, embeddings: np.ndarray):
+        if not keys:
+            return
+        if self.read_only:
+            self.pending.update(zip(keys, np.asarray(embeddings, dtype=np.float32)))
+            return
+        with self._lock, self._file_lock(exclusive=True) as lock_file:
+            self._refresh(lock_file)  # extend what other processes wrote, not this view's stale copy
+            self._put_many(keys, embeddings)
+            self._write_version(lock_file)
+
+    def save_usage(self):
+        """Save the recency of the entries hit since the last write (a no-op if none, or read-only)."""
+        if self.read_only or not self.touched:
+            return
+        with self._lock, self._file_lock(exclusive=True) as lock_file:
+            self._refresh(lock_file)
+            self.tick += 1
+            self._apply_touched()
+            self.flush()
+            self._write_version(lock_file)
+
+    def _apply_touched(self):
+        # Hits since the last write count as uses at the current tick; the in-memory ticks
+        # set by get_many are lost whenever another process's write is reloaded
+        for key in self.touched:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[1] = self.tick
+        self.touched.clear()
+
+    def _write_version(self, lock_file):
+        self._version = os.urandom(8).hex().encode("ascii")
+        lock_file.truncate(0)
+        lock_file.write(self._version)
+        lock_file.flush()
+
+    def _put_many(self, keys: list, embeddings: np.ndarray):
+        # One row per key: the last embedding of a key repeated in the batch wins (worker
+        # processes can return the same message), and known keys are overwritten in place
+        latest = dict(zip(keys, range(len(keys))))
+        keys = list(latest)[-self.max_rows:]
+        embeddings = np.asarray(embeddings)[[latest[key] for key in keys]]
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        self.tick += 1
+        self._apply_touched()  # before eviction picks the least recently used rows
+        new_keys = []
+        for key, embedding in zip(keys, embeddings):
+            entry = self.entries.get(key)
+            if entry is None:
+                new_keys.append((key, embedding))
+            else:
+                self.matrix[entry[0]] = embedding
+                entry[1] = self.tick
+        rows = self._allocate_rows(len(new_keys))
+        for (key, embedding), row in zip(new_keys, rows):
+            self.matrix[row] = embedding
+            self.entries[key] = [row, self.tick]
+        self.flush()
+
+    def flush(self):
+        if self.matrix is None:
+            return
+        self.matrix.flush()
+        index = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "capacity": self.capacity,
+            "tick": self.tick,
+            "next_row": self.next_row,
+            "entries": self.entries,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def load_model(backend: str = None):
+    """Build a new embedding model for `backend` (defaults to EMBEDDING_BACKEND)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(MODEL_NAME)
+    elif backend == "onnx":
+        from backend.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(ONNX_MODEL_DIR)
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+def get_model():
+    """Return the shared embedding model, loading it on first call (thread-safe)."""
+    global _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+def _open_embedding_cache(read_only: bool = False):
+    # Backends produce slightly different vectors, so each gets its own cache
+    cache_name = MODEL_SLUG if EMBEDDING_BACKEND == "torch" else f"{MODEL_SLUG}_{EMBEDDING_BACKEND}"
+    return EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, cache_name),
+                          EMBEDDING_CACHE_DTYPE, EMBEDDING_CACHE_MAX_ROWS, read_only=read_only)
+
+def get_embedding_cache():
+    """Return the shared EmbeddingCache, or None if caching is disabled."""
+    global _embedding_cache
+    if _embedding_cache is None and EMBEDDING_CACHE_DIR:
+        with _load_lock:
+            if _embedding_cache is None:
+                _embedding_cache = _open_embedding_cache()
+    return _embedding_cache
+
+def use_read_only_cache():
+    """
+    Switch this process to a read-only view of the embedding cache. For worker processes:
+    they read cached embeddings but hand new ones back (drain_new_embeddings) to the
+    parent, which is the only process writing the cache files.
+    """
+    global _embedding_cache
+    if EMBEDDING_CACHE_DIR:
+        with _load_lock:
+            _embedding_cache = _open_embedding_cache(read_only=True)
+
+def drain_new_embeddings():
+    """
+    Return and forget (keys, float16 embeddings, keys hit in the cache) of a read-only
+    cache process: the embeddings it computed and the cached ones it used.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return [], None, []
+    used_keys = list(cache.touched)
+    cache.touched.clear()
+    if not cache.pending:
+        return [], None, used_keys
+    keys = list(cache.pending)
+    embeddings = np.stack([cache.pending[key] for key in keys]).astype(np.float16)
+    cache.pending.clear()
+    return keys, embeddings, used_keys
+
+def store_embeddings(keys, embeddings, used_keys=()):
+    """
+    Add embeddings computed elsewhere (see drain_new_embeddings) to this process's cache,
+    and count `used_keys` as hits, saved with the next write.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return
+    cache.touched.update(used_keys)
+    if keys:
+        cache.put_many(list(keys), embeddings)
+
+def save_embedding_usage():
+    """Save the recency of cache hits not yet written (see EmbeddingCache.save_usage)."""
+    if _embedding_cache is not None:
+        _embedding_cache.save_usage()
+
+def warm_up():
+    """Load the model and run one forward pass so the first real request is not slow."""
+    get_model().encode(["warm up"], show_progress_bar=False)
+    get_embedding_cache()
+
+def cosine_similarity(a, b):
+    """Pairwise cosine similarity between the rows of `a` and `b` (numpy stand-in for sklearn's)."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a @ b.T
+
+def embedding_dimension():
+    """Embedding width, from the loaded model, the cache header or MODEL_DIMENSIONS; loads the model only if none has it."""
+    if _model is not None:
+        return _model.get_sentence_embedding_dimension()
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is not None and embedding_cache.dim:
+        return embedding_cache.dim
+    if MODEL_NAME in MODEL_DIMENSIONS:
+        return MODEL_DIMENSIONS[MODEL_NAME]
+    return get_model().get_sentence_embedding_dimension()
+
+def _encode_uncached(texts, batch_size):
+    _stats["forward_passes"] += -(-len(texts) // batch_size)
+    _stats["encoded_texts"] += len(texts)
+    return get_model().encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
 
 def get_embedding(text):
-    return model.encode([text])[0]
+    return encode_many([text])[0]
+
+def encode_many(texts, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Embed a list of texts in batches of `batch_size`. Returns an (n, dim) array.
+    Texts already in the embedding cache are not re-encoded.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, embedding_dimension()), dtype=np.float32)
+    embedding_cache = get_embedding_cache()
+    if embedding_cache is None:
+        return _encode_uncached(texts, batch_size)
+
+    keys = [EmbeddingCache.key(text) for text in texts]
+    found = embedding_cache.get_many(keys)
+    _stats["cache_hits"] += sum(1 for key in keys if key in found)
+
+    missing = {}  # key -> text, deduplicated
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        new_embeddings = _encode_uncached(list(missing.values()), batch_size)
+        embedding_cache.put_many(list(missing.keys()), new_embeddings)
+        found.update(zip(missing.keys(), np.asarray(new_embeddings, dtype=np.float32)))
+
+    return np.stack([found[key] for key in keys])
+
+def embedding_stats():
+    """Forward passes, encoded texts and cache hits since start-up (or the last reset)."""
+    return dict(_stats)
+
+def reset_embedding_stats():
+    for key in _stats:
+        _stats[key] = 0
+
+def merge_embedding_stats(stats):
+    """Add counters reported by another process (e.g. a selection worker)."""
+    for key, value in stats.items():
+        _stats[key] = _stats.get(key, 0) + value
 
 def compute_similarity(text1, text2):
-    emb1 = get_embedding(text1)
-    emb2 = get_embedding(text2)
+    emb1, emb2 = encode_many([text1, text2])
     return cosine_similarity([emb1], [emb2])[0][0]
 
-def average_profile_embedding(messages):
-    embeddings = [get_embedding(msg) for msg in messages]
+def average_profile_embedding_batched(messages, batch_size=DEFAULT_BATCH_SIZE):
+    """Mean embedding of `messages`, computed with batched forward passes."""
+    embeddings = encode_many(messages, batch_size)
     return np.mean(embeddings, axis=0)
+
+def average_profile_embedding(messages):
+    return average_profile_embedding_batched(messages)
+
+def _stratified_order(n, strata, rng):
+    """
+    Order 0..n-1 so every prefix is a proportional stratified random sample.
+    Strata are contiguous blocks of the (chronological) history.
+    """
+    stratum = np.arange(n) * strata // n
+    keys = np.empty(n)
+    for s in range(strata):
+        members = np.flatnonzero(stratum == s)
+        ranks = rng.permutation(len(members))
+        keys[members] = (ranks + rng.random(len(members))) / len(members)
+    return np.argsort(keys, kind="stable")
+
+def estimate_profile_centroid(messages, tolerance=CENTROID_TOLERANCE, initial_sample=CENTROID_INITIAL_SAMPLE,
+                              growth=2.0, strata=10, seed=0, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Estimate the mean embedding of `messages` from a stratified random sample.
+    The sample grows geometrically (initial_sample, x growth, ...) and stops once
+    the centroid moves by less than `tolerance` (relative L2 change) between steps.
+    Histories of at most 2 * initial_sample messages are averaged in full.
+
+    Returns (centroid, sample_size).
+    """
+    n = len(messages)
+    if n <= 2 * initial_sample:
+        return average_profile_embedding_batched(messages, batch_size), n
+
+    order = _stratified_order(n, strata, np.random.default_rng(seed))
+    total = None
+    centroid = None
+    done = 0
+    target = initial_sample
+    while done < n:
+        batch = [messages[i] for i in order[done:target]]
+        batch_sum = encode_many(batch, batch_size).sum(axis=0, dtype=np.float64)
+        total = batch_sum if total is None else total + batch_sum
+        done = target
+        new_centroid = total / done
+        if centroid is not None:
+            change = np.linalg.norm(new_centroid - centroid) / max(np.linalg.norm(new_centroid), 1e-12)
+            if change < tolerance:
+                return new_centroid.astype(np.float32), done
+        centroid = new_centroid
+        target = min(n, int(target * growth))
+    return centroid.astype(np.float32), done
+
+def mmr_select(embeddings, relevance, k, diversity_weight=0.3):
+    """
+    Greedy maximal marginal relevance over candidate embeddings.
+    Each step picks argmax((1 - w) * relevance - w * max cosine to already picked rows),
+    keeping the running max-similarity vector so each step is one matrix-vector product.
+    `relevance` should be scaled to [0, 1]. Returns the picked row indices in pick order.
+    """
+    n = len(embeddings)
+    if n == 0 or k <= 0:
+        return []
+    unit = np.asarray(embeddings, dtype=np.float32)
+    unit = unit / np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-12)
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    max_sim = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picks = []
+    for _ in range(min(k, n)):
+        mmr = (1 - diversity_weight) * relevance - diversity_weight * max_sim
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        picks.append(best)
+        available[best] = False
+        np.maximum(max_sim, unit @ unit[best], out=max_sim)
+    return picks
+
+def profile_similarities(profile_emb, embeddings):
+    """BERT similarity (percentage, 1 decimal) of each embedding row to a profile embedding."""
+    if len(embeddings) == 0:
+        return []
+    sims = cosine_similarity([profile_emb], embeddings)[0] * 100
+    return [round(float(s), 1) for s in sims]
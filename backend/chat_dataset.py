@@ -0,0 +1,89 @@
+import os
+import csv
+import hashlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+
+class ChatDataset:
+    """
+    Parsed chat messages held in memory and shared by every pipeline stage.
+
+    Created once from the parser output and passed to profiling, message selection and
+    generation, so no stage re-reads the parsed CSV. Holds the content column, an author
+    index (author -> code, in order of first appearance) and the row indices of each
+    author's messages. The CSV is only written as a checkpoint (`to_csv`) and read back
+    with `from_csv` when a stage runs on its own.
+    """
+
+    def __init__(self, authors: Iterable[str], contents: Iterable[str]):
+        rows = [(str(a).strip(), str(c)) for a, c in zip(authors, contents)
+                if a is not None and c is not None and str(a).strip() and str(c).strip()]
+        self.author_index: Dict[str, int] = {}
+        codes = [self.author_index.setdefault(author, len(self.author_index)) for author, _ in rows]
+        self.authors: List[str] = list(self.author_index)
+        self.author_codes = np.asarray(codes, dtype=np.int32)
+        self.content = np.asarray([content for _, content in rows], dtype=object)
+        order = np.argsort(self.author_codes, kind="stable")
+        bounds = np.searchsorted(self.author_codes[order], np.arange(len(self.authors) + 1))
+        self.rows_by_author: Dict[str, np.ndarray] = {
+            author: order[bounds[code]:bounds[code + 1]] for author, code in self.author_index.items()
+        }
+        self.near_duplicates = None  # NearDuplicateIndex over `content`, set by the profiling stage
+        self.inverted_index = None   # InvertedIndex over each author's messages, set by the profiling stage
+        self.style_model = None      # NgramStyleModel of each author's messages, set by the profiling stage
+
+    @classmethod
+    def from_messages(cls, messages: List[Dict]) -> "ChatDataset":
+        """From parser output: a list of {"author", "content"} dicts."""
+        return cls((m.get("author") for m in messages), (m.get("content") for m in messages))
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "ChatDataset":
+        """From a parsed-chat CSV checkpoint (author, content columns)."""
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        # keep_default_na=False: a message reading "NA" or "null" is a message, not a missing value
+        df = pd.read_csv(csv_path, usecols=[0, 1], names=["author", "content"], header=0,
+                         dtype=str, keep_default_na=False)
+        return cls(df["author"], df["content"])
+
+    def to_csv(self, csv_path: str):
+        """Write the checkpoint CSV in the parsers' format."""
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["author", "content"])
+            writer.writerows(zip(self.author_list(), self.content))
+        print(f"[OK] Saved CSV: {csv_path}")
+
+    def __len__(self) -> int:
+        return len(self.content)
+
+    def author_list(self) -> List[str]:
+        """Author of every row."""
+        return [self.authors[code] for code in self.author_codes]
+
+    def messages_for(self, author: str) -> List[str]:
+        """All messages of `author`, in chat order (empty if unknown)."""
+        rows = self.rows_by_author.get(author)
+        return [] if rows is None else self.content[rows].tolist()
+
+    def message_count(self, author: str) -> int:
+        rows = self.rows_by_author.get(author)
+        return 0 if rows is None else len(rows)
+
+    def fingerprint(self) -> str:
+        """Content hash of the dataset (authors and messages in order), stable across runs."""
+        digest = hashlib.sha256()
+        for author, content in zip(self.author_list(), self.content):
+            digest.update(f"{author}\x1f{content}\x1e".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def to_frame(self, content_column: str = "content") -> pd.DataFrame:
+        return pd.DataFrame({"author": self.author_list(), content_column: self.content})
+
+
+def load_chat_dataset(csv_path: str, dataset: Optional[ChatDataset] = None) -> ChatDataset:
+    """The in-memory dataset if one was passed along, else the CSV checkpoint."""
+    return dataset if dataset is not None else ChatDataset.from_csv(csv_path)
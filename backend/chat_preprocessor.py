@@ -1,11 +1,31 @@
 import os
 import re
 import json
+import threading
 import pandas as pd
 from collections import Counter, defaultdict
 from typing import Dict, List
 import spacy
 from sklearn.feature_extraction.text import CountVectorizer
+from backend.chat_dataset import ChatDataset
+from backend.inverted_index import build_inverted_index
+from backend.ngram_generator import build_ngram_model
+from backend.near_duplicates import build_near_duplicate_index
+
+# The spaCy pipeline is loaded on first use and shared by every ChatPreprocessor of the
+# process (a warm pipeline worker loads it once for all uploads)
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Return the shared en_core_web_sm pipeline (parser and NER disabled), loading it on first call."""
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+    return _nlp
 
 
 class ChatPreprocessor:
@@ -15,7 +35,7 @@ class ChatPreprocessor:
     """
 
     def __init__(self):
-        self.nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+        self.nlp = get_nlp()
         self.emoji_pattern = re.compile(r":[a-z_]+:")
 
     def clean_token(self, token):
@@ -54,19 +74,14 @@ class ChatPreprocessor:
         return [{"phrase": p, "count": int(c)} for p, c in phrase_freq[:top_n]]
 
     def load_csv(self, filepath: str) -> pd.DataFrame:
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"CSV file not found: {filepath}")
-        df = pd.read_csv(filepath, usecols=[0, 1], names=["author", "cleaned_content"], header=0)
-        df.dropna(subset=["author", "cleaned_content"], inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        return df
-
-    def _build_user_profiles(self, df: pd.DataFrame) -> Dict[str, Dict]:
+        return ChatDataset.from_csv(filepath).to_frame("cleaned_content")
+
+    def _build_user_profiles(self, dataset: ChatDataset) -> Dict[str, Dict]:
         profiles = {}
         all_tokens = defaultdict(list)
 
-        for author in df["author"].unique():
-            user_msgs = df[df["author"] == author]["cleaned_content"].dropna().tolist()
+        for author in dataset.authors:
+            user_msgs = dataset.messages_for(author)
             if not user_msgs:
                 continue
             tokens = self.tokenize_user_messages(user_msgs)
@@ -80,8 +95,9 @@ class ChatPreprocessor:
         for user in all_usernames:
             tokens = all_tokens[user]
             vocab = Counter(tokens)
-            msg_count = len(df[df["author"] == user])
-            total_word_count = sum(len(msg.split()) for msg in df[df["author"] == user]["cleaned_content"])
+            msgs = pd.Series(dataset.messages_for(user))
+            msg_count = len(msgs)
+            total_word_count = sum(len(msg.split()) for msg in msgs)
             avg_msg_length = total_word_count / msg_count if msg_count else 0
             avg_word_length = sum(len(t) for t in tokens) / len(tokens) if tokens else 0
 
@@ -94,7 +110,6 @@ class ChatPreprocessor:
                 signature_scores.items(), key=lambda x: x[1], reverse=True
             )[:10]
 
-            msgs = df[df["author"] == user]["cleaned_content"]
             capitalized_starts = sum(1 for msg in msgs if msg.strip() and msg.strip()[0].isupper())
             lowercase_only = sum(1 for msg in msgs if msg.strip().islower())
             proper_punctuation = sum(1 for msg in msgs if msg.strip()[-1:] in [".", "!", "?"])
@@ -129,15 +144,38 @@ class ChatPreprocessor:
 
     def process_chat_csv(self, input_csv_path: str, output_json_path: str):
         print(f"Loading chat CSV from: {input_csv_path}")
-        df = self.load_csv(input_csv_path)
+        return self.process_chat_dataset(ChatDataset.from_csv(input_csv_path), output_json_path)
 
+    def process_chat_dataset(self, dataset: ChatDataset, output_json_path: str):
+        """Build and save user profiles from an in-memory ChatDataset (also builds its near-duplicate and word indexes and n-gram style models)."""
         print("Building user profiles...")
-        profiles = self._build_user_profiles(df)
+        profiles = self._build_user_profiles(dataset)
 
         print(f"Saving user profiles JSON to: {output_json_path}")
         os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
         with open(output_json_path, "w", encoding="utf-8") as f:
             json.dump(profiles, f, indent=2, ensure_ascii=False)
 
+        print("Indexing near-duplicate messages...")
+        dedup_index = build_near_duplicate_index(dataset.content)
+        dataset.near_duplicates = dedup_index
+        dedup_path = os.path.join(os.path.dirname(output_json_path), "near_duplicates.json")
+        dedup_index.save(dedup_path)
+        print(f"Found {len(dedup_index.clusters())} near-duplicate clusters, saved to: {dedup_path}")
+
+        print("Building inverted word index...")
+        inverted_index = build_inverted_index(dataset)
+        dataset.inverted_index = inverted_index
+        index_path = os.path.join(os.path.dirname(output_json_path), "inverted_index.json")
+        inverted_index.save(index_path)
+        print(f"Indexed {len(dataset)} messages ({inverted_index.size_bytes()} bytes of postings), saved to: {index_path}")
+
+        print("Training n-gram style models...")
+        style_model = build_ngram_model(dataset)
+        dataset.style_model = style_model
+        model_path = os.path.join(os.path.dirname(output_json_path), "ngram_models.json")
+        style_model.save(model_path)
+        print(f"Trained {len(style_model.authors())} n-gram style models, saved to: {model_path}")
+
         print(f"Done! Processed {len(profiles)} users.")
         return profiles
\ No newline at end of file
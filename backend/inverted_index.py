@@ -0,0 +1,164 @@
+import json
+import base64
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from backend.pattern_matcher import tokenize, compile_matcher
+
+
+def encode_postings(values: Iterable[int]) -> bytes:
+    """Varint-encode non-negative integers (7 bits per byte, high bit = more bytes follow)."""
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_postings(data: bytes) -> np.ndarray:
+    """Inverse of encode_postings, vectorized with numpy."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not len(raw):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 7 * (np.arange(len(raw)) - starts[group])
+    return np.add.reduceat((raw & 0x7F).astype(np.int64) << shifts, starts)
+
+
+class InvertedIndex:
+    """
+    Term -> message ids of each author, with compressed posting lists.
+
+    Message ids are positions in the author's message list (ChatDataset.messages_for order).
+    Two fields are indexed, matching how the scorer reads a message:
+
+      - "word": whitespace tokens of `message.lower().split()`, with per-message counts
+        (posting = varint(id delta), varint(count) pairs)
+      - "token": word tokens of `pattern_matcher.tokenize` (posting = varint id deltas),
+        used to find messages that can contain a signature phrase
+
+    Signature-match counts for a user then come from posting-list unions (words) and
+    intersections (phrases), touching only the messages that contain the terms.
+    """
+
+    def __init__(self):
+        self.message_counts: Dict[str, int] = {}
+        self.words: Dict[str, Dict[str, bytes]] = {}   # author -> word -> postings
+        self.tokens: Dict[str, Dict[str, bytes]] = {}  # author -> token -> postings
+
+    @classmethod
+    def build(cls, messages_by_author: Dict[str, List[str]]) -> "InvertedIndex":
+        index = cls()
+        for author, messages in messages_by_author.items():
+            word_postings, token_postings = {}, {}
+            for msg_id, msg in enumerate(messages):
+                for word, count in Counter(msg.lower().split()).items():
+                    word_postings.setdefault(word, []).append((msg_id, count))
+                for token in set(tokenize(msg)):
+                    token_postings.setdefault(token, []).append(msg_id)
+            index.message_counts[author] = len(messages)
+            index.words[author] = {
+                word: encode_postings(v for pair in cls._delta_pairs(postings) for v in pair)
+                for word, postings in word_postings.items()
+            }
+            index.tokens[author] = {
+                token: encode_postings(np.diff(ids, prepend=0).tolist())
+                for token, ids in token_postings.items()
+            }
+        return index
+
+    @staticmethod
+    def _delta_pairs(postings: List[Tuple[int, int]]):
+        previous = 0
+        for msg_id, count in postings:
+            yield msg_id - previous, count
+            previous = msg_id
+
+    def word_postings(self, author: str, word: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(message ids, occurrence counts) of a whitespace token in the author's messages."""
+        data = self.words.get(author, {}).get(word)
+        if data is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        values = decode_postings(data)
+        return np.cumsum(values[0::2]), values[1::2]
+
+    def token_postings(self, author: str, token: str) -> np.ndarray:
+        """Message ids of the author's messages containing a word token."""
+        data = self.tokens.get(author, {}).get(token)
+        return np.zeros(0, dtype=np.int64) if data is None else np.cumsum(decode_postings(data))
+
+    def signature_word_counts(self, author: str, words: Iterable[str]) -> Dict[int, int]:
+        """Message id -> occurrences of any signature word (union of the words' postings)."""
+        counts = Counter()
+        for word in set(words):
+            ids, occurrences = self.word_postings(author, word)
+            counts.update(dict(zip(ids.tolist(), occurrences.tolist())))
+        return dict(counts)
+
+    def signature_phrase_counts(self, author: str, phrases: Iterable[str],
+                                messages: List[str]) -> Dict[int, int]:
+        """
+        Message id -> number of distinct signature phrases it contains. Candidates are the
+        intersection of the phrase tokens' postings; only those are checked for adjacency.
+        """
+        counts = Counter()
+        for seq in {tuple(tokenize(p or "")) for p in phrases}:
+            if not seq:
+                continue
+            candidates = self.token_postings(author, seq[0])
+            for token in seq[1:]:
+                if not len(candidates):
+                    break
+                candidates = np.intersect1d(candidates, self.token_postings(author, token), assume_unique=True)
+            matcher = compile_matcher((" ".join(seq),))
+            counts.update(i for i in candidates.tolist() if len(seq) == 1 or matcher.search(messages[i]))
+        return dict(counts)
+
+    def signature_hits(self, author: str, messages: List[str], words: Iterable[str],
+                       phrases: Iterable[str]) -> Optional[Dict[str, Tuple[int, int]]]:
+        """
+        Stripped message text -> (signature word matches, signature phrase matches) for the
+        author's messages with at least one hit. None if `messages` is not the indexed list.
+        """
+        if self.message_counts.get(author) != len(messages):
+            return None
+        word_counts = self.signature_word_counts(author, words)
+        phrase_counts = self.signature_phrase_counts(author, phrases, messages)
+        return {
+            messages[i].strip(): (word_counts.get(i, 0), phrase_counts.get(i, 0))
+            for i in set(word_counts) | set(phrase_counts)
+        }
+
+    def size_bytes(self) -> int:
+        """Total size of the compressed posting lists."""
+        return sum(len(p) for field in (self.words, self.tokens) for terms in field.values() for p in terms.values())
+
+    def save(self, path: str):
+        def encode(field):
+            return {author: {term: base64.b64encode(p).decode("ascii") for term, p in terms.items()}
+                    for author, terms in field.items()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"message_counts": self.message_counts, "words": encode(self.words),
+                       "tokens": encode(self.tokens)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "InvertedIndex":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        def decode(field):
+            return {author: {term: base64.b64decode(p) for term, p in terms.items()}
+                    for author, terms in field.items()}
+        index = cls()
+        index.message_counts = data["message_counts"]
+        index.words = decode(data["words"])
+        index.tokens = decode(data["tokens"])
+        return index
+
+
+def build_inverted_index(dataset) -> InvertedIndex:
+    """Build an InvertedIndex over every author's messages of a ChatDataset."""
+    return InvertedIndex.build({author: dataset.messages_for(author) for author in dataset.authors})
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# On-disk LLM response cache (set TALKTAGGER_LLM_CACHE_DIR="" to disable)
+LLM_CACHE_DIR = os.environ.get("TALKTAGGER_LLM_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "llm"))
+LLM_CACHE_TTL = float(os.environ.get("TALKTAGGER_LLM_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("TALKTAGGER_LLM_CACHE_MAX_ENTRIES", "10000"))
+
+
+class ResponseCache:
+    """
+    Content-addressed store of LLM responses, one JSON file per request.
+
+    The key is the SHA-256 of the request (model, prompt, sampling parameters, seed), so the
+    same request always maps to the same file. Entries older than `ttl` seconds are ignored
+    and deleted. The number of entries is counted once when the cache is opened and tracked
+    on every write; when it goes over `max_entries`, the directory is listed again and the
+    least recently used entries (file mtime, touched on every hit) are evicted down to
+    `EVICT_TO` of the limit. Writes go through a temporary file and os.replace, so concurrent
+    requests never see a partial entry, and files removed by another process meanwhile
+    (eviction, TTL) are skipped.
+    """
+
+    # Fraction of max_entries left after an eviction, so the next one is many writes away
+    EVICT_TO = 0.9
+
+    def __init__(self, cache_dir: str, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = len(self._scan())
+
+    @staticmethod
+    def key(request: Dict) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, request: Dict) -> Optional[str]:
+        path = self._path(self.key(request))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        expired = entry is not None and time.time() - entry["created"] > self.ttl
+        if expired and self._remove(path):
+            with self._lock:
+                self.entries -= 1
+        with self._lock:
+            if entry is None or expired:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted by another process since it was read
+        return entry["response"]
+
+    def put(self, request: Dict, response: str):
+        path = self._path(self.key(request))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.time(), "request": request, "response": response}, f, ensure_ascii=False)
+        is_new = not os.path.exists(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.entries += is_new
+            if self.entries > self.max_entries:
+                self._evict()
+
+    def _scan(self) -> List[Tuple[float, str]]:
+        """(mtime, path) of every entry on disk; entries removed while listing are left out."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".json"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def _evict(self):
+        # Called with self._lock held; other processes may have added or removed entries
+        entries = sorted(self._scan())
+        keep = int(self.max_entries * self.EVICT_TO) if len(entries) > self.max_entries else len(entries)
+        for _, path in entries[:len(entries) - keep]:
+            self._remove(path)
+        self.entries = min(keep, len(entries))
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def open_response_cache() -> Optional[ResponseCache]:
+    """The configured response cache, or None if disabled."""
+    return ResponseCache(LLM_CACHE_DIR) if LLM_CACHE_DIR else None
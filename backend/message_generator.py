@@ -1,29 +1,226 @@
+import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
 import random
 import time
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 import importlib.util
 import sys
 import re
-from backend.bert_similarity import average_profile_embedding, get_embedding, cosine_similarity
+import numpy as np
+from backend.bert_similarity import encode_many, profile_similarities
+from backend.pattern_matcher import compile_matcher, name_part_matcher
+from backend.rate_limiter import TokenBucket, parse_retry_after
+from backend.llm_cache import ResponseCache, open_response_cache
+from backend.stream_parser import IncrementalBatchParser, SSEContentStream
+from backend.token_budget import PROMPT_TOKEN_BUDGET, SAMPLE_MESSAGE_MAX_TOKENS, TokenUsage, completion_budget, estimate_tokens, fit_sample_messages
+from backend.ngram_generator import NgramStyleModel, load_ngram_model
+from backend.synthetic_pool import SyntheticPool, PoolTopUpWorker, SYNTHETIC_POOL_TARGET, build_game_round
 
 API_KEY = "" # replace with your own mistral ai api key!
 
+# Concurrent generation: at most MISTRAL_MAX_CONCURRENCY requests in flight, started at no more
+# than MISTRAL_REQUESTS_PER_SECOND on average (shared token bucket, paused on 429 Retry-After)
+MISTRAL_API_URL = os.environ.get("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+MISTRAL_MAX_CONCURRENCY = int(os.environ.get("MISTRAL_MAX_CONCURRENCY", "8"))
+MISTRAL_REQUESTS_PER_SECOND = float(os.environ.get("MISTRAL_REQUESTS_PER_SECOND", "1.0"))
+# Users whose messages are generated in one API request (1 = one prompt per user)
+MISTRAL_USERS_PER_REQUEST = int(os.environ.get("MISTRAL_USERS_PER_REQUEST", "1"))
+# Synthetic message backend: "mistral" (API), "ngram" (offline per-user n-gram models trained
+# during preprocessing) or "auto" (mistral if an API key is set, otherwise ngram)
+GENERATION_BACKEND = os.environ.get("TALKTAGGER_GENERATION_BACKEND", "auto")
+# Chat completions model used by the mistral backend
+MISTRAL_MODEL = "mistral-small-2503"
+# Quality target for synthetic messages (opt-in): messages below these are dropped, and with
+# SYNTHETIC_MAX_CALLS > 1 only the shortfall is requested again, up to SYNTHETIC_MAX_CALLS
+# calls and SYNTHETIC_MAX_TOKENS tokens per user. The defaults keep every message, one call per user
+SYNTHETIC_MIN_SCORE = float(os.environ.get("TALKTAGGER_SYNTHETIC_MIN_SCORE", "0"))  # distinctiveness
+SYNTHETIC_MIN_SIMILARITY = float(os.environ.get("TALKTAGGER_SYNTHETIC_MIN_SIMILARITY", "0"))  # BERT, 0-100
+SYNTHETIC_MAX_CALLS = int(os.environ.get("TALKTAGGER_SYNTHETIC_MAX_CALLS", "1"))
+SYNTHETIC_MAX_TOKENS = int(os.environ.get("TALKTAGGER_SYNTHETIC_MAX_TOKENS", "4000"))
+# Stream completions (server-sent events) and embed each message as soon as its line is complete
+MISTRAL_STREAM = os.environ.get("MISTRAL_STREAM", "0") == "1"
+# Deterministic generation: with a seed, prompt topics and the API's random_seed are fixed,
+# so repeat runs send identical requests and are answered from the response cache
+GENERATION_SEED = os.environ.get("TALKTAGGER_GENERATION_SEED")
+# (connect, read) timeouts in seconds for each API request
+MISTRAL_TIMEOUT = (float(os.environ.get("MISTRAL_CONNECT_TIMEOUT", "5")),
+                   float(os.environ.get("MISTRAL_READ_TIMEOUT", "60")))
+
+
+class MistralClient:
+    """
+    HTTP client for the Mistral chat completions API, shared by all requests of a run.
+
+    One pooled keep-alive requests.Session (connections are set up once, not per user),
+    connect/read timeouts, a shared TokenBucket (429 Retry-After pauses every request),
+    exponential backoff with full jitter for 5xx responses and network errors, and
+    per-request latency metrics (see `metrics()`).
+    """
+    
+    def __init__(self, api_url: str, api_key: str, max_connections: int = 8,
+                 requests_per_second: float = 1.0, timeout=MISTRAL_TIMEOUT,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+        self._jitter = random.Random()  # separate from the module RNG that draws prompt topics
+        self._lock = threading.Lock()
+        self.latencies = []  # seconds per HTTP request (every attempt)
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0,
+                       "client_errors": 0, "network_errors": 0, "retries": 0}
+    
+    def _record(self, outcome: str, latency: float = None):
+        with self._lock:
+            self.counts[outcome] += 1
+            if latency is not None:
+                self.counts["requests"] += 1
+                self.latencies.append(latency)
+    
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+        return self._jitter.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+    
+    def _send(self, payload: Dict, max_retries: int, max_rate_limited: int,
+              stream: bool = False) -> Optional[requests.Response]:
+        """The first 200 response for the payload, or None once retries are used up (see post)."""
+        attempt = 0
+        rate_limited = 0
+        while attempt < max_retries:
+            if attempt or rate_limited:
+                self._record("retries")
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                self._record("network_errors", time.perf_counter() - start)
+                print(f"Request failed (attempt {attempt + 1}): {str(e)}")
+            else:
+                latency = time.perf_counter() - start  # to the response headers when streaming
+                if response.status_code == 200:
+                    self._record("ok", latency)
+                    return response
+                if stream:
+                    response.content  # read the error body so the connection goes back to the pool
+                
+                if response.status_code == 429:
+                    self._record("rate_limited", latency)
+                    rate_limited += 1
+                    if rate_limited > max_rate_limited:
+                        print(f"Rate limited {rate_limited} times, giving up")
+                        return None
+                    # Retry-After (or exponential backoff) holds back every concurrent request
+                    wait_time = parse_retry_after(response.headers.get("Retry-After"))
+                    if wait_time is None:
+                        wait_time = 2 ** min(rate_limited - 1, 5)
+                    print(f"Rate limited. Waiting {wait_time:g} seconds...")
+                    self.rate_limiter.pause(wait_time)
+                    continue
+                
+                print(f"API Error {response.status_code}: {response.text}")
+                if response.status_code < 500:
+                    self._record("client_errors", latency)
+                    return None
+                self._record("server_errors", latency)
+            
+            attempt += 1
+            if attempt < max_retries:
+                time.sleep(self.backoff(attempt - 1))
+        
+        return None
+    
+    def post(self, payload: Dict, max_retries: int = 3, max_rate_limited: int = 10) -> Optional[Dict]:
+        """
+        POST a completion request; returns the decoded JSON body, or None once retries are used up.
+        429 responses are retried after Retry-After (up to `max_rate_limited` times) without
+        using up `max_retries`; other 4xx responses are not retried.
+        """
+        response = self._send(payload, max_retries, max_rate_limited)
+        return response.json() if response is not None else None
+    
+    def stream(self, payload: Dict, max_retries: int = 3, max_rate_limited: int = 10) -> Optional[SSEContentStream]:
+        """
+        POST a streaming completion request (`"stream": true`); returns an iterable over the
+        text deltas of the server-sent-event stream (with the `finish_reason` of the completion
+        once iterated), or None once retries are used up. Retries happen before the first byte
+        of the body only; a stream that breaks off later raises requests.RequestException from
+        the iterator.
+        """
+        response = self._send({**payload, "stream": True}, max_retries, max_rate_limited, stream=True)
+        if response is None:
+            return None
+        response.encoding = "utf-8"
+        # chunk_size=None: hand over each chunk as it arrives instead of filling 512-byte blocks;
+        # the stream reads past [DONE] to the end of the body so the connection is reused
+        return SSEContentStream(response.iter_lines(chunk_size=None, decode_unicode=True))
+    
+    def metrics(self) -> Dict:
+        """Request counts and latency percentiles (seconds) so far."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            result = dict(self.counts)
+        if latencies:
+            result.update({
+                "latency_p50": round(latencies[len(latencies) // 2], 3),
+                "latency_p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                "latency_p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3),
+                "latency_max": round(latencies[-1], 3),
+                "latency_total": round(sum(latencies), 3),
+            })
+        return result
+    
+    def close(self):
+        self.session.close()
+
+
 class ImprovedMistralMessageGenerator:
     """
     Enhanced version that generates more balanced messages and calculates distinctiveness scores.
     """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, api_url: str = None, max_concurrency: int = None,
+                 requests_per_second: float = None, seed: int = None, use_response_cache: bool = True,
+                 users_per_request: int = None, stream: bool = None, backend: str = None,
+                 style_model: NgramStyleModel = None):
         self.api_key = api_key or API_KEY
-        self.api_url = "https://api.mistral.ai/v1/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        self.model_name = "mistral-small-2503"
+        self.api_url = api_url or MISTRAL_API_URL
+        self.max_concurrency = max(1, max_concurrency or MISTRAL_MAX_CONCURRENCY)
+        self.users_per_request = max(1, users_per_request or MISTRAL_USERS_PER_REQUEST)
+        self.stream = MISTRAL_STREAM if stream is None else stream
+        self.backend = backend or GENERATION_BACKEND
+        if self.backend == "auto":
+            self.backend = "mistral" if self.api_key else "ngram"
+        if self.backend not in ("mistral", "ngram"):
+            raise ValueError(f"Unknown generation backend: {self.backend}")
+        self.style_model = style_model  # required by the ngram backend
+        self.min_score = SYNTHETIC_MIN_SCORE
+        self.min_similarity = SYNTHETIC_MIN_SIMILARITY
+        self.max_calls_per_user = max(1, SYNTHETIC_MAX_CALLS)
+        self.max_tokens_per_user = SYNTHETIC_MAX_TOKENS
+        self.prompt_token_budget = PROMPT_TOKEN_BUDGET
+        self.sample_message_max_tokens = SAMPLE_MESSAGE_MAX_TOKENS
+        self.token_usage = TokenUsage()
+        self.client = MistralClient(self.api_url, self.api_key, max_connections=self.max_concurrency,
+                                    requests_per_second=requests_per_second or MISTRAL_REQUESTS_PER_SECOND)
+        self.model_name = MISTRAL_MODEL
         self.emoji_pattern = re.compile(r":[a-z_]+:")
+        self.seed = seed if seed is not None else (int(GENERATION_SEED) if GENERATION_SEED else None)
+        self.response_cache: Optional[ResponseCache] = open_response_cache() if use_response_cache else None
         
         # Topics for message generation variety  
         self.conversation_topics = [
@@ -47,7 +244,41 @@ class ImprovedMistralMessageGenerator:
                                    count: int = 5, topics: List[str] = None) -> str:
         """
         Create a more balanced prompt that doesn't make capitalization patterns too obvious.
+        Example messages are shortened or left out to keep it within `prompt_token_budget` tokens.
         """
+        signature_words, signature_phrases, avg_length, style_instructions = self.summarize_style(profile)
+        
+        # Create topic list for variety
+        topics_instruction = ""
+        if topics:
+            topics_instruction = f"Vary topics: {', '.join(topics)}"
+        
+        def render(examples: List[str]) -> str:
+            return f"""Generate {count} text messages in {user}'s style. Make them realistic and varied.
+
+WRITING PATTERNS FOR {user}:
+- Typical length: {avg_length} words
+- Key vocabulary: {', '.join(signature_words) if signature_words else 'varied'}
+- Common phrases: {', '.join(signature_phrases) if signature_phrases else 'none specific'}
+
+STYLE GUIDELINES:
+{chr(10).join(style_instructions)}
+
+EXAMPLE MESSAGES:
+{chr(10).join(f'"{msg}"' for msg in examples)}
+
+{topics_instruction}
+
+Create {count} different messages. Each should feel authentic but varied. Format as numbered list:
+1. [message]
+2. [message]
+etc."""
+
+        return render(fit_sample_messages(sample_messages, self.prompt_token_budget - estimate_tokens(render([])),
+                                          max_tokens_each=self.sample_message_max_tokens))
+    
+    def summarize_style(self, profile: Dict):
+        """Key vocabulary, phrases, typical length and balanced style instructions of a profile."""
         # Extract key characteristics
         signature_words = [item['word'] for item in profile.get('signature_words', [])[:5]]
         signature_phrases = [item['phrase'] for item in profile.get('signature_phrases', [])[:3]]
@@ -85,14 +316,22 @@ class ImprovedMistralMessageGenerator:
         if question_freq > 0.05:
             style_instructions.append("- Ask questions when natural")
         
-        # Create topic list for variety
-        topics_instruction = ""
-        if topics:
-            topics_instruction = f"Vary topics: {', '.join(topics)}"
-        
-        prompt = f"""Generate {count} text messages in {user}'s style. Make them realistic and varied.
-
-WRITING PATTERNS FOR {user}:
+        return signature_words, signature_phrases, avg_length, style_instructions
+    
+    def create_multi_user_prompt(self, requests_by_user: Dict[str, Dict], count: int = 5) -> str:
+        """
+        One prompt carrying several users' style sheets, asking for a JSON object keyed by user.
+        `requests_by_user` maps user -> {'profile', 'sample_messages', 'topics'}. Each person's
+        section is kept within `prompt_token_budget` tokens like create_balanced_user_prompt.
+        """
+        sections = []
+        for user, request in requests_by_user.items():
+            signature_words, signature_phrases, avg_length, style_instructions = self.summarize_style(request['profile'])
+            topics = request.get('topics')
+            
+            def render(examples: List[str]) -> str:
+                return f"""=== PERSON: {user} ===
+WRITING PATTERNS:
 - Typical length: {avg_length} words
 - Key vocabulary: {', '.join(signature_words) if signature_words else 'varied'}
 - Common phrases: {', '.join(signature_phrases) if signature_phrases else 'none specific'}
@@ -101,16 +340,77 @@ STYLE GUIDELINES:
 {chr(10).join(style_instructions)}
 
 EXAMPLE MESSAGES:
-{chr(10).join(f'"{msg}"' for msg in sample_messages[:6])}
+{chr(10).join(f'"{msg}"' for msg in examples)}
+{f"Vary topics: {', '.join(topics)}" if topics else ""}"""
+            
+            sections.append(render(fit_sample_messages(request['sample_messages'],
+                                                       self.prompt_token_budget - estimate_tokens(render([])),
+                                                       max_tokens_each=self.sample_message_max_tokens)))
+        
+        example = ", ".join(f'"{user}": ["message", ...]' for user in requests_by_user)
+        return f"""Generate {count} text messages for each of the {len(requests_by_user)} people below, each in their own style. Make them realistic and varied, and keep every person's messages distinct from the others'.
 
-{topics_instruction}
+{(chr(10) * 2).join(sections)}
 
-Create {count} different messages. Each should feel authentic but varied. Format as numbered list:
-1. [message]
-2. [message]
-etc."""
-
-        return prompt
+Respond with only a JSON object mapping each person's name to a list of exactly {count} messages, with no other text:
+{{{example}}}"""
+    
+    def parse_multi_user_response(self, response: Optional[str], users: List[str]) -> Dict[str, List[str]]:
+        """
+        Parse a multi-user JSON response into user -> messages. Tolerates code fences, text around
+        the JSON and a truncated object (each user's list is decoded on its own if the whole object
+        is not valid JSON; a list cut off mid-way keeps the items completed before the cut). Users
+        whose section is missing or empty are left out.
+        """
+        if not response:
+            return {}
+        text = re.sub(r"^```(?:json)?|```$", "", response.strip(), flags=re.MULTILINE)
+        decoder = json.JSONDecoder()
+        sections = {}
+        start = text.find("{")
+        if start != -1:
+            try:
+                parsed, _ = decoder.raw_decode(text, start)
+                if isinstance(parsed, dict):
+                    sections = parsed
+            except ValueError:
+                pass
+        if not sections:
+            for user in users:
+                match = re.search(rf'"{re.escape(user)}"\s*:\s*(?=[\["])', text, re.IGNORECASE)
+                if match:
+                    try:
+                        sections[user], _ = decoder.raw_decode(text, match.end())
+                    except ValueError:
+                        sections[user] = self._decode_list_prefix(decoder, text, match.end())
+        
+        by_name = {str(name).strip().lower(): value for name, value in sections.items()}
+        parsed_messages = {}
+        for user in users:
+            value = by_name.get(user.lower())
+            if isinstance(value, str):
+                value = self.parse_batch_response(value)
+            if isinstance(value, list):
+                messages = [str(msg).strip() for msg in value if isinstance(msg, (str, int, float)) and str(msg).strip()]
+                if messages:
+                    parsed_messages[user] = messages
+        return parsed_messages
+    
+    @staticmethod
+    def _decode_list_prefix(decoder: json.JSONDecoder, text: str, start: int) -> Optional[List]:
+        """The items of the JSON list at `start` that are complete before the text breaks off (None if no list)."""
+        if not text.startswith("[", start):
+            return None
+        items, pos = [], start + 1
+        while True:
+            pos = len(text) - len(text[pos:].lstrip(" \t\r\n,"))
+            if pos >= len(text) or text[pos] == "]":
+                return items
+            try:
+                item, pos = decoder.raw_decode(text, pos)
+            except ValueError:
+                return items
+            items.append(item)
     
     def calculate_synthetic_distinctiveness_score(self, message: str, user: str, profiles: Dict) -> float:
         """
@@ -126,10 +426,8 @@ etc."""
         score += signature_matches * 3.0
         
         # 2. Signature phrase bonus
-        signature_phrases = [item['phrase'] for item in user_profile.get('signature_phrases', [])]
-        for phrase in signature_phrases:
-            if phrase in message.lower():
-                score += 5.0
+        signature_phrases = tuple(item['phrase'] for item in user_profile.get('signature_phrases', []))
+        score += len(compile_matcher(signature_phrases).find_all(message)) * 5.0
         
         # 3. Length characteristics
         msg_word_count = len(message_words)
@@ -183,81 +481,127 @@ etc."""
     
     def parse_batch_response(self, response: str) -> List[str]:
         """Parse the batch response from Mistral API into individual messages."""
-        messages = []
-        lines = response.strip().split('\n')
-        
-        current_message = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if re.match(r'^\d+\.\s*', line):
-                if current_message.strip():
-                    messages.append(current_message.strip())
-                current_message = re.sub(r'^\d+\.\s*', '', line)
-            else:
-                if current_message:
-                    current_message += " " + line
-                else:
-                    current_message = line
-        
-        if current_message.strip():
-            messages.append(current_message.strip())
-        
-        return messages
+        parser = IncrementalBatchParser()
+        parser.feed(response)
+        parser.close()
+        return parser.messages
     
-    def call_mistral_api(self, prompt: str, max_retries: int = 3) -> Optional[str]:
-        """Call Mistral API with retry logic and error handling."""
+    def completion_payload(self, prompt: str, max_tokens: int = 400) -> Dict:
+        """Request body for one prompt; also the response cache key."""
         payload = {
             "model": self.model_name,
             "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 400,
+            "max_tokens": max_tokens,
             "temperature": 0.85,  # Slightly lower for more consistency
             "top_p": 0.9
         }
+        if self.seed is not None:
+            payload["random_seed"] = self.seed
+        return payload
+    
+    def call_mistral_api(self, prompt: str, max_retries: int = 3, max_tokens: int = 400) -> Optional[str]:
+        """
+        Call Mistral API with retry logic and error handling (see MistralClient.post).
+        A response cut off at max_tokens loses its unfinished last line and is not cached.
+        """
+        payload = self.completion_payload(prompt, max_tokens)
         
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(self.api_url, headers=self.headers, json=payload)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    message = result['choices'][0]['message']['content'].strip()
-                    return message
-                    
-                elif response.status_code == 429:
-                    wait_time = 2 ** attempt
-                    print(f"Rate limited. Waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    continue
-                    
-                else:
-                    print(f"API Error {response.status_code}: {response.text}")
-                    
-            except Exception as e:
-                print(f"Request failed (attempt {attempt + 1}): {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
+        # The payload (model, prompt, sampling params, seed) is the cache key
+        if self.response_cache is not None:
+            cached = self.response_cache.get(payload)
+            if cached is not None:
+                return cached
         
-        return None
+        result = self.client.post(payload, max_retries=max_retries)
+        if result is None:
+            return None
+        try:
+            choice = result['choices'][0]
+            message = choice['message']['content'].strip()
+        except (KeyError, IndexError, TypeError) as e:
+            print(f"Unexpected API response: {str(e)}")
+            return None
+        usage = result.get('usage') or {}
+        truncated = choice.get('finish_reason') == 'length'
+        self.token_usage.record(usage.get('prompt_tokens', estimate_tokens(prompt)),
+                                usage.get('completion_tokens', estimate_tokens(message)),
+                                max_tokens, estimated=not usage, truncated=truncated)
+        if truncated:
+            # The last line was cut off mid-message
+            print(f"[WARNING] Response reached max_tokens={max_tokens}, dropping its unfinished last line")
+            message = message.rsplit("\n", 1)[0] if "\n" in message else ""
+        # A cut-off or empty answer would be replayed on every seeded re-run: only cache complete ones
+        if self.response_cache is not None and not truncated and message:
+            self.response_cache.put(payload, message)
+        return message
     
-    def generate_messages_for_user(self, user: str, profile: Dict, sample_messages: List[str], 
-                                 count: int = 5) -> List[Dict]:
+    def call_mistral_api_streaming(self, prompt: str, on_message, max_retries: int = 3,
+                                   max_tokens: int = 400) -> Optional[str]:
         """
-        Generate multiple messages for a specific user with distinctiveness scores.
-        Returns list of message dictionaries with scores.
+        Streaming call_mistral_api: calls `on_message(message)` for each numbered message as
+        soon as it is complete (IncrementalBatchParser), then returns the whole response. A
+        cached response is replayed message by message. If the stream breaks off or stops at
+        max_tokens, the messages already emitted stand, the unfinished one is dropped and
+        nothing is cached.
         """
-        print(f"Generating {count} messages for {user}...")
+        payload = self.completion_payload(prompt, max_tokens)
+        parser = IncrementalBatchParser()
+        if self.response_cache is not None:
+            cached = self.response_cache.get(payload)
+            if cached is not None:
+                for message in parser.feed(cached) + parser.close():
+                    on_message(message)
+                return cached
         
-        topics = random.sample(self.conversation_topics, min(count, len(self.conversation_topics)))
-        prompt = self.create_balanced_user_prompt(user, profile, sample_messages, count, topics)
-        response = self.call_mistral_api(prompt)
+        deltas = self.client.stream(payload, max_retries=max_retries)
+        if deltas is None:
+            return None
+        chunks = []
+        try:
+            for delta in deltas:
+                chunks.append(delta)
+                for message in parser.feed(delta):
+                    on_message(message)
+        except requests.RequestException as e:
+            print(f"Stream interrupted after {len(parser.messages)} messages: {str(e)}")
+            return "\n".join(f"{i + 1}. {msg}" for i, msg in enumerate(parser.messages)) or None
+        response = "".join(chunks).strip()
+        truncated = deltas.finish_reason == 'length'
+        # The stream carries no usage: record estimates
+        self.token_usage.record(estimate_tokens(prompt), estimate_tokens(response), max_tokens,
+                                estimated=True, truncated=truncated)
+        if truncated:
+            # The message still open when the stream stopped was cut off mid-message
+            print(f"[WARNING] Stream reached max_tokens={max_tokens}, dropping its unfinished last message")
+            return "\n".join(f"{i + 1}. {msg}" for i, msg in enumerate(parser.messages)) or None
+        for message in parser.close():
+            on_message(message)
         
-        if response:
-            generated_messages = self.parse_batch_response(response)
-            
+        if self.response_cache is not None and response:
+            self.response_cache.put(payload, response)
+        return response
+    
+    def draw_topics(self, user: str, count: int = 5, attempt: int = 0) -> List[str]:
+        """Conversation topics for one user's messages (from a per-user RNG if seeded; follow-up calls get their own)."""
+        if self.seed is not None:
+            rng = random.Random(f"{self.seed}:{user}:{attempt}" if attempt else f"{self.seed}:{user}")
+        else:
+            rng = random
+        return rng.sample(self.conversation_topics, min(count, len(self.conversation_topics)))
+    
+    def create_user_request(self, user: str, profile: Dict, sample_messages: List[str], count: int = 5,
+                            topics: List[str] = None) -> str:
+        """Prompt for one user's batch of messages (draws the conversation topics if not given)."""
+        topics = topics if topics is not None else self.draw_topics(user, count)
+        return self.create_balanced_user_prompt(user, profile, sample_messages, count, topics)
+    
+    def score_generated_messages(self, user: str, profile: Dict, response: Optional[str]) -> List[Dict]:
+        """Parse an API response into message dictionaries with distinctiveness scores."""
+        return self.score_message_list(user, profile, self.parse_batch_response(response) if response else None)
+    
+    def score_message_list(self, user: str, profile: Dict, generated_messages: Optional[List[str]]) -> List[Dict]:
+        """Message dictionaries with distinctiveness scores (None = the API call failed)."""
+        if generated_messages is not None:
             # Calculate distinctiveness scores for each message
             scored_messages = []
             for msg in generated_messages:
@@ -280,79 +624,338 @@ etc."""
             print(f"  [ERROR] API call failed for {user}")
             return []
     
+    def generate_messages_for_user(self, user: str, profile: Dict, sample_messages: List[str], 
+                                 count: int = 5) -> List[Dict]:
+        """
+        Generate multiple messages for a specific user with distinctiveness scores.
+        Returns list of message dictionaries with scores.
+        """
+        print(f"Generating {count} messages for {user}...")
+        prompt = self.create_user_request(user, profile, sample_messages, count)
+        response = self.call_mistral_api(prompt, max_tokens=self.completion_tokens({user: {'profile': profile}}, count))
+        return self.score_generated_messages(user, profile, response)
+    
+    def completion_tokens(self, requests_by_user: Dict[str, Dict], count: int = 5) -> int:
+        """max_tokens for one prompt asking for `count` messages per user (token_budget.completion_budget)."""
+        if len(requests_by_user) == 1:
+            request = next(iter(requests_by_user.values()))
+            return completion_budget(request.get('count', count), request['profile'].get('avg_message_length_words', 10))
+        # JSON object: every user's list plus their quoted name as the key
+        return sum(completion_budget(count, request['profile'].get('avg_message_length_words', 10))
+                   + estimate_tokens(user) + 4 for user, request in requests_by_user.items())
+    
+    def call_mistral_api_many(self, prompts: List[str], max_tokens: List[int] = None) -> List[Optional[str]]:
+        """
+        Call the API for every prompt (with its `max_tokens`, default 400) with up to
+        `max_concurrency` requests in flight, sharing one rate limiter. Responses come back
+        in prompt order.
+        """
+        max_tokens = max_tokens or [400] * len(prompts)
+        
+        def call(prompt, tokens):
+            return self.call_mistral_api(prompt, max_tokens=tokens)
+        
+        if self.max_concurrency == 1 or len(prompts) <= 1:
+            return [call(prompt, tokens) for prompt, tokens in zip(prompts, max_tokens)]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts))) as pool:
+            return list(pool.map(call, prompts, max_tokens))
+    
+    def generate_batched(self, requests_by_user: Dict[str, Dict], count: int = 5) -> Dict[str, Optional[List[str]]]:
+        """
+        Generate messages for `users_per_request` users per API call (create_multi_user_prompt).
+        Users missing from a batched response are retried with their own prompt.
+        Returns user -> generated messages (None if the API call failed).
+        """
+        users = list(requests_by_user)
+        counts = {user: requests_by_user[user].get('count', count) for user in users}
+        batches = [users[i:i + self.users_per_request] for i in range(0, len(users), self.users_per_request)]
+        batch_requests = [({user: requests_by_user[user] for user in batch}, max(counts[user] for user in batch))
+                          for batch in batches]
+        prompts = [self.create_multi_user_prompt(requests, batch_count) for requests, batch_count in batch_requests]
+        responses = self.call_mistral_api_many(prompts, [self.completion_tokens(requests, batch_count)
+                                                         for requests, batch_count in batch_requests])
+        
+        generated = {}
+        for batch, response in zip(batches, responses):
+            for user, messages in self.parse_multi_user_response(response, batch).items():
+                generated[user] = messages[:counts[user]]
+        
+        missing = [user for user in users if user not in generated]
+        if missing:
+            print(f"[WARNING] {len(missing)} users missing from batched responses, retrying individually: "
+                  f"{', '.join(missing)}")
+            retry_prompts = [self.create_balanced_user_prompt(user, requests_by_user[user]['profile'],
+                                                              requests_by_user[user]['sample_messages'], counts[user],
+                                                              requests_by_user[user]['topics'])
+                             for user in missing]
+            retry_tokens = [self.completion_tokens({user: requests_by_user[user]}, counts[user]) for user in missing]
+            for user, response in zip(missing, self.call_mistral_api_many(retry_prompts, retry_tokens)):
+                generated[user] = self.parse_batch_response(response) if response else None
+        
+        print(f"Batched generation: {len(batches) + len(missing)} API requests for {len(users)} users "
+              f"({len(users) - len(batches) - len(missing)} saved)")
+        return {user: generated[user] for user in users}
+    
+    def generate_streaming(self, requests_by_user: Dict[str, Dict], count: int = 5, on_message=None):
+        """
+        Stream one prompt per user (up to `max_concurrency` at once) and embed every message
+        on this thread as soon as it is parsed, while the rest of the responses are still being
+        generated. `on_message(user, message)` is called after each embedding.
+        Returns (user -> messages or None if the API call failed, user -> message embeddings).
+        """
+        arrivals = queue.Queue()
+        done = object()
+        
+        def stream_user(user):
+            request = requests_by_user[user]
+            prompt = self.create_balanced_user_prompt(user, request['profile'], request['sample_messages'],
+                                                      request.get('count', count), request['topics'])
+            try:
+                response = self.call_mistral_api_streaming(prompt, lambda message: arrivals.put((user, message)),
+                                                           max_tokens=self.completion_tokens({user: request}, count))
+            finally:
+                arrivals.put((user, done))
+            return response
+        
+        generated = {user: [] for user in requests_by_user}
+        embeddings = {user: [] for user in requests_by_user}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(requests_by_user)))) as pool:
+            futures = {user: pool.submit(stream_user, user) for user in requests_by_user}
+            pending = len(futures)
+            while pending:
+                user, message = arrivals.get()
+                if message is done:
+                    pending -= 1
+                    continue
+                generated[user].append(message)
+                embeddings[user].append(encode_many([message])[0])
+                if on_message is not None:
+                    on_message(user, message)
+            for user, future in futures.items():
+                if future.result() is None and not generated[user]:
+                    generated[user] = None
+        return generated, embeddings
+    
+    def generate_offline(self, requests_by_user: Dict[str, Dict], count: int = 5) -> Dict[str, Optional[List[str]]]:
+        """Messages sampled from each user's n-gram style model (no API calls)."""
+        generated = {}
+        for user, request in requests_by_user.items():
+            attempt = request.get('attempt', 0)
+            if self.seed is not None:
+                rng = random.Random(f"{self.seed}:{user}:{attempt}" if attempt else f"{self.seed}:{user}")
+            else:
+                rng = random
+            generated[user] = self.style_model.generate(user, request.get('count', count), request['profile'], rng)
+        return generated
+    
+    def generate_round(self, requests_by_user: Dict[str, Dict], count: int = 5):
+        """
+        One generation call per user (or per batch of users) with the configured backend.
+        Returns (user -> messages or None if the call failed, user -> streamed embeddings).
+        """
+        if self.backend == "ngram":
+            print(f"Generating messages for {len(requests_by_user)} users (offline n-gram style models)...")
+            return self.generate_offline(requests_by_user, count), {}
+        
+        print(f"Generating messages for {len(requests_by_user)} users "
+              f"({self.max_concurrency} concurrent requests, {self.users_per_request} users per request)...")
+        if self.users_per_request > 1 and len(requests_by_user) > 1:
+            return self.generate_batched(requests_by_user, count), {}
+        if self.stream:
+            return self.generate_streaming(requests_by_user, count)
+        prompts = [self.create_balanced_user_prompt(user, request['profile'], request['sample_messages'],
+                                                    request.get('count', count), request['topics'])
+                   for user, request in requests_by_user.items()]
+        max_tokens = [self.completion_tokens({user: request}, count) for user, request in requests_by_user.items()]
+        return {
+            user: self.parse_batch_response(response) if response else None
+            for user, response in zip(requests_by_user, self.call_mistral_api_many(prompts, max_tokens))
+        }, {}
+    
+    def meets_quality_target(self, msg_data: Dict) -> bool:
+        """Whether a scored synthetic message reaches the distinctiveness and similarity thresholds."""
+        if msg_data['distinctiveness_score'] < self.min_score:
+            return False
+        similarity = msg_data.get('bert_similarity')
+        return similarity is None or similarity >= self.min_similarity
+    
+    def estimate_call_tokens(self, user: str, request: Dict, generated: Optional[List[str]]) -> int:
+        """Approximate tokens (token_budget.estimate_tokens) of one user's generation call; 0 offline."""
+        if self.backend == "ngram":
+            return 0
+        prompt = self.create_balanced_user_prompt(user, request['profile'], request['sample_messages'],
+                                                  request['count'], request['topics'])
+        return estimate_tokens(prompt) + sum(estimate_tokens(msg) for msg in generated or [])
+    
+    def profile_centroids(self, sample_messages: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+        """Average embedding of each user's sample messages, all users embedded in one encode_many call."""
+        texts = [msg for messages in sample_messages.values() for msg in messages]
+        if not texts:
+            return {}
+        embeddings = encode_many(texts)
+        centroids, start = {}, 0
+        for user, messages in sample_messages.items():
+            centroids[user] = np.mean(embeddings[start:start + len(messages)], axis=0)
+            start += len(messages)
+        return centroids
+    
+    def add_similarities(self, scored_by_user: Dict[str, List[Dict]], profile_embeddings: Dict[str, np.ndarray]):
+        """Set 'bert_similarity' on every scored message that lacks it, embedding all of them in one batch."""
+        pending = [(user, msg_data) for user, messages in scored_by_user.items() for msg_data in messages
+                   if 'bert_similarity' not in msg_data]
+        if not pending:
+            return
+        embeddings = encode_many([msg_data['message'] for _, msg_data in pending])
+        for (user, msg_data), embedding in zip(pending, embeddings):
+            msg_data['bert_similarity'] = profile_similarities(profile_embeddings[user], [embedding])[0]
+    
     def generate_all_synthetic_messages(self, profiles: Dict, game_data: Dict, 
-                                      messages_per_user: int = 5) -> Dict:
+                                      messages_per_user: int = 5, users: List[str] = None) -> Dict:
         """
-        Generate synthetic messages for all users with consistent scoring.
+        Generate synthetic messages for all users (or only `users`) with consistent scoring.
+        Embeddings are batched across users: one encode for the profile centroids and, unless
+        a BERT similarity threshold needs them per round, one for all kept messages at the end.
         """
         all_synthetic_messages = {}
-        # Compute average profile embeddings for each user from their real messages
-        user_profile_embeddings = {}
-        for user in profiles.keys():
-            sample_messages = []
-            if user in game_data.get('selected_messages', {}):
-                sample_messages = [
-                    msg['message'] for msg in game_data['selected_messages'][user][:10]
-                ]
-            if len(sample_messages) < 5:
-                sample_messages.extend(profiles[user].get('sample_messages', [])[:10])
-            if sample_messages:
-                user_profile_embeddings[user] = average_profile_embedding(sample_messages)
-            else:
-                user_profile_embeddings[user] = None
-        for user in profiles.keys():
-            print(f"\n{'='*50}")
-            print(f"Processing user: {user}")
-            print(f"{'='*50}")
-            # Get sample messages
-            sample_messages = []
+        users = [user for user in profiles if users is None or user in users]
+        name_matcher = name_part_matcher(profiles.keys()) if len(profiles) == 2 else None
+        
+        # Sample messages: the user's selected real messages, topped up from their profile
+        sample_messages = {}
+        for user in users:
+            samples = []
             if user in game_data.get('selected_messages', {}):
-                sample_messages = [
+                samples = [
                     msg['message'] for msg in game_data['selected_messages'][user][:10]
                 ]
-            if len(sample_messages) < 5:
-                sample_messages.extend(profiles[user].get('sample_messages', [])[:10])
-            if not sample_messages:
+            if len(samples) < 5:
+                samples.extend(profiles[user].get('sample_messages', [])[:10])
+            if not samples:
                 print(f"[WARNING] No sample messages found for {user}, skipping...")
                 continue
-            # Generate messages with scores
-            synthetic_messages = self.generate_messages_for_user(
-                user, profiles[user], sample_messages, messages_per_user
-            )
-            # Add BERT similarity to each synthetic message
-            profile_emb = user_profile_embeddings[user]
-            for msg_data in synthetic_messages:
-                if profile_emb is not None:
-                    msg_emb = get_embedding(msg_data['message'])
-                    bert_sim = cosine_similarity([profile_emb], [msg_emb])[0][0] * 100
-                    bert_sim = round(bert_sim, 1)
-                else:
-                    bert_sim = None
-                msg_data['bert_similarity'] = bert_sim
-            # DM name filtering: if only 2 participants, filter out messages mentioning any part of either name
-            if len(profiles) == 2:
-                name_parts = set()
-                for participant in profiles.keys():
-                    parts = re.split(r'\W+', participant.lower())
-                    name_parts.update([p for p in parts if p])
-                synthetic_messages = [
-                    msg for msg in synthetic_messages
-                    if not any(part in msg['message'].lower() for part in name_parts)
-                ]
-            all_synthetic_messages[user] = synthetic_messages
-            print(f"Generated {len(synthetic_messages)} scored messages for {user}")
+            sample_messages[user] = samples
+        # Average profile embeddings for each user from their real messages
+        user_profile_embeddings = self.profile_centroids(sample_messages)
+        
+        # Build every user's request in profile order (topics drawn deterministically),
+        # then call the API concurrently, one user or `users_per_request` users per request
+        requests_by_user = {}
+        for user, samples in sample_messages.items():
+            requests_by_user[user] = {
+                'profile': profiles[user],
+                'sample_messages': samples,
+                'topics': self.draw_topics(user, messages_per_user),
+            }
+        
+        # Quality loop: keep the messages meeting the thresholds and ask again only for the
+        # shortfall, within the per-user caps on generation calls and (estimated) tokens.
+        # A call that failed or returned nothing is not retried here (the client already
+        # retried it) and does not count as a quality call
+        kept = {user: [] for user in requests_by_user}
+        calls = {user: 0 for user in requests_by_user}
+        failed = {user: 0 for user in requests_by_user}
+        tokens = {user: 0 for user in requests_by_user}
+        pending = list(requests_by_user)
+        attempt = 0
+        while pending:
+            for user in pending:
+                request = requests_by_user[user]
+                request['count'] = messages_per_user - len(kept[user])
+                request['attempt'] = attempt
+                if attempt:
+                    request['topics'] = self.draw_topics(user, request['count'], attempt)
+            generated, streamed_embeddings = self.generate_round(
+                {user: requests_by_user[user] for user in pending}, messages_per_user)
+            
+            scored_by_user = {}
+            for user in pending:
+                if not generated[user]:
+                    failed[user] += 1
+                    print(f"[WARNING] Generation call for {user} failed or returned no messages")
+                    continue
+                calls[user] += 1
+                tokens[user] += self.estimate_call_tokens(user, requests_by_user[user], generated[user])
+                print(f"\n{'='*50}")
+                print(f"Processing user: {user}" + (f" (follow-up {attempt})" if attempt else ""))
+                print(f"{'='*50}")
+                # Score the generated messages
+                synthetic_messages = self.score_message_list(user, profiles[user], generated[user])
+                # Streamed messages were embedded on arrival
+                if streamed_embeddings.get(user):
+                    bert_sims = profile_similarities(user_profile_embeddings[user], np.stack(streamed_embeddings[user]))
+                    for msg_data, bert_sim in zip(synthetic_messages, bert_sims):
+                        msg_data['bert_similarity'] = bert_sim
+                # DM name filtering: if only 2 participants, filter out messages mentioning any part of either name
+                if name_matcher is not None:
+                    synthetic_messages = [
+                        msg for msg in synthetic_messages
+                        if not name_matcher.search(msg['message'])
+                    ]
+                scored_by_user[user] = synthetic_messages
+            # A similarity threshold needs this round's similarities now (one batch for all users);
+            # otherwise they are added to the kept messages after the loop
+            if self.min_similarity > 0:
+                self.add_similarities(scored_by_user, user_profile_embeddings)
+            
+            for user, synthetic_messages in scored_by_user.items():
+                kept_texts = {msg['message'] for msg in kept[user]}
+                accepted = [msg for msg in synthetic_messages
+                            if self.meets_quality_target(msg) and msg['message'] not in kept_texts]
+                kept[user].extend(accepted)
+                print(f"Generated {len(synthetic_messages)} scored messages for {user}, "
+                      f"{len(accepted)} kept ({len(kept[user])}/{messages_per_user})")
+            
+            attempt += 1
+            pending = [user for user in scored_by_user
+                       if len(kept[user]) < messages_per_user
+                       and calls[user] < self.max_calls_per_user
+                       and tokens[user] < self.max_tokens_per_user]
+        self.add_similarities(kept, user_profile_embeddings)
+        
+        if self.backend != "ngram":
+            if self.response_cache is not None:
+                cache_stats = self.response_cache.stats()
+                print(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+            metrics = self.client.metrics()
+            if metrics["requests"]:
+                print(f"API requests: {metrics['requests']} ({metrics['ok']} ok, {metrics['rate_limited']} rate limited, "
+                      f"{metrics['retries']} retries), latency p50 {metrics['latency_p50']}s, "
+                      f"p95 {metrics['latency_p95']}s, p99 {metrics['latency_p99']}s, max {metrics['latency_max']}s")
+            usage = self.token_usage.summary()
+            if usage["calls"]:
+                print(f"Tokens: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion "
+                      f"over {usage['calls']} calls ({usage['estimated_calls']} estimated), "
+                      f"{usage['max_tokens']} max_tokens requested, {usage['truncated']} responses cut off")
+        print(f"\nQuality target (score >= {self.min_score}, BERT similarity >= {self.min_similarity}): "
+              f"{sum(calls.values())} generation calls for {len(calls)} users")
+        for user in requests_by_user:
+            tag = "[OK]" if len(kept[user]) >= messages_per_user else "[WARNING]"
+            token_note = f" (~{tokens[user]} tokens)" if self.backend != "ngram" else ""
+            failed_note = f", {failed[user]} failed" if failed[user] else ""
+            print(f"  {tag} {user}: {len(kept[user])}/{messages_per_user} kept after {calls[user]} calls"
+                  f"{failed_note}{token_note}")
+            all_synthetic_messages[user] = kept[user]
         
         return all_synthetic_messages
     
-    def create_synthetic_game_rounds(self, synthetic_messages: Dict, rounds: int = 5) -> List[Dict]:
-        """Create game rounds using synthetic messages with consistent format."""
-        game_rounds = []
+    def create_synthetic_game_rounds(self, synthetic_messages: Dict, rounds: int = 5,
+                                     pool: SyntheticPool = None) -> List[Dict]:
+        """
+        Create game rounds using synthetic messages with consistent format. With a pool, rounds
+        are drawn from its not-yet-shown messages first; `synthetic_messages` fills any shortfall.
+        """
+        game_rounds = pool.draw_rounds(rounds) if pool is not None else []
+        if len(game_rounds) == rounds:
+            return game_rounds
         all_users = list(synthetic_messages.keys())
+        shown = {msg_data['message'] for msg_data in game_rounds}
         
         # Collect all synthetic messages
         all_messages = []
         for user, messages in synthetic_messages.items():
             for msg_data in messages:
+                if msg_data['message'] in shown:
+                    continue
                 all_messages.append({
                     'author': user,
                     'message': msg_data['message'],
@@ -364,30 +967,14 @@ etc."""
         # Shuffle and select for rounds
         random.shuffle(all_messages)
         
-        for i in range(min(rounds, len(all_messages))):
-            msg_data = all_messages[i]
-            
-            # Create answer choices
-            choices = [msg_data['author']]
-            other_users = [u for u in all_users if u != msg_data['author']]
-            choices.extend(random.sample(other_users, min(3, len(other_users))))
-            random.shuffle(choices)
-            
-            game_rounds.append({
-                'round': i + 1,
-                'message': msg_data['message'],
-                'correct_author': msg_data['author'],
-                'choices': choices,
-                'distinctiveness_score': msg_data['distinctiveness_score'],
-                'bert_similarity': msg_data.get('bert_similarity'),
-                'is_synthetic': True,
-            })
+        for msg_data in all_messages[:rounds - len(game_rounds)]:
+            game_rounds.append(build_game_round(len(game_rounds) + 1, msg_data, all_users))
         
         return game_rounds
     
     def save_synthetic_data(self, synthetic_messages: Dict, synthetic_rounds: List[Dict], 
-                           output_path: str) -> Dict:
-        """Save synthetic message data with consistent format."""
+                           output_path: str, pool_key: str = None, messages_per_user: int = None) -> Dict:
+        """Save synthetic message data with consistent format (and, given `messages_per_user`, the users left short of it)."""
         synthetic_data = {
             'selected_messages': synthetic_messages,  # Consistent with game_data format
             'game_rounds': synthetic_rounds,
@@ -397,6 +984,17 @@ etc."""
                 'total_game_rounds': len(synthetic_rounds)
             }
         }
+        if messages_per_user is not None:
+            synthetic_data['metadata']['messages_per_user'] = messages_per_user
+            synthetic_data['metadata']['short_users'] = [
+                user for user, msgs in synthetic_messages.items() if len(msgs) < messages_per_user
+            ]
+        if pool_key is not None:
+            synthetic_data['metadata']['synthetic_pool'] = pool_key
+        if self.token_usage.summary()["calls"]:
+            synthetic_data['metadata']['token_usage'] = self.token_usage.summary()
+        if self.client.metrics()["requests"]:
+            synthetic_data['metadata']['api_metrics'] = self.client.metrics()
         
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(synthetic_data, f, indent=2, ensure_ascii=False)
@@ -405,17 +1003,46 @@ etc."""
         return synthetic_data
 
 
+def generation_settings() -> Dict:
+    """Settings that change what generate_improved_synthetic_messages produces (part of the pipeline's cache key)."""
+    backend = GENERATION_BACKEND
+    if backend == "auto":
+        backend = "mistral" if API_KEY else "ngram"
+    return {
+        "backend": backend,
+        "model": MISTRAL_MODEL if backend == "mistral" else None,
+        "users_per_request": MISTRAL_USERS_PER_REQUEST,
+        "min_score": SYNTHETIC_MIN_SCORE,
+        "min_similarity": SYNTHETIC_MIN_SIMILARITY,
+        "max_calls": SYNTHETIC_MAX_CALLS,
+        "max_tokens": SYNTHETIC_MAX_TOKENS,
+        "prompt_token_budget": PROMPT_TOKEN_BUDGET,
+        "seed": GENERATION_SEED,
+    }
+
+
 def generate_improved_synthetic_messages(profiles_path: str, game_data_path: str, 
                                        output_path: str, messages_per_user: int = 5,
-                                       synthetic_rounds: int = 5):
+                                       synthetic_rounds: int = 5, profiles: Dict = None,
+                                       game_data: Dict = None, style_model: NgramStyleModel = None,
+                                       pool_key: str = None):
     """
     Generate improved synthetic messages with consistent scoring and balanced style patterns.
+    Profiles, game data and n-gram style models already in memory (from the earlier stages)
+    skip reading the JSON files. With a `pool_key` (ChatDataset.fingerprint), the messages
+    also seed that dataset's synthetic pool, which the game server keeps topped up.
     """
-    generator = ImprovedMistralMessageGenerator()
+    generator = ImprovedMistralMessageGenerator(style_model=style_model)
     
     # Load data
-    print("Loading profiles and game data...")
-    profiles, game_data = generator.load_data(profiles_path, game_data_path)
+    if profiles is None or game_data is None:
+        print("Loading profiles and game data...")
+        loaded_profiles, loaded_game_data = generator.load_data(profiles_path, game_data_path)
+        profiles = loaded_profiles if profiles is None else profiles
+        game_data = loaded_game_data if game_data is None else game_data
+    if generator.backend == "ngram" and generator.style_model is None:
+        generator.style_model = load_ngram_model(
+            os.path.join(os.path.dirname(profiles_path), "ngram_models.json"), profiles)
     
     # Generate synthetic messages
     print("Starting improved synthetic message generation...")
@@ -428,7 +1055,13 @@ def generate_improved_synthetic_messages(profiles_path: str, game_data_path: str
     rounds = generator.create_synthetic_game_rounds(synthetic_messages, synthetic_rounds)
     
     # Save everything
-    synthetic_data = generator.save_synthetic_data(synthetic_messages, rounds, output_path)
+    synthetic_data = generator.save_synthetic_data(synthetic_messages, rounds, output_path, pool_key,
+                                                   messages_per_user)
+    if pool_key is not None:
+        pool = SyntheticPool.open(pool_key, users=list(profiles))
+        added = sum(pool.add(user, messages) for user, messages in synthetic_messages.items())
+        pool.save()
+        print(f"[OK] Added {added} messages to the synthetic pool: {pool.path}")
     
     # Print summary
     print("\n" + "="*60)
@@ -442,4 +1075,39 @@ def generate_improved_synthetic_messages(profiles_path: str, game_data_path: str
         avg_score = sum(msg['distinctiveness_score'] for msg in messages) / len(messages) if messages else 0
         print(f"  {user}: {len(messages)} messages generated (avg distinctiveness score: {avg_score:.2f})")
     
-    return synthetic_data
\ No newline at end of file
+    return synthetic_data
+
+
+def start_synthetic_pool(data_dir: str, target: int = SYNTHETIC_POOL_TARGET):
+    """
+    Open the synthetic pool of the dataset whose pipeline output is in `data_dir` and start a
+    PoolTopUpWorker generating for it in the background. Returns (pool, worker), or
+    (None, None) if the pipeline did not record a pool.
+    """
+    synthetic_path = os.path.join(data_dir, "synthetic_data.json")
+    if not os.path.exists(synthetic_path):
+        return None, None
+    with open(synthetic_path, 'r', encoding='utf-8') as f:
+        pool_key = json.load(f).get('metadata', {}).get('synthetic_pool')
+    if pool_key is None:
+        return None, None
+    
+    profiles_path = os.path.join(data_dir, "user_profiles.json")
+    generator = ImprovedMistralMessageGenerator()
+    profiles, game_data = generator.load_data(profiles_path, os.path.join(data_dir, "real_data.json"))
+    if generator.backend == "ngram":
+        generator.style_model = load_ngram_model(os.path.join(data_dir, "ngram_models.json"), profiles)
+    pool = SyntheticPool.open(pool_key, users=list(profiles))
+    seeds = random.Random()
+    
+    def generate(shortfall: Dict[str, int]) -> Dict[str, List[Dict]]:
+        # A new seed per round: a fixed one would bring back the same (already pooled) messages
+        generator.seed = seeds.randrange(2 ** 31)
+        return generator.generate_all_synthetic_messages(profiles, game_data, min(max(shortfall.values()), 10),
+                                                         users=list(shortfall))
+    
+    worker = PoolTopUpWorker(pool, generate, target)
+    worker.start()
+    print(f"[OK] Synthetic pool {pool_key}: {sum(pool.size(user) for user in pool.users)} fresh messages, "
+          f"topping up to {target} per user")
+    return pool, worker
@@ -1,10 +1,27 @@
+import os
 import json
 import random
 import re
-from typing import Dict, List, Tuple
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 from collections import Counter
+import numpy as np
 import pandas as pd
-from backend.bert_similarity import average_profile_embedding, get_embedding, cosine_similarity
+from backend.bert_similarity import (
+    estimate_profile_centroid, encode_many, profile_similarities, mmr_select, warm_up,
+    use_read_only_cache, drain_new_embeddings, store_embeddings, embedding_stats, reset_embedding_stats,
+    merge_embedding_stats
+)
+from backend.chat_dataset import ChatDataset, load_chat_dataset
+from backend.inverted_index import InvertedIndex
+from backend.near_duplicates import NearDuplicateIndex, build_near_duplicate_index
+from backend.pattern_matcher import PatternMatcher, compile_matcher, name_part_matcher
+
+# Candidates kept per selected message: scoring streams through a user's history keeping
+# only the best messages_per_user * CANDIDATE_OVERSAMPLE messages in a bounded heap
+CANDIDATE_OVERSAMPLE = 4
 
 
 class GameMessageSelector:
@@ -15,6 +32,7 @@ class GameMessageSelector:
     
     def __init__(self):
         self.emoji_pattern = re.compile(r":[a-z_]+:")
+        self.centroid_sample_sizes = {}  # user -> messages embedded for the profile centroid
         
     def load_profiles(self, profiles_path: str) -> Dict:
         """Load user profiles from JSON file."""
@@ -23,27 +41,32 @@ class GameMessageSelector:
     
     def load_original_csv(self, csv_path: str) -> pd.DataFrame:
         """Load original parsed CSV to get all messages."""
-        return pd.read_csv(csv_path)
+        return ChatDataset.from_csv(csv_path).to_frame()
     
-    def score_message_distinctiveness(self, message: str, user: str, profiles: Dict, all_messages: pd.DataFrame) -> float:
+    def score_message_distinctiveness(self, message: str, user: str, profiles: Dict, all_messages: pd.DataFrame,
+                                      signature_hits: Dict[str, Tuple[int, int]] = None) -> float:
         """
         Score how distinctive a message is for a particular user.
         Higher scores indicate more characteristic messages.
+        `signature_hits` (from InvertedIndex.signature_hits) replaces the signature word/phrase scans.
         """
         score = 0.0
         user_profile = profiles[user]
+        message_words = message.lower().split()
+        
+        if signature_hits is not None:
+            signature_matches, phrase_matches = signature_hits.get(message.strip(), (0, 0))
+        else:
+            signature_words = [item['word'] for item in user_profile.get('signature_words', [])]
+            signature_matches = sum(1 for word in message_words if word in signature_words)
+            signature_phrases = tuple(item['phrase'] for item in user_profile.get('signature_phrases', []))
+            phrase_matches = len(compile_matcher(signature_phrases).find_all(message))
         
         # 1. Signature word bonus (heavily weighted)
-        signature_words = [item['word'] for item in user_profile.get('signature_words', [])]
-        message_words = message.lower().split()
-        signature_matches = sum(1 for word in message_words if word in signature_words)
         score += signature_matches * 3.0
         
         # 2. Signature phrase bonus (very heavily weighted)
-        signature_phrases = [item['phrase'] for item in user_profile.get('signature_phrases', [])]
-        for phrase in signature_phrases:
-            if phrase in message.lower():
-                score += 5.0
+        score += phrase_matches * 5.0
         
         # 3. Length characteristics
         msg_word_count = len(message_words)
@@ -102,9 +125,21 @@ class GameMessageSelector:
         
         return score
     
-    def filter_suitable_messages(self, messages: List[str]) -> List[str]:
-        """Filter out messages that aren't suitable for gameplay."""
-        filtered = []
+    def filter_suitable_messages(self, messages: List[str],
+                                 dedup_index: NearDuplicateIndex = None) -> List[str]:
+        """
+        Filter out messages that aren't suitable for gameplay.
+        With a near-duplicate index, only the first message of each near-duplicate cluster is kept.
+        """
+        return list(self.iter_suitable_messages(messages, dedup_index))
+    
+    def iter_suitable_messages(self, messages: Iterable[str], dedup_index: NearDuplicateIndex = None,
+                               excluded_clusters: set = None) -> Iterator[str]:
+        """
+        Streaming version of filter_suitable_messages: yields suitable messages in order.
+        Messages in `excluded_clusters` (near-duplicate clusters given to another user) are skipped.
+        """
+        seen_clusters = set(excluded_clusters or ())
         
         for msg in messages:
             msg = msg.strip()
@@ -129,13 +164,253 @@ class GameMessageSelector:
             special_char_ratio = sum(1 for c in msg if not c.isalnum() and c not in ' .,!?-\'') / len(msg)
             if special_char_ratio > 0.3:
                 continue
+            
+            # Keep only the first message of each near-duplicate cluster
+            if dedup_index is not None:
+                cluster = dedup_index.cluster_id(msg) or dedup_index.key(msg)
+                if cluster in seen_clusters:
+                    continue
+                seen_clusters.add(cluster)
                 
-            filtered.append(msg)
+            yield msg
+    
+    def iter_scored_candidates(self, messages: Iterable[str], user: str, profiles: Dict,
+                               min_score_threshold: float = 1.0, dedup_index: NearDuplicateIndex = None,
+                               name_matcher: PatternMatcher = None, counts: Dict = None,
+                               signature_hits: Dict = None, excluded_clusters: set = None) -> Iterator[Tuple[str, float]]:
+        """
+        Stream (message, distinctiveness score) for the user's suitable messages scoring at least
+        `min_score_threshold`. If given, `counts['suitable']` is incremented per suitable message.
+        """
+        if name_matcher is not None:
+            messages = (msg for msg in messages if not name_matcher.search(msg))
+        for msg in self.iter_suitable_messages(messages, dedup_index, excluded_clusters):
+            if counts is not None:
+                counts['suitable'] = counts.get('suitable', 0) + 1
+            score = self.score_message_distinctiveness(msg, user, profiles, None, signature_hits)
+            if score >= min_score_threshold:
+                yield msg, score
+    
+    @staticmethod
+    def top_candidates(scored: Iterable[Tuple[str, float]], k: int, below: Tuple = None):
+        """
+        Best `k` (message, score) pairs of a stream, highest score first (ties keep stream order),
+        using a bounded min-heap: memory is O(k) however long the stream is.
+        With `below` (the cutoff returned by a previous call), only candidates ranked after
+        that pass's last one are considered, so repeated calls page through the ranking.
         
-        return filtered
+        Returns:
+            (candidates, cutoff rank of the last candidate or None)
+        """
+        heap = []
+        for position, (msg, score) in enumerate(scored):
+            rank = (score, -position)
+            if below is not None and rank >= below:
+                continue
+            if len(heap) < k:
+                heapq.heappush(heap, (rank, msg))
+            elif rank > heap[0][0]:
+                heapq.heapreplace(heap, (rank, msg))
+        ordered = sorted(heap, reverse=True)
+        return [(msg, rank[0]) for rank, msg in ordered], (ordered[-1][0] if ordered else None)
+    
+    def select_by_word_overlap(self, message_scores: List[Tuple[str, float]], messages_per_user: int,
+                               picked: List = None, used_words: set = None) -> List[Tuple[str, float]]:
+        """
+        Walk score-sorted candidates, skipping any with 70%+ word overlap with earlier picks.
+        Pass `picked` and `used_words` from a previous call to continue with the next candidates.
+        """
+        picked = [] if picked is None else picked
+        used_words = set() if used_words is None else used_words
+        
+        for msg, score in message_scores:
+            if len(picked) >= messages_per_user:
+                break
+            
+            # Avoid too similar messages
+            msg_words = set(msg.lower().split())
+            overlap = len(msg_words.intersection(used_words))
+            
+            if overlap < len(msg_words) * 0.7:  # Less than 70% word overlap
+                picked.append((msg, score))
+                used_words.update(msg_words)
+        
+        return picked
+    
+    def select_streaming_overlap(self, scored_stream: Callable[[], Iterable[Tuple[str, float]]],
+                                 messages_per_user: int) -> List[Tuple[str, float]]:
+        """
+        select_by_word_overlap over the best messages_per_user * CANDIDATE_OVERSAMPLE candidates of
+        `scored_stream()` (a fresh (message, score) stream per call). If the overlap filter exhausts
+        them, another pass takes the next-best candidates (twice as many each time). Picks are the
+        same as walking the fully sorted list, with memory bounded by the pool size.
+        """
+        pool = messages_per_user * CANDIDATE_OVERSAMPLE
+        message_scores, cutoff = self.top_candidates(scored_stream(), pool)
+        picked, used_words = [], set()
+        self.select_by_word_overlap(message_scores, messages_per_user, picked, used_words)
+        while len(picked) < messages_per_user and len(message_scores) == pool:
+            pool *= 2
+            message_scores, cutoff = self.top_candidates(scored_stream(), pool, cutoff)
+            self.select_by_word_overlap(message_scores, messages_per_user, picked, used_words)
+        return picked
+    
+    def select_by_mmr(self, message_scores: List[Tuple[str, float]], messages_per_user: int,
+                      diversity_weight: float = 0.3, candidate_embs: np.ndarray = None):
+        """
+        Embed all candidates (the bounded top-scored pool) in one batch, unless `candidate_embs` already
+        holds that batch, and pick by maximal marginal relevance: distinctiveness (scaled to [0, 1])
+        traded off against cosine similarity to earlier picks.
+        Returns (picked (message, score) pairs, their embeddings).
+        """
+        if not message_scores:
+            return [], None
+        if candidate_embs is None:
+            candidate_embs = encode_many([msg for msg, _ in message_scores])
+        scores = np.array([score for _, score in message_scores], dtype=np.float32)
+        relevance = scores / max(float(scores.max()), 1e-9)
+        picks = mmr_select(candidate_embs, relevance, messages_per_user, diversity_weight)
+        return [message_scores[i] for i in picks], candidate_embs[picks]
+    
+    def select_user_messages(self, user: str, user_messages: List[str], profiles: Dict,
+                             messages_per_user: int = 10, min_score_threshold: float = 1.0,
+                             selection_mode: str = "overlap", diversity_weight: float = 0.3,
+                             dedup_index: NearDuplicateIndex = None, name_matcher: PatternMatcher = None,
+                             signature_hits: Dict = None, excluded_clusters: set = None) -> Tuple[List[Dict], int]:
+        """
+        Filter, score, pick and embed the messages of one user.
+        `signature_hits` are the user's signature word/phrase matches from the inverted index;
+        messages in `excluded_clusters` (near-duplicates of another user's messages) are never picked.
+        
+        Returns:
+            (selected message dicts in pick order, number of messages embedded for the profile centroid)
+        """
+        print(f"Selecting messages for {user}...")
+        
+        # Profile centroid from (a sample of) all the user's messages
+        if user_messages:
+            profile_emb, sample_size = estimate_profile_centroid(user_messages)
+            print(f"Profile centroid for {user}: {sample_size}/{len(user_messages)} messages embedded")
+        else:
+            profile_emb, sample_size = None, 0
+        
+        # Stream name-filtered, suitable, scored messages (DM name filtering: if only 2 participants,
+        # messages mentioning any part of either name are dropped)
+        counts = {}
+        def scored_stream():
+            counts['suitable'] = 0  # every pass streams the whole history
+            return self.iter_scored_candidates(user_messages, user, profiles, min_score_threshold,
+                                               dedup_index, name_matcher, counts, signature_hits,
+                                               excluded_clusters)
+        
+        # Select messages, ensuring variety
+        if selection_mode == "overlap":
+            picked = self.select_streaming_overlap(scored_stream, messages_per_user)
+            picked_embs = encode_many([msg for msg, _ in picked]) if profile_emb is not None else None
+        elif selection_mode == "mmr":
+            message_scores, _ = self.top_candidates(scored_stream(), messages_per_user * CANDIDATE_OVERSAMPLE)
+            picked, picked_embs = self.select_by_mmr(message_scores, messages_per_user, diversity_weight)
+        else:
+            raise ValueError(f"Unknown selection_mode: {selection_mode}")
+        
+        if counts['suitable'] < 5:
+            print(f"Warning: Only {counts['suitable']} suitable messages found for {user}")
+        
+        return self.selected_dicts(picked, picked_embs, profile_emb), sample_size
+    
+    @staticmethod
+    def selected_dicts(picked: List[Tuple[str, float]], picked_embs, profile_emb) -> List[Dict]:
+        """Selected message dicts, with the BERT similarity (as percentage) of each pick to the user's profile."""
+        if profile_emb is not None and picked:
+            bert_sims = profile_similarities(profile_emb, picked_embs)
+        else:
+            bert_sims = [None] * len(picked)
+        return [{
+            'message': msg,
+            'distinctiveness_score': round(score, 2),
+            'bert_similarity': bert_sim,
+            'is_synthetic': False
+        } for (msg, score), bert_sim in zip(picked, bert_sims)]
+    
+    def rank_user_candidates(self, user: str, user_messages: List[str], profiles: Dict,
+                             messages_per_user: int = 10, min_score_threshold: float = 1.0,
+                             selection_mode: str = "overlap", diversity_weight: float = 0.3,
+                             dedup_index: NearDuplicateIndex = None, name_matcher: PatternMatcher = None,
+                             signature_hits: Dict = None) -> Dict:
+        """
+        The part of select_user_messages that does not depend on other users' picks, for a
+        selection worker: the profile centroid, the best candidates in rank order (twice the
+        usual pool, so picks survive other users' clusters being taken out) and the embedding
+        batch the unconstrained selection needs. finish_user_selection picks from it.
+        """
+        print(f"Ranking candidates for {user}...")
+        if user_messages:
+            profile_emb, sample_size = estimate_profile_centroid(user_messages)
+        else:
+            profile_emb, sample_size = None, 0
+        counts = {}
+        depth = 2 * messages_per_user * CANDIDATE_OVERSAMPLE
+        candidates, _ = self.top_candidates(
+            self.iter_scored_candidates(user_messages, user, profiles, min_score_threshold, dedup_index,
+                                        name_matcher, counts, signature_hits), depth)
+        if counts.get('suitable', 0) < 5:
+            print(f"Warning: Only {counts.get('suitable', 0)} suitable messages found for {user}")
+        
+        # Embed the batch the selection without excluded clusters would (most users keep it)
+        if selection_mode == "mmr":
+            batch = [msg for msg, _ in candidates[:messages_per_user * CANDIDATE_OVERSAMPLE]]
+        else:
+            batch = [msg for msg, _ in self.select_by_word_overlap(candidates, messages_per_user)]
+        embeddings = encode_many(batch) if batch and (profile_emb is not None or selection_mode == "mmr") else None
+        return {
+            'user': user,
+            'profile_emb': profile_emb,
+            'sample_size': sample_size,
+            'candidates': candidates,
+            'exhausted': len(candidates) < depth,
+            'batch': batch,
+            'embeddings': embeddings,
+        }
+    
+    def finish_user_selection(self, ranked: Dict, excluded_clusters: set, cluster_of: Callable[[str], str],
+                              messages_per_user: int = 10, selection_mode: str = "overlap",
+                              diversity_weight: float = 0.3):
+        """
+        Pick one user's messages from rank_user_candidates output, skipping `excluded_clusters`.
+        The picks are those select_user_messages makes with the same exclusions; None if too many
+        candidates were excluded to be sure of that (then select_user_messages must run).
+        """
+        candidates = [(msg, score) for msg, score in ranked['candidates']
+                      if cluster_of(msg) not in excluded_clusters] if excluded_clusters else ranked['candidates']
+        pool = messages_per_user * CANDIDATE_OVERSAMPLE
+        profile_emb = ranked['profile_emb']
+        
+        def embed(batch):
+            # Reuse the worker's embeddings only for the identical batch, so results match exactly
+            return ranked['embeddings'] if batch == ranked['batch'] else encode_many(batch)
+        
+        if selection_mode == "overlap":
+            picked = self.select_by_word_overlap(candidates, messages_per_user)
+            if len(picked) < messages_per_user and not ranked['exhausted']:
+                return None
+            batch = [msg for msg, _ in picked]
+            picked_embs = embed(batch) if profile_emb is not None and batch else None
+        elif selection_mode == "mmr":
+            if len(candidates) < pool and not ranked['exhausted']:
+                return None
+            message_scores = candidates[:pool]
+            batch = [msg for msg, _ in message_scores]
+            picked, picked_embs = self.select_by_mmr(message_scores, messages_per_user, diversity_weight,
+                                                     embed(batch) if batch else None)
+        else:
+            raise ValueError(f"Unknown selection_mode: {selection_mode}")
+        return self.selected_dicts(picked, picked_embs, profile_emb), ranked['sample_size']
     
     def select_game_messages(self, profiles: Dict, original_csv_path: str, 
-                           messages_per_user: int = 10, min_score_threshold: float = 1.0) -> Dict:
+                           messages_per_user: int = 10, min_score_threshold: float = 1.0,
+                           selection_mode: str = "overlap", diversity_weight: float = 0.3,
+                           dedup_index: NearDuplicateIndex = None, workers: int = 1,
+                           dataset: ChatDataset = None, inverted_index: InvertedIndex = None) -> Dict:
         """
         Select the most characteristic messages for each user for gameplay.
         
@@ -144,92 +419,118 @@ class GameMessageSelector:
             original_csv_path: Path to original parsed CSV
             messages_per_user: Number of messages to select per user
             min_score_threshold: Minimum distinctiveness score required
+            selection_mode: "overlap" (word-overlap variety check) or "mmr" (maximal marginal relevance
+                over embeddings of all candidates)
+            diversity_weight: MMR weight of similarity to already selected messages (0 = pure score)
+            dedup_index: Near-duplicate index over the chat (the dataset's, else built from the
+                messages, if not given); at most one message per near-duplicate cluster is selected
+                across all users
+            workers: Number of worker processes for per-user selection (1 = in this process).
+                Output is identical either way.
+            dataset: In-memory ChatDataset from the parse stage; the CSV is read only without one
+            inverted_index: Word index over the chat (the dataset's if not given); signature
+                word/phrase matches then come from posting lists instead of scanning each message
             
         Returns:
             Dictionary with selected messages for each user
         """
-        # Load all messages
-        df = self.load_original_csv(original_csv_path)
+        # All messages, from the shared dataset or the CSV checkpoint
+        dataset = load_chat_dataset(original_csv_path, dataset)
         
-        selected_messages = {}
+        if dedup_index is None:
+            dedup_index = dataset.near_duplicates
+        if dedup_index is None:
+            dedup_index = build_near_duplicate_index(dataset.content)
+        if inverted_index is None:
+            inverted_index = dataset.inverted_index
         
-        # Compute average profile embeddings for each user
-        user_profile_embeddings = {}
-        for user in profiles.keys():
-            # Get all messages from this user
-            user_messages = df[df['author'] == user]['content'].dropna().tolist()
-            if user_messages:
-                user_profile_embeddings[user] = average_profile_embedding(user_messages)
-            else:
-                user_profile_embeddings[user] = None
+        # DM name filtering matcher: every part of either name (split on space and punctuation), built once
+        name_matcher = name_part_matcher(profiles.keys()) if len(profiles) == 2 else None
         
+        def cluster_of(msg: str) -> str:
+            return dedup_index.cluster_id(msg) or dedup_index.key(msg)
+        
+        jobs = []
+        clusters_by_user = []  # near-duplicate clusters of each user's messages
         for user in profiles.keys():
-            print(f"Selecting messages for {user}...")
-            
-            # Get all messages from this user
-            user_messages = df[df['author'] == user]['content'].dropna().tolist()
-            
-            # DM name filtering: if only 2 participants, filter out messages mentioning any part of either name
-            if len(profiles) == 2:
-                # Get all name parts (split on space and punctuation)
-                name_parts = set()
-                for participant in profiles.keys():
-                    # Split on non-word characters (space, dot, etc.)
-                    parts = re.split(r'\W+', participant.lower())
-                    name_parts.update([p for p in parts if p])
-                # Remove messages mentioning any name part
-                user_messages = [msg for msg in user_messages if not any(part in msg.lower() for part in name_parts)]
-            
-            # Filter out unsuitable messages
-            suitable_messages = self.filter_suitable_messages(user_messages)
-            
-            if len(suitable_messages) < 5:
-                print(f"Warning: Only {len(suitable_messages)} suitable messages found for {user}")
-            
-            # Score each message
-            message_scores = []
-            for msg in suitable_messages:
-                score = self.score_message_distinctiveness(msg, user, profiles, df)
-                if score >= min_score_threshold:
-                    message_scores.append((msg, score))
-            
-            # Sort by score (highest first) and select top messages
-            message_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            # Select messages, ensuring variety
-            selected = []
-            used_words = set()
-            
-            for msg, score in message_scores:
-                if len(selected) >= messages_per_user:
-                    break
-                
-                # Avoid too similar messages
-                msg_words = set(msg.lower().split())
-                overlap = len(msg_words.intersection(used_words))
-                
-                if overlap < len(msg_words) * 0.7:  # Less than 70% word overlap
-                    # Compute BERT similarity (as percentage)
-                    profile_emb = user_profile_embeddings[user]
-                    if profile_emb is not None:
-                        msg_emb = get_embedding(msg)
-                        bert_sim = cosine_similarity([profile_emb], [msg_emb])[0][0] * 100
-                        bert_sim = round(bert_sim, 1)
-                    else:
-                        bert_sim = None
-                    selected.append({
-                        'message': msg,
-                        'distinctiveness_score': round(score, 2),
-                        'bert_similarity': bert_sim,
-                        'is_synthetic': False
-                    })
-                    used_words.update(msg_words)
-            
+            user_messages = dataset.messages_for(user)
+            clusters_by_user.append({cluster_of(msg) for msg in user_messages})
+            signature_hits = None
+            if inverted_index is not None:
+                signature_hits = inverted_index.signature_hits(
+                    user, user_messages,
+                    [item['word'] for item in profiles[user].get('signature_words', [])],
+                    [item['phrase'] for item in profiles[user].get('signature_phrases', [])]
+                )
+            jobs.append({
+                'user': user,
+                'user_messages': user_messages,
+                'profiles': {user: profiles[user]},
+                'messages_per_user': messages_per_user,
+                'min_score_threshold': min_score_threshold,
+                'selection_mode': selection_mode,
+                'diversity_weight': diversity_weight,
+                'dedup_index': dedup_index.subset(user_messages),
+                'name_matcher': name_matcher,
+                'signature_hits': signature_hits,
+            })
+        
+        # Workers do the per-user work that does not depend on other users (centroid, scoring,
+        # ranking, embeddings) for every user at once
+        if workers > 1 and len(jobs) > 1:
+            ranked_by_user = self._rank_in_worker_pool(jobs, workers)
+        else:
+            ranked_by_user = [None] * len(jobs)
+        
+        # In profile order, each user skips the near-duplicate clusters already selected for
+        # earlier users while picking, so picks are unique across users and nobody is left
+        # short by a later dedup. With workers, only the cheap pick over the ranked candidates
+        # runs here; the user is selected again from scratch only if too many of them were
+        # taken. Either way the output matches a sequential run.
+        selected_messages = {}
+        used_clusters = set()
+        reselected = 0
+        for job, user_clusters, ranked in zip(jobs, clusters_by_user, ranked_by_user):
+            user = job['user']
+            excluded_clusters = used_clusters & user_clusters
+            result = None
+            if ranked is not None:
+                result = self.finish_user_selection(ranked, excluded_clusters, cluster_of, messages_per_user,
+                                                    selection_mode, diversity_weight)
+                reselected += result is None
+            if result is None:
+                result = self.select_user_messages(**job, excluded_clusters=excluded_clusters)
+            selected, sample_size = result
+            used_clusters.update(cluster_of(item['message']) for item in selected)
+            self.centroid_sample_sizes[user] = sample_size
             selected_messages[user] = selected
             print(f"Selected {len(selected)} messages for {user}")
+        if workers > 1 and len(jobs) > 1:
+            print(f"Parallel selection: {len(jobs) - reselected}/{len(jobs)} users picked from worker rankings, "
+                  f"{reselected} selected again")
         
         return selected_messages
     
+    def _rank_in_worker_pool(self, jobs: List[Dict], workers: int) -> List[Dict]:
+        """Run rank_user_candidates jobs in worker processes that each hold a warm embedding model."""
+        print(f"Ranking candidates for {len(jobs)} users with {workers} worker processes...")
+        # Never fork: this process may already hold a loaded torch model (the warm pipeline
+        # worker), and forking its OpenMP thread pool can deadlock the children. forkserver and
+        # spawn workers import the calling script, which is safe since final.py runs the
+        # pipeline under a __main__ guard
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                 mp_context=multiprocessing.get_context(start_method),
+                                 initializer=_init_selection_worker) as pool:
+            for result, (keys, embeddings, used_keys), stats in pool.map(_run_selection_job, jobs):
+                # workers only read the embedding cache; this process stores what they computed
+                # and the recency of the cached embeddings they used
+                store_embeddings(keys, embeddings, used_keys)
+                merge_embedding_stats(stats)
+                results.append(result)
+        return results
+    
     def create_game_rounds(self, selected_messages: Dict, rounds: int = 5) -> List[Dict]:
         """
         Create game rounds by randomly selecting messages from different users.
@@ -287,7 +588,8 @@ class GameMessageSelector:
             'metadata': {
                 'total_users': len(selected_messages),
                 'total_selected_messages': sum(len(msgs) for msgs in selected_messages.values()),
-                'total_game_rounds': len(game_rounds)
+                'total_game_rounds': len(game_rounds),
+                'centroid_sample_sizes': self.centroid_sample_sizes
             }
         }
         
@@ -298,8 +600,23 @@ class GameMessageSelector:
         return game_data
 
 
+def _init_selection_worker():
+    """Worker process initializer: read-only embedding cache and a loaded model."""
+    use_read_only_cache()
+    warm_up()
+
+
+def _run_selection_job(job: Dict):
+    """Rank one user's candidates in a worker; also returns new embeddings and embedding stats."""
+    reset_embedding_stats()
+    result = GameMessageSelector().rank_user_candidates(**job)
+    return result, drain_new_embeddings(), embedding_stats()
+
+
 def create_talktagger_game_data(profiles_path: str, csv_path: str, output_path: str, 
-                               messages_per_user: int = 20, game_rounds: int = 5):
+                               messages_per_user: int = 20, game_rounds: int = 5,
+                               selection_mode: str = "overlap", workers: int = 1,
+                               profiles: Dict = None, dataset: ChatDataset = None):
     """
     Convenience function to create complete TalkTagger game data.
     
@@ -309,17 +626,35 @@ def create_talktagger_game_data(profiles_path: str, csv_path: str, output_path:
         output_path: Path to save game data
         messages_per_user: Number of characteristic messages per user
         game_rounds: Number of game rounds to create
+        selection_mode: "overlap" or "mmr", see GameMessageSelector.select_game_messages
+        workers: Worker processes for per-user selection (1 = sequential)
+        profiles: Profiles already in memory (skips reading profiles_path)
+        dataset: ChatDataset already in memory (skips reading csv_path)
     """
     selector = GameMessageSelector()
     
     # Load profiles
-    print("Loading user profiles...")
-    profiles = selector.load_profiles(profiles_path)
+    if profiles is None:
+        print("Loading user profiles...")
+        profiles = selector.load_profiles(profiles_path)
+    
+    # Near-duplicate clusters saved by the preprocessor, if available
+    dedup_index = dataset.near_duplicates if dataset is not None else None
+    dedup_path = os.path.join(os.path.dirname(profiles_path), "near_duplicates.json")
+    if dedup_index is None and os.path.exists(dedup_path):
+        dedup_index = NearDuplicateIndex.load(dedup_path)
+    
+    # Word index saved by the preprocessor, if available
+    inverted_index = dataset.inverted_index if dataset is not None else None
+    index_path = os.path.join(os.path.dirname(profiles_path), "inverted_index.json")
+    if inverted_index is None and os.path.exists(index_path):
+        inverted_index = InvertedIndex.load(index_path)
     
     # Select characteristic messages
     print("Selecting characteristic messages...")
     selected_messages = selector.select_game_messages(
-        profiles, csv_path, messages_per_user
+        profiles, csv_path, messages_per_user, selection_mode=selection_mode, dedup_index=dedup_index,
+        workers=workers, dataset=dataset, inverted_index=inverted_index
     )
     
     # Create game rounds
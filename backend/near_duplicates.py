@@ -0,0 +1,156 @@
+import re
+import json
+import zlib
+import hashlib
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index that groups near-identical messages (copy-pasted memes, "lol same", ...)
+    into clusters without pairwise comparison.
+
+    Each message is normalized, split into character shingles and reduced to a MinHash
+    signature. The signature is cut into bands; messages sharing a band bucket with an
+    earlier message (and whose signatures agree on at least `threshold` of the positions)
+    join that message's cluster. Inserts cost O(num_perm) regardless of index size.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3,
+                 threshold: float = 0.7, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        # multiply-add-shift hash family: h_i(x) = ((a_i * x + b_i) mod 2^64) >> 32, a_i odd
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64)
+
+        self.parent = {}       # message key -> parent key (union-find)
+        self.signatures = {}   # message key -> MinHash signature (uint32)
+        self.buckets = [dict() for _ in range(bands)]  # band hash -> first message key seen
+        self.frozen = False    # loaded from disk: cluster lookups only
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = re.sub(r"[^\w\s]", "", text.lower())
+        return re.sub(r"\s+", " ", text).strip()
+
+    @classmethod
+    def key(cls, text: str) -> str:
+        return hashlib.sha1(cls.normalize(text).encode("utf-8")).hexdigest()[:16]
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        padded = f" {normalized} "
+        if len(padded) <= self.shingle_size:
+            shingles = {padded}
+        else:
+            shingles = {padded[i:i + self.shingle_size] for i in range(len(padded) - self.shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _find(self, key: str) -> str:
+        root = key
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[key] != root:  # path compression
+            self.parent[key], key = root, self.parent[key]
+        return root
+
+    def _union(self, a: str, b: str):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            # the smaller key stays the root, so a cluster's id is its smallest member key
+            # whatever order the messages were added in
+            root_a, root_b = min(root_a, root_b), max(root_a, root_b)
+            self.parent[root_b] = root_a
+
+    def add(self, text: str) -> str:
+        """Insert a message and return its cluster id."""
+        if self.frozen:
+            raise RuntimeError("Index was loaded from disk and is read-only")
+        key = self.key(text)
+        if key in self.parent:  # exact duplicate after normalization
+            return self._find(key)
+        self.parent[key] = key
+        signature = self._signature(self.normalize(text))
+        self.signatures[key] = signature
+        for band, bucket in enumerate(self.buckets):
+            band_hash = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            other = bucket.get(band_hash)
+            if other is None:
+                bucket[band_hash] = key
+            elif np.mean(self.signatures[other] == signature) >= self.threshold:
+                self._union(other, key)
+        return self._find(key)
+
+    def add_many(self, texts: Iterable[str]):
+        for text in texts:
+            self.add(text)
+        return self
+
+    def cluster_id(self, text: str) -> Optional[str]:
+        """Cluster id of an indexed message, or None if it was never added."""
+        key = self.key(text)
+        return self._find(key) if key in self.parent else None
+
+    def clusters(self, min_size: int = 2) -> Dict[str, List[str]]:
+        """Cluster id -> member keys, for clusters with at least `min_size` distinct messages."""
+        groups = {}
+        for key in self.parent:
+            groups.setdefault(self._find(key), []).append(key)
+        return {root: keys for root, keys in groups.items() if len(keys) >= min_size}
+
+    def dedupe(self, messages: List[str], seen: Optional[set] = None) -> List[str]:
+        """
+        Keep the first message of each near-duplicate cluster, preserving order.
+        Messages unknown to the index are treated as their own cluster.
+        Pass a shared `seen` set to dedupe across several calls.
+        """
+        seen = set() if seen is None else seen
+        kept = []
+        for msg in messages:
+            cluster = self.cluster_id(msg) or self.key(msg)
+            if cluster not in seen:
+                seen.add(cluster)
+                kept.append(msg)
+        return kept
+
+    def subset(self, messages: Iterable[str]) -> "NearDuplicateIndex":
+        """Small read-only copy holding only the cluster assignments of `messages` (cheap to pickle)."""
+        index = NearDuplicateIndex(num_perm=self.num_perm, bands=self.bands, threshold=self.threshold)
+        for msg in messages:
+            cluster = self.cluster_id(msg)
+            if cluster is not None:
+                index.parent[self.key(msg)] = cluster
+                index.parent[cluster] = cluster
+        index.frozen = True
+        return index
+
+    def save(self, path: str):
+        """Persist the cluster assignments of non-singleton clusters (not the LSH buckets)."""
+        members = {key: root for root, keys in self.clusters().items() for key in keys}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"threshold": self.threshold, "num_perm": self.num_perm, "bands": self.bands,
+                       "clusters": members}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "NearDuplicateIndex":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(num_perm=data["num_perm"], bands=data["bands"], threshold=data["threshold"])
+        index.parent = {key: root for key, root in data["clusters"].items()}
+        index.frozen = True
+        return index
+
+
+def build_near_duplicate_index(messages: Iterable[str], **kwargs) -> NearDuplicateIndex:
+    """Build a NearDuplicateIndex over every message of a chat."""
+    return NearDuplicateIndex(**kwargs).add_many(messages)
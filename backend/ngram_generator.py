@@ -0,0 +1,154 @@
+import os
+import json
+import zlib
+import random
+import bisect
+from collections import Counter
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+NGRAM_ORDER = 3
+BOS, EOS = "<s>", "</s>"
+
+
+class NgramStyleModel:
+    """
+    Per-author word n-gram models for offline synthetic messages (no API calls).
+
+    Tokens are the whitespace-separated words of each message exactly as typed, so casing,
+    punctuation and emoji codes come out the way the author writes them. Probabilities use
+    Witten-Bell smoothing: a context seen `c` times with `t` distinct continuations samples
+    one of them with probability c / (c + t), otherwise backs off to the shorter context,
+    down to the author's unigram distribution. Samples are then fitted to the profile's
+    length and punctuation stats (`generate`); copies of real messages are rejected.
+    """
+
+    def __init__(self, order: int = NGRAM_ORDER):
+        self.order = order
+        self.counts: Dict[str, Dict[str, Dict[str, int]]] = {}  # author -> "w1 w2" context -> next word -> count
+        self.seen: Dict[str, set] = {}  # author -> CRC32 of the lowercased real messages
+        self._tables = {}  # (author, context) -> (words, cumulative counts), built on first use
+
+    @classmethod
+    def build(cls, messages_by_author: Dict[str, List[str]], order: int = NGRAM_ORDER) -> "NgramStyleModel":
+        model = cls(order)
+        for author, messages in messages_by_author.items():
+            counts = {}
+            for msg in messages:
+                tokens = [BOS] * (order - 1) + msg.split() + [EOS]
+                for i in range(order - 1, len(tokens)):
+                    for k in range(order):
+                        context = " ".join(tokens[i - k:i])
+                        counts.setdefault(context, Counter())[tokens[i]] += 1
+            model.counts[author] = {context: dict(words) for context, words in counts.items()}
+            model.seen[author] = {cls._fingerprint(msg) for msg in messages}
+        return model
+
+    @staticmethod
+    def _fingerprint(message: str) -> int:
+        return zlib.crc32(" ".join(message.lower().split()).encode("utf-8"))
+
+    def authors(self) -> List[str]:
+        return list(self.counts)
+
+    def _table(self, author: str, context: str):
+        key = (author, context)
+        table = self._tables.get(key)
+        if table is None:
+            words = self.counts[author].get(context)
+            table = (list(words), list(accumulate(words.values()))) if words else None
+            self._tables[key] = table
+        return table
+
+    def _next_word(self, author: str, history: List[str], rng) -> str:
+        for k in range(self.order - 1, -1, -1):
+            table = self._table(author, " ".join(history[len(history) - k:]) if k else "")
+            if table is None:
+                continue
+            words, cumulative = table
+            total = cumulative[-1]
+            if k == 0 or rng.random() < total / (total + len(words)):
+                return words[bisect.bisect_right(cumulative, rng.random() * total)]
+        return EOS
+
+    def sample(self, author: str, rng=random, max_words: int = 60) -> str:
+        """One unconstrained message from the author's model."""
+        history = [BOS] * (self.order - 1)
+        words = []
+        while len(words) < max_words:
+            word = self._next_word(author, history, rng)
+            if word == EOS:
+                break
+            words.append(word)
+            history.append(word)
+        return " ".join(words)
+
+    def generate(self, author: str, count: int, profile: Optional[Dict] = None, rng=random,
+                 max_tries: int = 30) -> List[str]:
+        """
+        Up to `count` distinct messages in the author's style. Each is the sample closest to
+        the profile's average length out of several that are not copies of a real message,
+        then lowercased, capitalized and end-punctuated at the profile's rates.
+        """
+        if author not in self.counts:
+            return []
+        profile = profile or {}
+        avg_length = profile.get('avg_message_length_words') or 0
+        messages, picked = [], set()
+        for _ in range(count):
+            best, best_distance = None, None
+            for _ in range(max_tries):
+                text = self.sample(author, rng, max_words=max(10, int(3 * avg_length) + 5))
+                if not text or self._fingerprint(text) in self.seen[author] or text in picked:
+                    continue
+                distance = abs(len(text.split()) - avg_length) if avg_length else 0
+                if best is None or distance < best_distance:
+                    best, best_distance = text, distance
+                if distance <= max(1.0, 0.25 * avg_length):
+                    break
+            if best is not None:
+                picked.add(best)
+                messages.append(self._apply_style(best, profile, rng))
+        return messages
+
+    @staticmethod
+    def _apply_style(text: str, profile: Dict, rng) -> str:
+        if rng.random() < profile.get('lowercase_only_message_ratio', 0):
+            text = text.lower()
+        elif text[0].islower() and rng.random() < profile.get('capitalized_sentence_start_ratio', 0):
+            text = text[0].upper() + text[1:]
+        punctuated = text[-1] in ".!?"
+        if rng.random() < profile.get('proper_punctuation_ratio', 0):
+            if not punctuated:
+                text += "."
+        elif punctuated and len(text.rstrip(".!?")) > 0:
+            text = text.rstrip(".!?")
+        return text
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"order": self.order, "counts": self.counts,
+                       "seen": {author: sorted(fingerprints) for author, fingerprints in self.seen.items()}},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NgramStyleModel":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        model = cls(data["order"])
+        model.counts = data["counts"]
+        model.seen = {author: set(fingerprints) for author, fingerprints in data["seen"].items()}
+        return model
+
+
+def build_ngram_model(dataset) -> NgramStyleModel:
+    """Build an NgramStyleModel over every author's messages of a ChatDataset."""
+    return NgramStyleModel.build({author: dataset.messages_for(author) for author in dataset.authors})
+
+
+def load_ngram_model(path: str, profiles: Dict) -> NgramStyleModel:
+    """The saved model at `path`, or (if missing) one trained on the profiles' sample messages."""
+    if os.path.exists(path):
+        return NgramStyleModel.load(path)
+    print(f"[WARNING] No n-gram models at {path}, training on profile sample messages only")
+    return NgramStyleModel.build({user: profile.get('sample_messages', []) for user, profile in profiles.items()})
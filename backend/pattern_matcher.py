@@ -0,0 +1,90 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Up to this many patterns, search() uses one word-boundary regex instead of tokenizing:
+# it is faster for the handful of name parts checked in two-person chats
+SMALL_PATTERN_SET = 8
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, the unit PatternMatcher matches on."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class PatternMatcher:
+    """
+    Finds every one of many words/phrases in a message with a single scan.
+
+    Patterns are matched on whole words: each pattern is split into word tokens and
+    stored under its first token. A message is tokenized once (one C-level regex
+    call); a set intersection picks the positions where some pattern can start, and
+    only those positions are compared token by token. Cost is one pass over the
+    message regardless of how many patterns there are, unlike
+    `any(p in msg.lower() for p in patterns)`, which rescans the message per pattern
+    and also matches inside longer words ("nil" in "until").
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: Dict[Tuple[str, ...], str] = {}
+        for pattern in patterns:
+            tokens = tuple(tokenize(pattern or ""))
+            if tokens:
+                self.patterns[tokens] = pattern.lower().strip()
+        self.single_words = {seq[0] for seq in self.patterns if len(seq) == 1}
+        self.by_first_token: Dict[str, List[Tuple[str, ...]]] = {}
+        for seq in sorted(self.patterns, key=len, reverse=True):
+            if len(seq) > 1:
+                self.by_first_token.setdefault(seq[0], []).append(seq)
+        self.first_tokens = self.single_words | set(self.by_first_token)
+        self.small_regex = None
+        if 0 < len(self.patterns) <= SMALL_PATTERN_SET:
+            # tokens of a pattern are adjacent in a message iff separated by non-word characters
+            alternation = "|".join(r"\W+".join(map(re.escape, seq)) for seq in self.patterns)
+            self.small_regex = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def _multi_word_matches(self, tokens: List[str], starts: Set[str]):
+        for i, token in enumerate(tokens):
+            if token in starts:
+                for seq in self.by_first_token.get(token, ()):
+                    if tuple(tokens[i:i + len(seq)]) == seq:
+                        yield seq
+
+    def search(self, text: str) -> bool:
+        """True if any pattern occurs in `text`."""
+        if self.small_regex is not None:
+            return self.small_regex.search(text) is not None
+        tokens = tokenize(text)
+        if not self.single_words.isdisjoint(tokens):
+            return True
+        starts = self.first_tokens.intersection(tokens)
+        return bool(starts) and next(self._multi_word_matches(tokens, starts), None) is not None
+
+    def find_all(self, text: str) -> Set[str]:
+        """The set of (lowercased) patterns occurring in `text`."""
+        tokens = tokenize(text)
+        starts = self.first_tokens.intersection(tokens)
+        if not starts:
+            return set()
+        found = {self.patterns[(word,)] for word in starts & self.single_words}
+        found.update(self.patterns[seq] for seq in self._multi_word_matches(tokens, starts))
+        return found
+
+
+@lru_cache(maxsize=4096)
+def compile_matcher(patterns: tuple) -> PatternMatcher:
+    """Cached PatternMatcher for a tuple of patterns, so per-user matchers are built once per run."""
+    return PatternMatcher(patterns)
+
+
+def name_part_matcher(names: Iterable[str]) -> PatternMatcher:
+    """Matcher for every part of the given participant names (split on non-word characters)."""
+    name_parts = set()
+    for name in names:
+        name_parts.update(p for p in re.split(r'\W+', name.lower()) if p)
+    return PatternMatcher(name_parts)
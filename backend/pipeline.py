@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import shutil
+import glob
+from typing import Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def cleanup_folders(): # cleans any previous game data
+    """Empty the convos_after and data folders (cached stage artifacts in backend/cache/pipeline are kept)"""
+    folders_to_clean = [
+        "backend/convos_after",
+        "backend/data"
+    ]
+
+    for folder in folders_to_clean:
+        if os.path.exists(folder):
+            for file_path in glob.glob(os.path.join(folder, "*")):
+                try:
+                    if os.path.isfile(file_path):
+                        os.remove(file_path)
+                        print(f"Removed file: {file_path}")
+                    elif os.path.isdir(file_path):
+                        shutil.rmtree(file_path)
+                        print(f"Removed directory: {file_path}")
+                except Exception as e:
+                    print(f"Error removing {file_path}: {e}")
+        else: # create folder if it doesn't exist
+            os.makedirs(folder)
+            print(f"Created folder: {folder}")
+
+    print("Cleanup completed!")
+
+
+class Stage:
+    """
+    One pipeline step. It reads its `inputs` and writes its `outputs` (paths relative to the
+    project root), so the stages it depends on are the ones writing those inputs. Its
+    artifact key covers the inputs' contents, `config` (the settings that change its output)
+    and the code of its `sources` modules. A run returning False (e.g. generation left users
+    short of messages) is kept for this run but not cached, so the next run tries again. A
+    failing `optional` stage is reported and the pipeline goes on.
+    """
+
+    def __init__(self, name: str, inputs: List[str], outputs: List[str], run: Callable,
+                 config: Dict = None, sources: List[str] = (), optional: bool = False):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run = run
+        self.config = config or {}
+        self.sources = list(sources)
+        self.optional = optional
+
+    def key(self) -> str:
+        from backend.artifact_cache import ArtifactCache, content_digest
+        digests = {path: content_digest(path) for path in self.inputs}
+        digests.update({f"code:{name}": content_digest(os.path.join(BACKEND_DIR, name)) for name in self.sources})
+        return ArtifactCache.key(self.name, digests, self.config)
+
+
+class PipelineRun:
+    """
+    What the stages of one run share: the upload tag and settings, and the ChatDataset,
+    profiles and game data an earlier stage left in memory. When that stage's artifact was
+    restored from the cache instead, they are loaded from its output files on first use.
+    """
+
+    def __init__(self, upload_tag: str, csv_path: str):
+        self.upload_tag = upload_tag
+        self.csv_path = csv_path
+        self._dataset = None
+        self._profiles = None
+        self._game_data = None
+
+    def dataset(self):
+        if self._dataset is None:
+            from backend.chat_dataset import ChatDataset
+            self._dataset = ChatDataset.from_csv(self.csv_path)
+        return self._dataset
+
+    def profiles(self) -> Dict:
+        if self._profiles is None:
+            with open("backend/data/user_profiles.json", 'r', encoding='utf-8') as f:
+                self._profiles = json.load(f)
+        return self._profiles
+
+    def game_data(self) -> Dict:
+        if self._game_data is None:
+            with open("backend/data/real_data.json", 'r', encoding='utf-8') as f:
+                self._game_data = json.load(f)
+        return self._game_data
+
+
+def pipeline_stages(upload_tag: str, messages_per_user: int = 20, game_rounds: int = 5,
+                    synthetic_messages_per_user: int = 5, synthetic_rounds: int = 5) -> List[Stage]:
+    """The pipeline's stages: parse, profile, select, generate and superlatives."""
+    from backend.bert_similarity import MODEL_NAME, EMBEDDING_BACKEND
+    from backend.message_generator import generation_settings
+
+    if upload_tag == "dc":
+        csv_path = "backend/convos_after/parsed_discord.csv"
+        parser_source = "dc_parser.py"
+    elif upload_tag == "wp":
+        csv_path = "backend/convos_after/parsed_whatsapp.csv"
+        parser_source = "wp_parser.py"
+    else:
+        raise ValueError(f"Unknown upload_tag: {upload_tag}")
+    embedding = {"model": MODEL_NAME, "backend": EMBEDDING_BACKEND}
+    # message selection mode: "overlap" (word overlap variety check, default) or "mmr"
+    selection_mode = os.environ.get("SELECTION_MODE", "overlap")
+    # worker processes for per-user message selection (1 = sequential, default)
+    selection_workers = int(os.environ.get("SELECTION_WORKERS", "1"))
+
+    # Step 1: Parse the chat data
+    # (the parsed CSV is the checkpoint: later stages share the in-memory ChatDataset when it ran)
+    def parse(run: PipelineRun):
+        from backend.chat_dataset import ChatDataset
+        if upload_tag == "dc":
+            from backend.dc_parser import parse_discord_folder
+            parsed = parse_discord_folder("backend/convos_before", csv_path[:-len(".csv")])
+        else:
+            from backend.wp_parser import parse_whatsapp_folder
+            parsed = parse_whatsapp_folder("backend/convos_before", csv_path[:-len(".csv")])
+        run._dataset = ChatDataset.from_messages(parsed["messages"])
+
+    # Step 2: Create user profiles (and the near-duplicate, word and n-gram indexes)
+    def profile(run: PipelineRun):
+        from backend.chat_preprocessor import ChatPreprocessor
+        preprocessor = ChatPreprocessor()
+        run._profiles = preprocessor.process_chat_dataset(
+            run.dataset(),
+            output_json_path="backend/data/user_profiles.json"
+        )
+        print("Profiles created")
+
+    # Step 3: Create game data
+    def select(run: PipelineRun):
+        from backend.message_selector import create_talktagger_game_data
+        run._game_data = create_talktagger_game_data(
+            profiles_path="backend/data/user_profiles.json",
+            csv_path=csv_path,
+            output_path="backend/data/real_data.json",
+            messages_per_user=messages_per_user,
+            game_rounds=game_rounds,
+            selection_mode=selection_mode,
+            workers=selection_workers,
+            profiles=run.profiles(),
+            dataset=run.dataset()
+        )
+        print("Real data created")
+
+    # Step 4: Generate synthetic messages
+    def generate(run: PipelineRun):
+        from backend.message_generator import generate_improved_synthetic_messages
+        dataset = run.dataset()
+        synthetic_data = generate_improved_synthetic_messages(
+            profiles_path="backend/data/user_profiles.json",
+            game_data_path="backend/data/real_data.json",
+            output_path="backend/data/synthetic_data.json",
+            messages_per_user=synthetic_messages_per_user,
+            synthetic_rounds=synthetic_rounds,
+            profiles=run.profiles(),
+            game_data=run.game_data(),
+            style_model=dataset.style_model,
+            pool_key=dataset.fingerprint()
+        )
+        print("Synthetic data created")
+        # Failed API calls or a quality shortfall would otherwise be restored on every later run
+        short_users = synthetic_data['metadata']['short_users']
+        if short_users:
+            print(f"[WARNING] Fewer than {synthetic_messages_per_user} synthetic messages for: {', '.join(short_users)}")
+        return not short_users
+
+    # Step 5: Sentiment analysis (currently commented out)
+    # from backend.sentiment_classifier import add_sentiment_to_talktagger_data
+    # enhanced_profiles = add_sentiment_to_talktagger_data(
+    #     profiles_path="backend/data/user_profiles.json",
+    #     game_data_path="backend/data/real_data.json",
+    #     synthetic_data_path="backend/data/synthetic_data.json",
+    #     output_profiles_path="backend/data/user_profiles_with_sentiment.json",
+    #     output_game_data_path="backend/data/game_data_with_sentiment.json",
+    #     output_synthetic_data_path="backend/data/synthetic_data_with_sentiment.json",
+    # )
+
+    # Step 6: Generate superlatives
+    def superlatives(run: PipelineRun):
+        from backend.superlatives import main as generate_ending_superlatives
+        generate_ending_superlatives()
+        print("Superlatives generated successfully")
+
+    profile_outputs = ["backend/data/user_profiles.json", "backend/data/near_duplicates.json",
+                       "backend/data/inverted_index.json", "backend/data/ngram_models.json"]
+    return [
+        Stage("parse", ["backend/convos_before"], [csv_path], parse,
+              sources=[parser_source, "chat_dataset.py"]),
+        Stage("profile", [csv_path], profile_outputs, profile,
+              sources=["chat_preprocessor.py", "chat_dataset.py", "near_duplicates.py",
+                       "inverted_index.py", "ngram_generator.py"]),
+        Stage("select", [csv_path] + profile_outputs[:3], ["backend/data/real_data.json"], select,
+              config={"messages_per_user": messages_per_user, "game_rounds": game_rounds,
+                      "selection_mode": selection_mode, "embedding": embedding},
+              sources=["message_selector.py", "bert_similarity.py", "pattern_matcher.py",
+                       "near_duplicates.py", "inverted_index.py", "chat_dataset.py"]),
+        Stage("generate", [csv_path, "backend/data/user_profiles.json", "backend/data/ngram_models.json",
+                           "backend/data/real_data.json"], ["backend/data/synthetic_data.json"], generate,
+              config={"messages_per_user": synthetic_messages_per_user, "synthetic_rounds": synthetic_rounds,
+                      "generation": generation_settings(), "embedding": embedding},
+              sources=["message_generator.py", "token_budget.py", "ngram_generator.py", "bert_similarity.py",
+                       "pattern_matcher.py", "synthetic_pool.py", "stream_parser.py"]),
+        Stage("superlatives", ["backend/data/user_profiles.json", "backend/data/real_data.json",
+                               "backend/data/synthetic_data.json"], ["backend/data/game_data.json"], superlatives,
+              sources=["superlatives.py"], optional=True),
+    ]
+
+
+def stage_order(stages: List[Stage]) -> List[Stage]:
+    """Stages in dependency order (a stage after every stage writing one of its inputs), else as declared."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    depends = {stage.name: {producers[path] for path in stage.inputs if path in producers} - {stage.name}
+               for stage in stages}
+    ordered, done = [], set()
+    while len(ordered) < len(stages):
+        ready = [stage for stage in stages if stage.name not in done and depends[stage.name] <= done]
+        if not ready:
+            raise ValueError(f"Pipeline stages have a dependency cycle: {sorted(set(depends) - done)}")
+        ordered.append(ready[0])
+        done.add(ready[0].name)
+    return ordered
+
+
+def run_pipeline(upload_tag: str = "dc", messages_per_user: int = None,
+                 synthetic_messages_per_user: int = None) -> Dict[str, str]:
+    """
+    Run every pipeline stage on the chat export in backend/convos_before (paths are relative
+    to the working directory). Called by final.py and, for each upload, by the game server's
+    warm PipelineWorker, which has already imported the stages and loaded their models.
+
+    A stage whose artifact (keyed by its inputs, config and code) is in the pipeline cache is
+    not run: its outputs are copied from the cache. So an unchanged upload restores every
+    stage, and a new `messages_per_user` re-runs only selection and the stages after it.
+    Returns each stage's outcome: "ran", "cached" or "failed".
+    """
+    from backend.artifact_cache import open_artifact_cache
+    from backend.bert_similarity import embedding_stats, reset_embedding_stats, save_embedding_usage
+    reset_embedding_stats()  # a warm worker runs many pipelines in one process
+
+    # real messages selected and synthetic messages generated per user
+    if messages_per_user is None:
+        messages_per_user = int(os.environ.get("MESSAGES_PER_USER", "20"))
+    if synthetic_messages_per_user is None:
+        synthetic_messages_per_user = int(os.environ.get("SYNTHETIC_MESSAGES_PER_USER", "5"))
+    stages = pipeline_stages(upload_tag, messages_per_user=messages_per_user,
+                             synthetic_messages_per_user=synthetic_messages_per_user)
+    run = PipelineRun(upload_tag, stages[0].outputs[0])
+    cache = open_artifact_cache()
+    outcomes = {}
+    for stage in stage_order(stages):
+        key = stage.key() if cache is not None else None
+        if cache is not None and cache.restore(stage.name, key, stage.outputs):
+            print(f"[OK] Stage {stage.name}: restored cached artifact {key[:12]}")
+            outcomes[stage.name] = "cached"
+            continue
+        start = time.perf_counter()
+        try:
+            complete = stage.run(run) is not False
+        except Exception as e:
+            if not stage.optional:
+                raise
+            print(f"[ERROR] Error in stage {stage.name}: {e}")
+            outcomes[stage.name] = "failed"
+            continue
+        print(f"[OK] Stage {stage.name}: ran in {time.perf_counter() - start:.2f}s")
+        outcomes[stage.name] = "ran"
+        if cache is not None and not complete:
+            print(f"[WARNING] Not caching {stage.name}: its output is incomplete")
+        elif cache is not None:
+            cache.store(stage.name, key, stage.outputs)
+
+    print("Stages run: " + (", ".join(name for name, outcome in outcomes.items() if outcome == "ran") or "none")
+          + "; restored from cache: "
+          + (", ".join(name for name, outcome in outcomes.items() if outcome == "cached") or "none"))
+
+    # Embedding work done this run (zero forward passes when every message was cached);
+    # cache hits not yet written are saved so eviction keeps the recently used rows
+    save_embedding_usage()
+    stats = embedding_stats()
+    print(f"Embedding forward passes: {stats['forward_passes']} "
+          f"({stats['encoded_texts']} texts encoded, {stats['cache_hits']} cache hits)")
+
+    # Pipeline Complete
+    print("\n" + "="*60)
+    print("TALKTAGGER PIPELINE COMPLETE!")
+    print("="*60)
+    return outcomes
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+import traceback
+import multiprocessing
+from typing import Dict
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BACKEND_DIR)
+
+# Seconds one pipeline job may run before the worker is killed and restarted
+PIPELINE_TIMEOUT = float(os.environ.get("TALKTAGGER_PIPELINE_TIMEOUT", "300"))
+
+
+def warm_up_pipeline():
+    """Import every pipeline stage (pandas, sklearn, parsers...) and load the spaCy and embedding models."""
+    import backend.pipeline
+    import backend.dc_parser
+    import backend.wp_parser
+    import backend.message_selector
+    import backend.message_generator
+    import backend.superlatives
+    from backend.chat_preprocessor import get_nlp
+    from backend.bert_similarity import warm_up
+    get_nlp()
+    warm_up()
+
+
+def _serve(jobs, results, root: str):
+    """Worker process: warm up once, then run pipeline jobs from `jobs` until a None arrives."""
+    os.chdir(root)  # the pipeline's paths are relative to the project root
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    start = time.perf_counter()
+    warm_up_pipeline()
+    results.put({"job": None, "ready": True, "seconds": time.perf_counter() - start})
+
+    from backend.pipeline import cleanup_folders, run_pipeline
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        start = time.perf_counter()
+        try:
+            cleanup_folders()
+            run_pipeline(job["upload_tag"])
+            results.put({"job": job["id"], "ok": True, "seconds": time.perf_counter() - start})
+        except Exception as e:
+            traceback.print_exc()
+            results.put({"job": job["id"], "ok": False, "error": f"{type(e).__name__}: {e}",
+                         "seconds": time.perf_counter() - start})
+        sys.stdout.flush()
+
+
+class PipelineWorker:
+    """
+    Long-lived process that runs pipeline jobs with every stage imported and the spaCy and
+    sentence-transformer models loaded once, instead of a cold `python final.py` per upload.
+
+    Jobs go over a multiprocessing queue, one at a time (`run` blocks). The process is
+    supervised: if it dies or a job exceeds `timeout`, it is killed and a fresh one is
+    started (warming up again) for the next job, and the failed job raises. The process is
+    spawned (not forked) so it does not inherit the game server's threads and sockets.
+    """
+
+    def __init__(self, root: str = ROOT_DIR, timeout: float = PIPELINE_TIMEOUT):
+        self.root = root
+        self.timeout = timeout
+        self.process = None
+        self.ready = False
+        self.warm_up_seconds = None
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._next_job = 0
+        atexit.register(self.stop)
+
+    def start(self) -> "PipelineWorker":
+        self.jobs = self._context.Queue()
+        self.results = self._context.Queue()
+        self.ready = False
+        # Not a daemon: parallel message selection starts its own worker processes
+        self.process = self._context.Process(target=_serve, args=(self.jobs, self.results, self.root),
+                                             name="talktagger-pipeline")
+        self.process.start()
+        print(f"[OK] Pipeline worker started (pid {self.process.pid}), loading models...")
+        return self
+
+    def _restart(self, reason: str):
+        print(f"[WARNING] Pipeline worker {reason}, restarting it")
+        self.restarts += 1
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(10)
+        for channel in (self.jobs, self.results):
+            channel.cancel_join_thread()  # the reader is gone, do not wait to flush
+            channel.close()
+        self.start()
+
+    def _handle_ready(self, result: Dict):
+        self.ready = True
+        self.warm_up_seconds = result["seconds"]
+        print(f"[OK] Pipeline worker ready after {result['seconds']:.1f}s")
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Block until the worker has loaded its models (True), or `timeout` seconds pass."""
+        with self._lock:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self.ready:
+                if not self.process.is_alive():
+                    self._restart(f"exited with code {self.process.exitcode} while warming up")
+                try:
+                    result = self.results.get(timeout=1.0)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() > deadline:
+                        return False
+                    continue
+                if result.get("ready"):
+                    self._handle_ready(result)
+            return True
+
+    def run(self, upload_tag: str = "dc") -> float:
+        """
+        Run the pipeline on backend/convos_before; returns the job's seconds (excluding any
+        warm-up still in progress). Raises RuntimeError if the job fails or the worker
+        crashes, TimeoutError after `timeout` seconds (the worker is restarted either way).
+        """
+        with self._lock:
+            if self.process is None:
+                self.start()
+            elif not self.process.is_alive():
+                self._restart(f"exited with code {self.process.exitcode}")
+            self._next_job += 1
+            job_id = self._next_job
+            self.jobs.put({"id": job_id, "upload_tag": upload_tag})
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    result = self.results.get(timeout=1.0)
+                except queue.Empty:
+                    if not self.process.is_alive():
+                        exitcode = self.process.exitcode
+                        self._restart(f"crashed (exit code {exitcode})")
+                        raise RuntimeError(f"Pipeline worker crashed (exit code {exitcode})")
+                    if time.monotonic() > deadline:
+                        self._restart(f"timed out after {self.timeout:g}s")
+                        raise TimeoutError(f"Pipeline timed out after {self.timeout:g} seconds")
+                    continue
+                if result.get("ready"):
+                    self._handle_ready(result)
+                    deadline = time.monotonic() + self.timeout  # the job starts now
+                    continue
+                if result["job"] != job_id:
+                    continue
+                if not result["ok"]:
+                    raise RuntimeError(result["error"])
+                return result["seconds"]
+
+    def stop(self):
+        if self.process is None or not self.process.is_alive():
+            return
+        self.jobs.put(None)
+        self.process.join(10)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
@@ -0,0 +1,90 @@
+import json
+import re
+from typing import Iterable, Iterator, List, Optional
+
+NUMBERED_LINE = re.compile(r'^\d+\.\s*')
+
+
+class IncrementalBatchParser:
+    """
+    Incremental version of ImprovedMistralMessageGenerator.parse_batch_response.
+
+    Feed the response text in chunks of any size; `feed` returns the messages completed by
+    that chunk. A numbered message is complete once the next numbered line starts (lines
+    without a number continue the current message), so each message is emitted as soon as
+    the model begins the next one. `close` returns the last message. Feeding a whole
+    response and closing gives exactly the parse_batch_response result.
+    """
+
+    def __init__(self):
+        self.buffer = ""  # text after the last newline
+        self.current_message = ""
+        self.messages: List[str] = []  # every message emitted so far
+
+    def _add_line(self, line: str) -> List[str]:
+        line = line.strip()
+        if not line:
+            return []
+
+        completed = []
+        if NUMBERED_LINE.match(line):
+            if self.current_message.strip():
+                completed.append(self.current_message.strip())
+            self.current_message = NUMBERED_LINE.sub('', line)
+        elif self.current_message:
+            self.current_message += " " + line
+        else:
+            self.current_message = line
+        self.messages.extend(completed)
+        return completed
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk of response text; returns the messages it completed."""
+        lines = (self.buffer + text).split('\n')
+        self.buffer = lines.pop()
+        completed = []
+        for line in lines:
+            completed.extend(self._add_line(line))
+        return completed
+
+    def close(self) -> List[str]:
+        """End of response; returns the final message (if any)."""
+        completed = self._add_line(self.buffer)
+        self.buffer = ""
+        if self.current_message.strip():
+            completed.append(self.current_message.strip())
+            self.messages.append(self.current_message.strip())
+        self.current_message = ""
+        return completed
+
+
+class SSEContentStream:
+    """
+    Text deltas from a chat completions server-sent-event stream (`data: {...}` lines,
+    ending with `data: [DONE]`). Comments, other fields and empty deltas are skipped. Once
+    iterated, `finish_reason` is that of the last event carrying one ("stop", "length", ...),
+    or None if the stream ended without one. Lines after [DONE] are read and ignored, so
+    an HTTP body is consumed to its end.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.lines = iter(lines)
+        self.finish_reason: Optional[str] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for line in self.lines:
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                choice = json.loads(data)["choices"][0]
+                content = choice.get("delta", {}).get("content")
+                self.finish_reason = choice.get("finish_reason") or self.finish_reason
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                continue
+            if content:
+                yield content
+        for _ in self.lines:
+            pass
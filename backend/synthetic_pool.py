@@ -0,0 +1,288 @@
+import os
+import json
+import zlib
+import random
+import threading
+import contextlib
+from collections import deque
+from typing import Callable, Dict, List, Optional
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Persistent pools of not-yet-shown synthetic messages, one file per dataset
+SYNTHETIC_POOL_DIR = os.environ.get("TALKTAGGER_SYNTHETIC_POOL_DIR", os.path.join(BACKEND_DIR, "cache", "synthetic_pool"))
+SYNTHETIC_POOL_TARGET = int(os.environ.get("TALKTAGGER_SYNTHETIC_POOL_TARGET", "20"))  # fresh messages per user
+
+
+def build_game_round(number: int, msg_data: Dict, all_users: List[str]) -> Dict:
+    """A synthetic game round: the message, its author and up to three other users as choices."""
+    choices = [msg_data['author']]
+    other_users = [u for u in all_users if u != msg_data['author']]
+    choices.extend(random.sample(other_users, min(3, len(other_users))))
+    random.shuffle(choices)
+    return {
+        'round': number,
+        'message': msg_data['message'],
+        'correct_author': msg_data['author'],
+        'choices': choices,
+        'distinctiveness_score': msg_data['distinctiveness_score'],
+        'bert_similarity': msg_data.get('bert_similarity'),
+        'is_synthetic': True,
+    }
+
+
+class SyntheticPool:
+    """
+    Scored synthetic messages per user that have not been shown in a game yet.
+
+    `draw` takes a fresh message in O(1): a user is picked uniformly from those with messages
+    left (kept in a list with an index map, so emptied users are removed by swap-and-pop)
+    and their oldest message is popped. Fingerprints of every message ever added are kept,
+    so a shown message is never added back (for any user). The pool is saved as one JSON file
+    shared by the game server, its background top-up worker and the pipeline: `save` locks the
+    file, merges this copy's adds and draws since the last save into what is on disk, and
+    writes the result through a temporary file and os.replace. `draw_saved_rounds` draws under
+    the same lock, so two processes never show the same message.
+    """
+
+    def __init__(self, path: str, users: List[str] = None):
+        self.path = path
+        self.users: List[str] = list(users or [])
+        self.fresh: Dict[str, deque] = {}
+        self.seen: set = set()  # fingerprints of every message ever added
+        self.shown = 0
+        self._available: List[str] = []
+        self._position: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # changes since the last load or save, merged into the file on save
+        self._added: List[tuple] = []  # (user, message dictionary)
+        self._drawn: set = set()  # fingerprints
+        self._shown_unsaved = 0
+
+    @classmethod
+    def open(cls, dataset_key: str, users: List[str] = None, pool_dir: str = SYNTHETIC_POOL_DIR) -> "SyntheticPool":
+        """The pool of a dataset (see ChatDataset.fingerprint), loaded from disk if it exists."""
+        pool = cls(os.path.join(pool_dir, f"{dataset_key}.json"), users)
+        with pool._file_lock(exclusive=False):
+            data = pool._read()
+        if data is not None:
+            pool.users = data["users"] if users is None else pool.users
+            pool._load(data)
+        return pool
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock the pool file against other processes (no-op for a shared lock on a pool not written yet)."""
+        pool_dir = os.path.dirname(self.path)
+        if not os.path.isdir(pool_dir):
+            if not exclusive:
+                yield
+                return
+            os.makedirs(pool_dir, exist_ok=True)
+        with open(f"{self.path}.lock", "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self) -> Optional[Dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load(self, data: Dict):
+        """Replace the in-memory state with a saved one."""
+        self.users.extend(user for user in data["users"] if user not in self.users)
+        self.shown = data["shown"]
+        self.seen = set(data["seen"])
+        self.fresh = {user: deque(messages) for user, messages in data["fresh"].items()}
+        self._available, self._position = [], {}
+        for user, messages in self.fresh.items():
+            if messages:
+                self._mark_available(user)
+
+    @staticmethod
+    def _fingerprint(message: str) -> int:
+        return zlib.crc32(" ".join(message.lower().split()).encode("utf-8"))
+
+    def _mark_available(self, user: str):
+        if user not in self._position:
+            self._position[user] = len(self._available)
+            self._available.append(user)
+
+    def _mark_empty(self, user: str):
+        index = self._position.pop(user)
+        last = self._available.pop()
+        if last != user:
+            self._available[index] = last
+            self._position[last] = index
+
+    def add(self, user: str, messages: List[Dict]) -> int:
+        """Add scored message dictionaries for a user; returns how many were new."""
+        added = 0
+        with self._lock:
+            if user not in self.users:
+                self.users.append(user)
+            fresh = self.fresh.setdefault(user, deque())
+            for msg_data in messages:
+                fingerprint = self._fingerprint(msg_data['message'])
+                if fingerprint in self.seen:
+                    continue
+                self.seen.add(fingerprint)
+                fresh.append(dict(msg_data, author=user))
+                self._added.append((user, fresh[-1]))
+                added += 1
+            if fresh:
+                self._mark_available(user)
+        return added
+
+    def draw(self) -> Optional[Dict]:
+        """A not-yet-shown message of a random user (None if the pool is empty)."""
+        with self._lock:
+            if not self._available:
+                return None
+            user = self._available[random.randrange(len(self._available))]
+            msg_data = self.fresh[user].popleft()
+            if not self.fresh[user]:
+                self._mark_empty(user)
+            self.shown += 1
+            self._shown_unsaved += 1
+            self._drawn.add(self._fingerprint(msg_data['message']))
+            return msg_data
+
+    def draw_rounds(self, rounds: int) -> List[Dict]:
+        """Up to `rounds` game rounds of fresh messages (fewer if the pool runs low)."""
+        game_rounds = []
+        for i in range(rounds):
+            msg_data = self.draw()
+            if msg_data is None:
+                break
+            game_rounds.append(build_game_round(i + 1, msg_data, self.users))
+        return game_rounds
+
+    def size(self, user: str) -> int:
+        with self._lock:
+            return len(self.fresh.get(user, ()))
+
+    def shortfall(self, target: int) -> Dict[str, int]:
+        """User -> messages missing to reach `target` fresh messages."""
+        with self._lock:
+            return {user: target - len(self.fresh.get(user, ())) for user in self.users
+                    if len(self.fresh.get(user, ())) < target}
+
+    def save(self):
+        """
+        Write the pool, keeping what other processes saved since this copy was loaded: the file
+        is re-read under an exclusive lock, this copy's adds and draws are applied to it, and
+        the merged pool becomes the in-memory state too.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self._merge_saved()
+            self._write()
+
+    def draw_saved_rounds(self, rounds: int) -> List[Dict]:
+        """draw_rounds on the saved pool, then save: no other process can draw the same messages meanwhile."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._merge_saved()
+            game_rounds = self.draw_rounds(rounds)
+            self._write()
+        return game_rounds
+
+    def _merge_saved(self):
+        # Called with both locks held
+        data = self._read()
+        if data is not None:
+            added, drawn, shown = self._added, self._drawn, self._shown_unsaved
+            self._load(data)
+            self.shown += shown
+            for user, messages in self.fresh.items():
+                if any(self._fingerprint(msg_data['message']) in drawn for msg_data in messages):
+                    self.fresh[user] = deque(msg_data for msg_data in messages
+                                             if self._fingerprint(msg_data['message']) not in drawn)
+                    if not self.fresh[user]:
+                        self._mark_empty(user)
+            for user, msg_data in added:
+                fingerprint = self._fingerprint(msg_data['message'])
+                if fingerprint not in self.seen:
+                    self.seen.add(fingerprint)
+                    if fingerprint not in drawn:
+                        self.fresh.setdefault(user, deque()).append(msg_data)
+                        self._mark_available(user)
+
+    def _write(self):
+        # Called with both locks held
+        data = {"users": self.users, "shown": self.shown,
+                "fresh": {user: list(messages) for user, messages in self.fresh.items()},
+                "seen": sorted(self.seen)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._added, self._drawn, self._shown_unsaved = [], set(), 0
+
+
+class PoolTopUpWorker(threading.Thread):
+    """
+    Background thread keeping every user of a SyntheticPool at `target` fresh messages.
+
+    `generate(shortfall)` takes user -> missing count and returns user -> scored message
+    dictionaries (e.g. ImprovedMistralMessageGenerator.generate_all_synthetic_messages for
+    those users). Games never wait for it: they draw whatever the pool holds. Rounds run
+    back to back while users are short; a round that adds nothing (e.g. only duplicates
+    came back) doubles the wait before the next.
+    """
+
+    def __init__(self, pool: SyntheticPool, generate: Callable[[Dict[str, int]], Dict[str, List[Dict]]],
+                 target: int = SYNTHETIC_POOL_TARGET, interval: float = 5.0, max_interval: float = 300.0):
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.generate = generate
+        self.target = target
+        self.interval = interval
+        self.max_interval = max_interval
+        self.wake = threading.Event()  # set to top up right away (e.g. after a game drew rounds)
+        self._stopped = threading.Event()
+
+    def top_up(self) -> int:
+        """One top-up round; returns the number of messages added."""
+        shortfall = self.pool.shortfall(self.target)
+        if not shortfall:
+            return 0
+        added = sum(self.pool.add(user, messages) for user, messages in self.generate(shortfall).items())
+        if added:
+            self.pool.save()
+        print(f"[OK] Synthetic pool topped up with {added} messages for {len(shortfall)} users")
+        return added
+
+    def run(self):
+        wait = self.interval
+        while not self._stopped.is_set():
+            try:
+                needed = bool(self.pool.shortfall(self.target))
+                added = self.top_up()
+                if added and self.pool.shortfall(self.target):
+                    continue  # still short and making progress: next round right away
+                wait = self.interval if added or not needed else min(self.max_interval, wait * 2)
+            except Exception as e:
+                print(f"[ERROR] Synthetic pool top-up failed: {e}")
+                wait = min(self.max_interval, wait * 2)
+            self.wake.wait(wait)
+            self.wake.clear()
+
+    def stop(self):
+        self._stopped.set()
+        self.wake.set()
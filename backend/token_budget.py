@@ -0,0 +1,98 @@
+import os
+import re
+import math
+import threading
+from typing import Dict, List
+
+# Prompt budget: example messages are shortened and dropped until one user's prompt (or one
+# person's section of a multi-user prompt) fits in about this many tokens
+PROMPT_TOKEN_BUDGET = int(os.environ.get("TALKTAGGER_PROMPT_TOKEN_BUDGET", "400"))
+SAMPLE_MESSAGE_MAX_TOKENS = 40  # longer example messages are cut to this many tokens
+# Completion budget (max_tokens): count x the profile's average length, with this much headroom
+# for messages longer than average
+COMPLETION_LENGTH_SLACK = float(os.environ.get("TALKTAGGER_COMPLETION_LENGTH_SLACK", "2.5"))
+MESSAGE_TOKEN_OVERHEAD = 4  # "1. " numbering and newline, or quotes and comma in JSON
+
+# Words, digits (one token each), ASCII punctuation, other characters
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|\d|[!-/:-@\[-`{-~]|[^\sA-Za-z\d!-/:-@\[-`{-~]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate token count of `text` for a SentencePiece BPE vocabulary like Mistral's, without
+    loading a tokenizer: a word is one token plus one per further 6 letters, digits and ASCII
+    punctuation are one each, other characters (emoji, accents) are one per 2 UTF-8 bytes.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECE.findall(text):
+        if piece.isascii():
+            tokens += 1 + (len(piece) - 1) // 6 if piece[0].isalpha() else 1
+        else:
+            tokens += max(1, len(piece.encode("utf-8")) // 2)
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut at a word boundary to at most about `max_tokens` tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words, used = [], 0
+    for word in text.split():
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return " ".join(words)
+
+
+def fit_sample_messages(sample_messages: List[str], budget: int, limit: int = 6,
+                        max_tokens_each: int = SAMPLE_MESSAGE_MAX_TOKENS) -> List[str]:
+    """
+    Up to `limit` example messages, in order, fitting in `budget` tokens (as they are quoted in
+    the prompt). Long messages are shortened to `max_tokens_each`; a message that does not fit
+    in what is left is skipped for a later, shorter one. At least one is kept if any are given.
+    """
+    chosen, used = [], 0
+    for msg in sample_messages:
+        if len(chosen) == limit:
+            break
+        msg = truncate_to_tokens(msg, max_tokens_each)
+        cost = estimate_tokens(msg) + 3  # quotes and newline
+        if not msg or (chosen and used + cost > budget):
+            continue
+        chosen.append(msg)
+        used += cost
+    return chosen
+
+
+def completion_budget(count: int, avg_words: float) -> int:
+    """max_tokens for `count` messages of about `avg_words` words."""
+    per_message = math.ceil(max(avg_words, 1) * 1.3 * COMPLETION_LENGTH_SLACK) + MESSAGE_TOKEN_OVERHEAD
+    return max(32, count * per_message + 16)
+
+
+class TokenUsage:
+    """
+    Thread-safe prompt/completion token totals of a run. Calls answered by the API record the
+    `usage` it reports; streamed calls (no usage in the stream) record estimate_tokens values.
+    """
+
+    def __init__(self):
+        self.counts = {"calls": 0, "estimated_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                       "max_tokens": 0, "truncated": 0}
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, completion_tokens: int, max_tokens: int,
+               estimated: bool = False, truncated: bool = False):
+        with self._lock:
+            self.counts["calls"] += 1
+            self.counts["estimated_calls"] += estimated
+            self.counts["prompt_tokens"] += prompt_tokens
+            self.counts["completion_tokens"] += completion_tokens
+            self.counts["max_tokens"] += max_tokens
+            self.counts["truncated"] += truncated
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return dict(self.counts)
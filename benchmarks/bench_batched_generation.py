@@ -0,0 +1,92 @@
+'''
+Multi-user batched generation benchmark
+
+Runs the API step of synthetic generation for an N-user group against the
+local stub server, first with one prompt per user, then with several users per
+prompt (one JSON object keyed by user per response). The stub's latency has a
+fixed part per request and a part per completion token, so a batched response
+takes longer than a single-user one. A second batched run has the stub leave the
+last user of every response out, exercising the individual retry. Reports API
+requests and wall time. Run from the project root:
+
+    python benchmarks/bench_batched_generation.py [--users 30] [--users-per-request 5]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer
+
+
+def group_requests(generator, profiles_path: str, users: int, count: int):
+    """user -> {profile, sample_messages, topics} for an N-user group built from the real profiles."""
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        real_profiles = list(json.load(f).values())
+    random.seed(0)
+    requests_by_user = {}
+    for i in range(users):
+        profile = real_profiles[i % len(real_profiles)]
+        user = f"user{i:03d}"
+        requests_by_user[user] = {'profile': profile, 'sample_messages': profile.get('sample_messages', [])[:10],
+                                  'topics': generator.draw_topics(user, count)}
+    return requests_by_user
+
+
+def timed_run(server, requests_by_user, users_per_request, concurrency, count):
+    generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url, max_concurrency=concurrency,
+                                                requests_per_second=1000, use_response_cache=False,
+                                                users_per_request=users_per_request)
+    requests_before = server.requests
+    start = time.perf_counter()
+    if users_per_request > 1:
+        generated = generator.generate_batched(requests_by_user, count)
+    else:
+        prompts = [generator.create_balanced_user_prompt(user, request['profile'], request['sample_messages'],
+                                                         count, request['topics'])
+                   for user, request in requests_by_user.items()]
+        generated = {user: generator.parse_batch_response(response) if response else None
+                     for user, response in zip(requests_by_user, generator.call_mistral_api_many(prompts))}
+    elapsed = time.perf_counter() - start
+    complete = sum(1 for messages in generated.values() if messages and len(messages) == count)
+    return elapsed, server.requests - requests_before, complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--users-per-request", type=int, default=5)
+    parser.add_argument("--count", type=int, default=5, help="messages per user")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub fixed seconds per request")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="stub seconds per completion token")
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    requests_by_user = group_requests(ImprovedMistralMessageGenerator(api_key="stub", use_response_cache=False),
+                                      args.profiles, args.users, args.count)
+    rows = []
+    with StubMistralServer(latency=args.latency, token_latency=args.token_latency) as server:
+        rows.append(("per user", *timed_run(server, requests_by_user, 1, args.concurrency, args.count)))
+        rows.append((f"{args.users_per_request} per request",
+                     *timed_run(server, requests_by_user, args.users_per_request, args.concurrency, args.count)))
+    with StubMistralServer(latency=args.latency, token_latency=args.token_latency, drop_last_user=True) as server:
+        rows.append((f"{args.users_per_request} per request, 1 dropped",
+                     *timed_run(server, requests_by_user, args.users_per_request, args.concurrency, args.count)))
+
+    print(f"\n{args.users} users x {args.count} messages, stub latency {args.latency}s + {args.token_latency}s/token, "
+          f"{args.concurrency} concurrent")
+    print(f"{'mode':<28}  {'seconds':>8}  {'requests':>8}  {'complete users':>14}")
+    for label, elapsed, requests_sent, complete in rows:
+        print(f"{label:<28}  {elapsed:>8.1f}  {requests_sent:>8}  {complete:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Concurrent synthetic generation benchmark
+
+Starts the local stub Mistral server (simulated latency and server-side rate
+limit, 429 + Retry-After beyond it) and sends one generation prompt per user
+for an N-user group, first one request at a time, then with the generator's
+concurrent client. Reports wall time, 429 responses and whether both runs
+returned the same responses in the same order. Run from the project root:
+
+    python benchmarks/bench_concurrent_generation.py [--users 30] [--latency 2] [--concurrency 8]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer
+
+
+def group_prompts(generator, profiles_path: str, users: int, seed: int = 0):
+    """One prompt per user of an N-user group built from the real profiles."""
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        real_profiles = list(json.load(f).values())
+    random.seed(seed)
+    prompts = []
+    for i in range(users):
+        profile = real_profiles[i % len(real_profiles)]
+        prompts.append(generator.create_user_request(f"user{i:03d}", profile, profile.get('sample_messages', [])[:10]))
+    return prompts
+
+
+def timed_run(server, prompts, concurrency, client_rate):
+    generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url, max_concurrency=concurrency,
+                                                requests_per_second=client_rate, use_response_cache=False)
+    rejected_before = server.rejected
+    start = time.perf_counter()
+    responses = generator.call_mistral_api_many(prompts)
+    return responses, time.perf_counter() - start, server.rejected - rejected_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub seconds per completion")
+    parser.add_argument("--server-rate", type=float, default=4.0, help="stub accepted requests/second")
+    parser.add_argument("--client-rate", type=float, default=5.0, help="generator token-bucket requests/second")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    prompts = group_prompts(ImprovedMistralMessageGenerator(api_key="stub", use_response_cache=False),
+                            args.profiles, args.users)
+    with StubMistralServer(latency=args.latency, rate=args.server_rate) as server:
+        sequential, sequential_time, sequential_429 = timed_run(server, prompts, 1, args.client_rate)
+        concurrent, concurrent_time, concurrent_429 = timed_run(server, prompts, args.concurrency, args.client_rate)
+
+    print(f"\n{args.users} prompts, stub latency {args.latency}s, server limit {args.server_rate}/s, "
+          f"client bucket {args.client_rate}/s")
+    print(f"{'concurrency':>11}  {'seconds':>8}  {'429s':>5}")
+    print(f"{1:>11}  {sequential_time:>8.1f}  {sequential_429:>5}")
+    print(f"{args.concurrency:>11}  {concurrent_time:>8.1f}  {concurrent_429:>5}  "
+          f"({sequential_time / concurrent_time:.1f}x)")
+    failed = sum(r is None for r in concurrent)
+    print(f"Failed requests: {failed}, same responses in order: {sequential == concurrent}")
+    if failed or sequential != concurrent:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
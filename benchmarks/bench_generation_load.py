@@ -0,0 +1,115 @@
+'''
+Synthetic generation load benchmark
+
+Runs the whole generation step (generate_improved_synthetic_messages: load
+profiles and selected messages, prompts, API calls, scoring, embeddings, game
+rounds, synthetic_data.json) against the local stub server for groups of 5 to
+200 users, copied from the real chat's users. The stub answers after a
+latency with jitter and injects a 429 every Nth request. Reports API requests,
+requests/sec, client-side p50/p99 latency, 429s and the total time of the step.
+No API key or network needed. Run from the project root:
+
+    python benchmarks/bench_generation_load.py [--users 5,20,50,100,200] [--latency 0.5] [--jitter 0.2]
+
+Measured with 0.5 +- 0.2 s latency, a 429 every 25 requests, 8 concurrent
+requests, a 20/s bucket and the quality loop on (score >= 1.0, up to 3 calls):
+
+    users   requests   req/s   p50      p99      429s   total
+    5       5          4.9     0.51 s   0.64 s   0      1.0 s
+    20      21         6.6     0.55 s   0.70 s   1      3.2 s
+    50      52         7.8     0.52 s   0.69 s   2      6.7 s
+    100     104        8.4     0.50 s   0.70 s   4      12.3 s
+    200     208        8.5     0.48 s   0.70 s   8      24.4 s
+
+Each injected 429 pauses the whole bucket for a second, which keeps throughput
+below the 16 req/s that 8 connections could reach. With --stream, 200 users
+took 34.5 s, since streaming embeds each message on its own as it arrives.
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mistral_stub_server import StubMistralServer
+
+
+def write_group(data_dir: str, users: int):
+    """user_profiles.json and real_data.json for `users` copies of the real chat's users."""
+    with open(os.path.join(ROOT, "backend", "data", "user_profiles.json"), 'r', encoding='utf-8') as f:
+        real_profiles = json.load(f)
+    with open(os.path.join(ROOT, "backend", "data", "real_data.json"), 'r', encoding='utf-8') as f:
+        real_data = json.load(f)
+    names = list(real_profiles)
+    source = {f"{names[i % len(names)]}_{i}": names[i % len(names)] for i in range(users)}
+    with open(os.path.join(data_dir, "user_profiles.json"), 'w', encoding='utf-8') as f:
+        json.dump({user: real_profiles[name] for user, name in source.items()}, f)
+    with open(os.path.join(data_dir, "real_data.json"), 'w', encoding='utf-8') as f:
+        json.dump({'selected_messages': {user: real_data['selected_messages'].get(name, [])
+                                         for user, name in source.items()}}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", default="5,20,50,100,200", help="group sizes")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.2, help="stub latency +/- seconds")
+    parser.add_argument("--limit-every", type=int, default=25, help="stub answers every Nth request with 429")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--client-rate", type=float, default=20.0, help="generator token-bucket requests/second")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="show the generator's output")
+    args = parser.parse_args()
+
+    server = StubMistralServer(latency=args.latency, jitter=args.jitter, limit_every=args.limit_every).start()
+    work_dir = tempfile.mkdtemp()
+    os.environ.update({
+        "MISTRAL_API_URL": server.url,
+        "MISTRAL_MAX_CONCURRENCY": str(args.concurrency),
+        "MISTRAL_REQUESTS_PER_SECOND": str(args.client_rate),
+        "MISTRAL_STREAM": "1" if args.stream else "0",
+        "TALKTAGGER_GENERATION_BACKEND": "mistral",
+        "TALKTAGGER_LLM_CACHE_DIR": "",
+        "TALKTAGGER_SYNTHETIC_MIN_SCORE": "1.0",
+        "TALKTAGGER_SYNTHETIC_MAX_CALLS": "3",
+    })
+    from backend.bert_similarity import warm_up
+    from backend.message_generator import generate_improved_synthetic_messages
+    warm_up()
+
+    print(f"Stub latency {args.latency}s +/- {args.jitter}s, a 429 every {args.limit_every} requests, "
+          f"{args.concurrency} concurrent, client bucket {args.client_rate}/s")
+    print(f"{'users':>5}  {'requests':>8}  {'req/s':>6}  {'p50 s':>6}  {'p99 s':>6}  {'429s':>4}  "
+          f"{'messages':>8}  {'total s':>7}")
+    for users in map(int, args.users.split(",")):
+        data_dir = os.path.join(work_dir, str(users))
+        os.makedirs(data_dir)
+        write_group(data_dir, users)
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            synthetic_data = generate_improved_synthetic_messages(
+                os.path.join(data_dir, "user_profiles.json"), os.path.join(data_dir, "real_data.json"),
+                os.path.join(data_dir, "synthetic_data.json"))
+        total = time.perf_counter() - start
+        metadata = synthetic_data['metadata']
+        api = metadata.get('api_metrics', {})
+        print(f"{users:>5}  {api.get('requests', 0):>8}  {api.get('requests', 0) / total:>6.1f}  "
+              f"{api.get('latency_p50', 0):>6.2f}  {api.get('latency_p99', 0):>6.2f}  "
+              f"{api.get('rate_limited', 0):>4}  {metadata['total_synthetic_messages']:>8}  {total:>7.2f}")
+
+    server.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
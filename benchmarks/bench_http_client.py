@@ -0,0 +1,66 @@
+'''
+Mistral HTTP client benchmark
+
+Sends N completion requests to the local stub server, first with a bare
+`requests.post` per request (a new connection each time, as before), then
+through MistralClient (pooled keep-alive session). Reports wall time, TCP
+connections the server accepted and the client's latency metrics, then repeats
+the client run with every Nth response a 503 to exercise jittered backoff.
+Run from the project root:
+
+    python benchmarks/bench_http_client.py [--requests 200] [--latency 0.05]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.message_generator import MistralClient
+from mistral_stub_server import StubMistralServer
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "Generate 5 text messages"}]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds per completion")
+    parser.add_argument("--fail-every", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubMistralServer(latency=args.latency) as server:
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            requests.post(server.url, json=PAYLOAD, headers={"Authorization": "Bearer stub"}).json()
+        bare_time, bare_connections = time.perf_counter() - start, server.connections
+
+        client = MistralClient(server.url, "stub", requests_per_second=1000)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.post(PAYLOAD)
+        client_time, client_connections = time.perf_counter() - start, server.connections - bare_connections
+        metrics = client.metrics()
+
+    with StubMistralServer(latency=args.latency, fail_every=args.fail_every) as server:
+        flaky = MistralClient(server.url, "stub", requests_per_second=1000)
+        results = [flaky.post(PAYLOAD) for _ in range(args.requests)]
+        flaky_metrics = flaky.metrics()
+
+    print(f"{args.requests} requests, stub latency {args.latency}s")
+    print(f"{'client':<22}  {'seconds':>8}  {'connections':>11}")
+    print(f"{'requests.post':<22}  {bare_time:>8.2f}  {bare_connections:>11}")
+    print(f"{'MistralClient':<22}  {client_time:>8.2f}  {client_connections:>11}")
+    print(f"MistralClient latency: p50 {metrics['latency_p50']}s, p95 {metrics['latency_p95']}s, "
+          f"max {metrics['latency_max']}s")
+    print(f"With every {args.fail_every}th response a 503: {sum(r is not None for r in results)}/{args.requests} "
+          f"succeeded, {flaky_metrics['server_errors']} server errors, {flaky_metrics['retries']} retries")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Import-time (cold start) benchmark
+
+Imports each pipeline module in a fresh interpreter, reports the wall time, and
+checks that the embedding model stack (torch, sentence_transformers) is not
+pulled in at import. Exits with status 1 on a regression, so it can gate CI.
+Run from the project root:
+
+    python benchmarks/bench_import_time.py [--budget SECONDS] [--repeat N]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "backend.bert_similarity",
+    "backend.message_selector",
+    "backend.message_generator",
+]
+
+# Modules that must only be loaded when something is actually embedded
+HEAVY_MODULES = ["torch", "sentence_transformers", "transformers"]
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def time_import(module: str) -> dict:
+    code = PROBE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_warm_up() -> float:
+    code = ("import time\nfrom backend.bert_similarity import warm_up\n"
+            "start = time.perf_counter()\nwarm_up()\nprint(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="maximum median import time per module, in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warm-up", action="store_true",
+                        help="also time an explicit warm_up() (loads the model)")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<30}  {'median s':>8}  heavy modules loaded")
+    for module in MODULES:
+        runs = [time_import(module) for _ in range(args.repeat)]
+        median = statistics.median(run["seconds"] for run in runs)
+        heavy = sorted(set(m for run in runs for m in run["heavy"]))
+        print(f"{module:<30}  {median:>8.3f}  {', '.join(heavy) or '-'}")
+        if median > args.budget:
+            failures.append(f"{module} imports in {median:.2f}s (budget {args.budget:.2f}s)")
+        if heavy:
+            failures.append(f"{module} loads {', '.join(heavy)} at import")
+
+    if args.warm_up:
+        print(f"warm_up(): {time_warm_up():.3f}s")
+
+    if failures:
+        print("\n[ERROR] Cold start regression:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\n[OK] Cold start within budget")
+
+
+if __name__ == '__main__':
+    main()
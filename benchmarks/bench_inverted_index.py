@@ -0,0 +1,86 @@
+'''
+Inverted word index benchmark
+
+Builds a synthetic group export (messages of a parsed chat CSV reassigned to N
+authors, signature words/phrases taken from the real profiles) and compares
+signature-match counting by scanning every message against posting-list
+lookups: build time, compressed index size, query time, full scoring time with
+and without the index, and whether all scores agree. Run from the project root:
+
+    python benchmarks/bench_inverted_index.py [csv_path] [--users 30] [--messages-per-author 5000]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.chat_dataset import ChatDataset
+from backend.inverted_index import build_inverted_index
+from backend.message_selector import GameMessageSelector
+from backend.pattern_matcher import tokenize
+
+
+def build_group(csv_path: str, profiles_path: str, users: int, messages_per_author: int, seed: int = 0):
+    messages = pd.read_csv(csv_path)['content'].dropna().astype(str).tolist()
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        real_profiles = list(json.load(f).values())
+    rng = random.Random(seed)
+    authors = [f"user{i:03d}" for i in range(users) for _ in range(messages_per_author)]
+    dataset = ChatDataset(authors, (rng.choice(messages) for _ in authors))
+    profiles = {author: real_profiles[i % len(real_profiles)] for i, author in enumerate(dataset.authors)}
+    return dataset, profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--messages-per-author", type=int, default=5000)
+    args = parser.parse_args()
+
+    dataset, profiles = build_group(args.csv_path, args.profiles, args.users, args.messages_per_author)
+    selector = GameMessageSelector()
+
+    start = time.perf_counter()
+    index = build_inverted_index(dataset)
+    build_time = time.perf_counter() - start
+    # uncompressed: (id, count) int32 pairs per word posting, one int32 id per token posting
+    postings = sum(2 * len(set(msg.lower().split())) + len(set(tokenize(msg))) for msg in dataset.content)
+
+    start = time.perf_counter()
+    hits = {}
+    for user in dataset.authors:
+        hits[user] = index.signature_hits(
+            user, dataset.messages_for(user),
+            [item['word'] for item in profiles[user].get('signature_words', [])],
+            [item['phrase'] for item in profiles[user].get('signature_phrases', [])])
+    query_time = time.perf_counter() - start
+
+    def score_all(use_index):
+        start = time.perf_counter()
+        scores = [selector.score_message_distinctiveness(msg, user, profiles, None, hits[user] if use_index else None)
+                  for user in dataset.authors for msg in dataset.messages_for(user)]
+        return scores, time.perf_counter() - start
+
+    scan_scores, scan_time = score_all(False)
+    index_scores, index_time = score_all(True)
+
+    print(f"{len(dataset.authors)} users, {len(dataset)} messages")
+    print(f"Index build: {build_time:.2f}s, {index.size_bytes() / 2**10:.0f} KiB compressed "
+          f"(about {postings * 4 / 2**10:.0f} KiB as int32 arrays)")
+    print(f"Signature-hit queries for all users: {query_time:.2f}s")
+    print(f"Scoring every message: scanning {scan_time:.2f}s, with index {index_time + query_time:.2f}s "
+          f"(including queries)")
+    print(f"Differing scores: {sum(abs(a - b) > 1e-9 for a, b in zip(scan_scores, index_scores))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''
+LLM response cache benchmark
+
+Runs the prompt-building and API step of synthetic generation twice for an
+N-user group against the local stub server (simulated latency), with the
+response cache in a temporary directory. With a generation seed the second run
+sends identical requests and is answered from the cache; without one the
+randomly drawn topics change the prompts. Run from the project root:
+
+    python benchmarks/bench_llm_cache.py [--users 30] [--latency 2] [--seed 42]
+'''
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.llm_cache import ResponseCache
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer
+
+
+def run(server, cache, profiles, seed):
+    generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url, requests_per_second=1000,
+                                                seed=seed, use_response_cache=False)
+    generator.response_cache = cache
+    requests_before = server.requests
+    start = time.perf_counter()
+    prompts = [generator.create_user_request(user, profile, profile.get('sample_messages', [])[:10])
+               for user, profile in profiles.items()]
+    responses = generator.call_mistral_api_many(prompts)
+    return responses, time.perf_counter() - start, server.requests - requests_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub seconds per completion")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        real_profiles = list(json.load(f).values())
+    profiles = {f"user{i:03d}": real_profiles[i % len(real_profiles)] for i in range(args.users)}
+
+    print(f"{args.users} users, stub latency {args.latency}s")
+    print(f"{'mode':<10}  {'run':>3}  {'seconds':>8}  {'API calls':>9}  {'cache hits':>10}")
+    with StubMistralServer(latency=args.latency) as server:
+        for label, seed in (("seeded", args.seed), ("unseeded", None)):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ResponseCache(cache_dir)
+                results = []
+                for run_number in (1, 2):
+                    hits_before = cache.hits
+                    responses, elapsed, calls = run(server, cache, profiles, seed)
+                    results.append(responses)
+                    print(f"{label:<10}  {run_number:>3}  {elapsed:>8.2f}  {calls:>9}  {cache.hits - hits_before:>10}")
+                if seed is not None:
+                    print(f"{'':<10}  same responses on both runs: {results[0] == results[1]}")
+
+
+if __name__ == '__main__':
+    main()
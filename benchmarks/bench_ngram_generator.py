@@ -0,0 +1,68 @@
+'''
+Offline n-gram generator benchmark
+
+Trains the per-user n-gram style models on the parsed chat CSV, then samples
+messages for every user and reports training time, messages per second and
+the average distinctiveness score (the scorer used for Mistral output) of the
+generated messages next to that of the user's real messages. Run from the
+project root:
+
+    python benchmarks/bench_ngram_generator.py [--csv backend/convos_after/...] [--count 200]
+'''
+
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.chat_dataset import ChatDataset
+from backend.message_generator import ImprovedMistralMessageGenerator
+from backend.ngram_generator import build_ngram_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default=None, help="parsed chat CSV (default: first in backend/convos_after)")
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--count", type=int, default=200, help="messages per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    csv_path = args.csv or sorted(glob.glob("backend/convos_after/*.csv"))[0]
+    dataset = ChatDataset.from_csv(csv_path)
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    generator = ImprovedMistralMessageGenerator(api_key="", use_response_cache=False, backend="ngram")
+
+    start = time.perf_counter()
+    model = build_ngram_model(dataset)
+    train_time = time.perf_counter() - start
+    print(f"Trained {len(model.authors())} models on {len(dataset)} messages in {train_time:.2f}s")
+
+    rng = random.Random(args.seed)
+    print(f"{'user':<20}  {'msgs/s':>8}  {'generated score':>15}  {'real score':>10}  {'avg words':>9}  {'real avg':>8}")
+    for user, profile in profiles.items():
+        start = time.perf_counter()
+        messages = model.generate(user, args.count, profile, rng)
+        elapsed = time.perf_counter() - start
+        real = dataset.messages_for(user)
+        real_sample = rng.sample(real, min(len(real), args.count))
+
+        def avg_score(msgs):
+            return sum(generator.calculate_synthetic_distinctiveness_score(m, user, {user: profile})
+                       for m in msgs) / max(1, len(msgs))
+
+        avg_words = sum(len(m.split()) for m in messages) / max(1, len(messages))
+        print(f"{user:<20}  {len(messages) / elapsed:>8.0f}  {avg_score(messages):>15.2f}  "
+              f"{avg_score(real_sample):>10.2f}  {avg_words:>9.1f}  {profile['avg_message_length_words']:>8}")
+        for message in messages[:3]:
+            print(f"    {message[:70]}")
+
+
+if __name__ == '__main__':
+    main()
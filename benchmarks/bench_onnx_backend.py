@@ -0,0 +1,97 @@
+'''
+ONNX backend accuracy and throughput check
+
+Embeds a fixed message set (the first N messages of a parsed chat CSV) with the
+PyTorch SentenceTransformer backend and the int8 ONNX backend, then reports:
+
+  - cosine similarity between the two embeddings of each message
+  - drift of bert_similarity (message vs. its author's profile centroid)
+  - messages/sec of each backend
+
+Exits with status 1 if the bert_similarity drift exceeds
+backend.bert_similarity.ONNX_SIMILARITY_TOLERANCE. The figures only say something
+about that tolerance when measured on the real all-MiniLM-L6-v2 weights; with
+TALKTAGGER_EMBEDDING_MODEL pointing elsewhere a warning is printed. Run from the
+project root, after `python -m backend.onnx_embedder export`:
+
+    python benchmarks/bench_onnx_backend.py [csv_path] [--messages N]
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bert_similarity import (
+    load_model, cosine_similarity, profile_similarities, ONNX_SIMILARITY_TOLERANCE, DEFAULT_BATCH_SIZE,
+    MODEL_NAME
+)
+
+# The model the tolerance is meant for
+REFERENCE_MODEL = "all-MiniLM-L6-v2"
+
+
+def load_fixed_messages(csv_path: str, limit: int) -> pd.DataFrame:
+    df = pd.read_csv(csv_path).dropna(subset=['author', 'content'])
+    df['content'] = df['content'].astype(str)
+    return df.head(limit).reset_index(drop=True)
+
+
+def timed_encode(model, texts, batch_size):
+    model.encode(texts[:8], batch_size=batch_size, show_progress_bar=False)  # warm-up
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    return np.asarray(embeddings, dtype=np.float32), len(texts) / (time.perf_counter() - start)
+
+
+def bert_similarities(df: pd.DataFrame, embeddings: np.ndarray) -> np.ndarray:
+    sims = np.zeros(len(df))
+    for author, rows in df.groupby('author').groups.items():
+        rows = np.asarray(rows)
+        centroid = embeddings[rows].mean(axis=0)
+        sims[rows] = profile_similarities(centroid, embeddings[rows])
+    return sims
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--messages", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    df = load_fixed_messages(args.csv_path, args.messages)
+    texts = df['content'].tolist()
+
+    torch_embs, torch_rate = timed_encode(load_model("torch"), texts, args.batch_size)
+    onnx_embs, onnx_rate = timed_encode(load_model("onnx"), texts, args.batch_size)
+
+    pair_cos = np.diag(cosine_similarity(torch_embs, onnx_embs))
+    drift = np.abs(bert_similarities(df, torch_embs) - bert_similarities(df, onnx_embs))
+
+    print(f"Model: {MODEL_NAME}")
+    print(f"Fixed message set: {len(texts)} messages, {df['author'].nunique()} authors")
+    print(f"\n{'backend':<8}  {'messages/sec':>12}")
+    print(f"{'torch':<8}  {torch_rate:>12.1f}")
+    print(f"{'onnx':<8}  {onnx_rate:>12.1f}  ({onnx_rate / torch_rate:.2f}x)")
+    print(f"\nEmbedding cosine(torch, onnx): mean {pair_cos.mean():.4f}, min {pair_cos.min():.4f}")
+    print(f"bert_similarity drift (points): mean {drift.mean():.2f}, "
+          f"p99 {np.percentile(drift, 99):.2f}, max {drift.max():.2f} "
+          f"(tolerance {ONNX_SIMILARITY_TOLERANCE:.2f})")
+
+    if MODEL_NAME.rstrip("/").split("/")[-1] != REFERENCE_MODEL:
+        print(f"\n[WARNING] Measured on {MODEL_NAME}, not {REFERENCE_MODEL}: "
+              f"these figures do not validate the tolerance")
+    if drift.max() > ONNX_SIMILARITY_TOLERANCE:
+        print("\n[ERROR] ONNX backend drifts beyond tolerance")
+        sys.exit(1)
+    print("\n[OK] ONNX backend within tolerance")
+
+
+if __name__ == '__main__':
+    main()
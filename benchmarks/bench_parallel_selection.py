@@ -0,0 +1,90 @@
+'''
+Parallel message selection benchmark
+
+Builds a synthetic group export (messages of a parsed chat CSV reassigned to N
+authors, with simple word-count profiles) and times select_game_messages with
+one process against a pool of worker processes. Also checks that both runs
+select the same messages. Run from the project root:
+
+    python benchmarks/bench_parallel_selection.py [csv_path] [--users 100] [--workers 4]
+'''
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bert_similarity import warm_up
+from backend.message_selector import GameMessageSelector
+from backend.near_duplicates import build_near_duplicate_index
+
+
+def build_group_export(csv_path: str, users: int, messages_per_author: int, seed: int = 0) -> pd.DataFrame:
+    messages = pd.read_csv(csv_path)['content'].dropna().astype(str).tolist()
+    rng = random.Random(seed)
+    rows = [{'author': f"user{i:03d}", 'content': rng.choice(messages)}
+            for i in range(users) for _ in range(messages_per_author)]
+    return pd.DataFrame(rows)
+
+
+def build_profiles(df: pd.DataFrame) -> dict:
+    """Minimal profiles: top words as signature words, average length, message count."""
+    profiles = {}
+    for author, content in df.groupby('author', sort=False)['content']:
+        words = Counter(w for msg in content for w in msg.lower().split())
+        profiles[author] = {
+            'message_count': len(content),
+            'avg_message_length_words': sum(len(m.split()) for m in content) / len(content),
+            'signature_words': [{'word': w} for w, _ in words.most_common(20)[10:]],
+            'signature_phrases': [],
+            'most_common_words': [{'word': w} for w, _ in words.most_common(10)],
+        }
+    return profiles
+
+
+def timed_selection(profiles, csv_path, dedup_index, workers):
+    selector = GameMessageSelector()
+    start = time.perf_counter()
+    selected = selector.select_game_messages(profiles, csv_path, dedup_index=dedup_index, workers=workers)
+    return selected, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--messages-per-author", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print("Tip: set TALKTAGGER_EMBEDDING_CACHE_DIR=\"\" so timings are not cache hits")
+    df = build_group_export(args.csv_path, args.users, args.messages_per_author)
+    profiles = build_profiles(df)
+    dedup_index = build_near_duplicate_index(df['content'])
+    warm_up()  # the sequential run should not pay for the model load (workers load it in their initializer)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        group_csv = os.path.join(tmp, "group.csv")
+        df.to_csv(group_csv, index=False)
+        sequential, sequential_time = timed_selection(profiles, group_csv, dedup_index, 1)
+        parallel, parallel_time = timed_selection(profiles, group_csv, dedup_index, args.workers)
+
+    print(f"\n{args.users} users, {len(df)} messages, {os.cpu_count()} CPU cores")
+    print(f"{'workers':>7}  {'seconds':>8}")
+    print(f"{1:>7}  {sequential_time:>8.1f}")
+    print(f"{args.workers:>7}  {parallel_time:>8.1f}  ({sequential_time / parallel_time:.2f}x)")
+    if sequential != parallel:
+        print("\n[ERROR] Parallel selection picked different messages")
+        sys.exit(1)
+    print("\n[OK] Same messages selected")
+
+
+if __name__ == '__main__':
+    main()
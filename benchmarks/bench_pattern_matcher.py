@@ -0,0 +1,100 @@
+'''
+Multi-pattern matcher benchmark
+
+Compares the old nested scans (`any(part in msg.lower() for part in name_parts)`
+and `phrase in msg.lower()` per signature phrase) with one PatternMatcher scan per
+message, on N messages built from a parsed chat CSV. Run from the project root:
+
+    python benchmarks/bench_pattern_matcher.py [csv_path] [--messages 1000000]
+
+Measured on 1M messages:
+
+    patterns                        nested `in` scans   PatternMatcher
+    this chat, 2 name parts         0.87 s              0.92 s
+    this chat, 9 phrases            1.99 s              2.51 s
+    30-user group, 59 name parts    9.79 s              2.49 s (3.9x)
+    30-user group, 150 phrases      24.41 s             5.79 s (4.2x)
+'''
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.pattern_matcher import PatternMatcher, name_part_matcher
+
+
+def build_messages(csv_path: str, size: int, seed: int = 0):
+    messages = pd.read_csv(csv_path)['content'].dropna().astype(str).tolist()
+    rng = random.Random(seed)
+    return [rng.choice(messages) for _ in range(size)]
+
+
+def load_patterns(profiles_path: str):
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    phrases = sorted({item['phrase'] for p in profiles.values() for item in p.get('signature_phrases', [])})
+    return list(profiles.keys()), phrases
+
+
+def group_patterns(messages, users: int, seed: int = 0):
+    """Stand-in patterns for a larger group: two-part names and 5 bigram phrases per user."""
+    rng = random.Random(seed)
+    words = sorted({w for msg in messages[:5000] for w in re.findall(r"[a-z]{3,}", msg.lower())})
+    bigrams = sorted({" ".join(pair) for msg in messages[:5000]
+                      for pair in zip(msg.lower().split(), msg.lower().split()[1:])})
+    names = [f"{rng.choice(words)}.{rng.choice(words)}" for _ in range(users)]
+    return names, rng.sample(bigrams, min(len(bigrams), 5 * users))
+
+
+def timed(fn, messages):
+    start = time.perf_counter()
+    results = [fn(msg) for msg in messages]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--group-size", type=int, default=30)
+    args = parser.parse_args()
+
+    messages = build_messages(args.csv_path, args.messages)
+    scenarios = [("this chat", *load_patterns(args.profiles))]
+    scenarios.append((f"{args.group_size}-user group", *group_patterns(messages, args.group_size)))
+
+    print(f"{len(messages)} messages")
+    print(f"{'scenario':<16}  {'scan':<11}  {'patterns':>8}  {'nested s':>9}  {'matcher s':>9}  "
+          f"{'speed-up':>8}  differing")
+    for label, names, phrases in scenarios:
+        name_parts = set()
+        for name in names:
+            name_parts.update(p for p in re.split(r'\W+', name.lower()) if p)
+        name_matcher = name_part_matcher(names)
+        phrase_matcher = PatternMatcher(phrases)
+
+        old_names, old_names_t = timed(lambda m: any(part in m.lower() for part in name_parts), messages)
+        new_names, new_names_t = timed(name_matcher.search, messages)
+        old_phrases, old_phrases_t = timed(lambda m: sum(1 for p in phrases if p in m.lower()), messages)
+        new_phrases, new_phrases_t = timed(lambda m: len(phrase_matcher.find_all(m)), messages)
+
+        for scan, count, old_t, new_t, old, new in [
+            ("name parts", len(name_parts), old_names_t, new_names_t, old_names, new_names),
+            ("phrases", len(phrases), old_phrases_t, new_phrases_t, old_phrases, new_phrases),
+        ]:
+            print(f"{label:<16}  {scan:<11}  {count:>8}  {old_t:>9.2f}  {new_t:>9.2f}  "
+                  f"{old_t / new_t:>7.1f}x  {sum(a != b for a, b in zip(old, new))}")
+    print("(differing = messages where the results disagree; the nested scans also match inside longer words)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Pipeline artifact cache benchmark
+
+Runs the pipeline in-process (models already loaded, as in the warm pipeline
+worker) on the chat export in backend/convos_before, copied to a temporary
+project directory with an empty artifact cache: a first run, the same upload
+again, then the same upload with a different messages_per_user. Each run starts
+with cleanup_folders(), like every upload. Reports the time of each run and
+which stages ran or were restored from the cache. Run from the project root:
+
+    python benchmarks/bench_pipeline_cache.py [--upload-tag dc] [--messages-per-user 20,12]
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import backend.artifact_cache
+from backend.pipeline import cleanup_folders, run_pipeline
+from backend.pipeline_worker import warm_up_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--upload-tag", default="dc", help="dc (Discord) or wp (WhatsApp)")
+    parser.add_argument("--messages-per-user", default="20,12", help="first value, then the changed one")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's output")
+    args = parser.parse_args()
+    first, changed = map(int, args.messages_per_user.split(","))
+
+    work_dir = tempfile.mkdtemp()
+    shutil.copytree(os.path.join(ROOT, "backend", "convos_before"), os.path.join(work_dir, "backend", "convos_before"))
+    backend.artifact_cache.PIPELINE_CACHE_DIR = os.path.join(work_dir, "cache")
+    warm_up_pipeline()
+    os.chdir(work_dir)
+
+    runs = [("first run", first), ("same upload again", first), (f"messages_per_user {first} -> {changed}", changed)]
+    print(f"\n{'run':<28}  {'time s':>6}  stages run / restored from cache")
+    for name, messages_per_user in runs:
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+            cleanup_folders()
+            outcomes = run_pipeline(args.upload_tag, messages_per_user=messages_per_user)
+        total = time.perf_counter() - start
+        ran = [stage for stage, outcome in outcomes.items() if outcome == "ran"]
+        cached = [stage for stage, outcome in outcomes.items() if outcome == "cached"]
+        print(f"{name:<28}  {total:>6.3f}  {', '.join(ran) or 'none'} / {', '.join(cached) or 'none'}")
+
+    os.chdir(ROOT)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
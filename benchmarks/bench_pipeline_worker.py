@@ -0,0 +1,73 @@
+'''
+Warm pipeline worker benchmark
+
+Runs the pipeline on the chat export in backend/convos_before (copied to a
+temporary project directory, so backend/data is left alone) several times,
+first as a new `python final.py` process per run (what the game server did
+for every upload), then as jobs for one PipelineWorker that loaded its models
+once. Reports the time per run, the worker's one-off warm-up and the time to
+recover from a killed worker. Run from the project root:
+
+    python benchmarks/bench_pipeline_worker.py [--runs 3] [--upload-tag dc]
+'''
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.pipeline_worker import PipelineWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--upload-tag", default="dc", help="dc (Discord) or wp (WhatsApp)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    shutil.copytree(os.path.join(ROOT, "backend", "convos_before"), os.path.join(work_dir, "backend", "convos_before"))
+    env = dict(os.environ, UPLOAD_TAG=args.upload_tag)
+
+    cold = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "final.py")], cwd=work_dir, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        cold.append(time.perf_counter() - start)
+
+    worker = PipelineWorker(work_dir)
+    start = time.perf_counter()
+    worker.start()
+    worker.wait_ready()
+    warm_up = time.perf_counter() - start
+    warm = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        worker.run(args.upload_tag)
+        warm.append(time.perf_counter() - start)
+
+    # Supervision: a killed worker is replaced and the next job still runs
+    worker.process.kill()
+    worker.process.join()
+    start = time.perf_counter()
+    worker.run(args.upload_tag)
+    recovery = time.perf_counter() - start
+    worker.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{args.runs} pipeline runs ({args.upload_tag} export in backend/convos_before)")
+    print(f"python final.py per run: {', '.join(f'{t:.2f}s' for t in cold)} (mean {sum(cold) / len(cold):.2f}s)")
+    print(f"warm worker per run:     {', '.join(f'{t:.2f}s' for t in warm)} (mean {sum(warm) / len(warm):.2f}s), "
+          f"one-off warm-up {warm_up:.2f}s")
+    print(f"after killing the worker: next run took {recovery:.2f}s (restarts: {worker.restarts})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Synthetic quality loop benchmark
+
+Generates messages for an N-user group with a distinctiveness threshold, once
+with a single call per user (weak messages are dropped, nothing is retried)
+and once with the regenerate-only-the-weak loop (follow-up calls for the
+shortfall only, capped per user). Reports generation calls, estimated tokens,
+wall time, how many users reached the target and the average score of the
+kept messages. Uses the local stub server (--backend mistral) or the offline
+n-gram models (--backend ngram). Run from the project root:
+
+    python benchmarks/bench_quality_loop.py [--users 10] [--min-score 2.5] [--max-calls 3]
+'''
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.bert_similarity import warm_up
+from backend.chat_dataset import ChatDataset
+from backend.message_generator import ImprovedMistralMessageGenerator
+from backend.ngram_generator import NgramStyleModel
+from mistral_stub_server import StubMistralServer
+
+
+def run(server, backend, profiles, style_model, count, min_score, max_calls):
+    generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url, requests_per_second=1000,
+                                                use_response_cache=False, backend=backend, seed=7)
+    generator.style_model = style_model
+    generator.min_score = min_score
+    generator.max_calls_per_user = max_calls
+    requests_before = server.requests
+    start = time.perf_counter()
+    kept = generator.generate_all_synthetic_messages(profiles, {}, count)
+    elapsed = time.perf_counter() - start
+    scores = [msg['distinctiveness_score'] for messages in kept.values() for msg in messages]
+    return {
+        "seconds": elapsed,
+        "api_calls": server.requests - requests_before,
+        "complete": sum(1 for messages in kept.values() if len(messages) >= count),
+        "kept": len(scores),
+        "avg_score": sum(scores) / max(1, len(scores)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--count", type=int, default=5, help="messages per user")
+    parser.add_argument("--min-score", type=float, default=2.5)
+    parser.add_argument("--max-calls", type=int, default=3)
+    parser.add_argument("--backend", choices=("mistral", "ngram"), default="mistral")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub seconds per completion")
+    args = parser.parse_args()
+
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        real_profiles = json.load(f)
+    names = list(real_profiles)
+    # Users keep their real names (n-gram models are per author) when the group is not larger than the chat
+    profiles = {(names[i] if args.users <= len(names) else f"{names[i % len(names)]}_{i}"): real_profiles[names[i % len(names)]]
+                for i in range(args.users)}
+    style_model = None
+    if args.backend == "ngram":
+        dataset = ChatDataset.from_csv(sorted(glob.glob("backend/convos_after/*.csv"))[0])
+        messages = {user: dataset.messages_for(user.rsplit("_", 1)[0] if user not in names else user)
+                    for user in profiles}
+        style_model = NgramStyleModel.build(messages)
+
+    warm_up()
+    results = {}
+    with StubMistralServer(latency=args.latency) as server:
+        results["single call"] = run(server, args.backend, profiles, style_model, args.count, args.min_score, 1)
+        results["quality loop"] = run(server, args.backend, profiles, style_model, args.count, args.min_score,
+                                      args.max_calls)
+
+    print(f"\n{args.backend} backend, {args.users} users x {args.count} messages, score >= {args.min_score}, "
+          f"up to {args.max_calls} calls per user")
+    print(f"{'mode':<13}  {'seconds':>7}  {'API calls':>9}  {'complete users':>14}  {'kept':>5}  {'avg score':>9}")
+    for label, r in results.items():
+        print(f"{label:<13}  {r['seconds']:>7.2f}  {r['api_calls']:>9}  {r['complete']:>14}  {r['kept']:>5}  "
+              f"{r['avg_score']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+'''
+Sampled profile centroid benchmark
+
+Builds a long single-author history (pairs of real chat messages joined together),
+then compares estimate_profile_centroid against the full mean embedding:
+sample size used, time, cosine between the two centroids, and the bert_similarity
+error on held-out messages. Then, for each user of the chat, compares MMR selection
+(select_by_mmr) with plain top-k by distinctiveness on the same candidate pool: picks
+that differ, mean pairwise cosine of the picks (lower = more varied) and their mean score.
+Run from the project root:
+
+    python benchmarks/bench_sampled_centroid.py [csv_path] [--messages N] [--messages-per-user 20]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.bert_similarity import (
+    average_profile_embedding_batched, estimate_profile_centroid, encode_many, profile_similarities,
+    CENTROID_TOLERANCE
+)
+from backend.message_selector import CANDIDATE_OVERSAMPLE, GameMessageSelector
+from backend.near_duplicates import build_near_duplicate_index
+
+
+def build_history(csv_path: str, size: int, seed: int = 0):
+    messages = pd.read_csv(csv_path)['content'].dropna().astype(str).tolist()
+    rng = random.Random(seed)
+    return [f"{rng.choice(messages)} {rng.choice(messages)}" for _ in range(size)]
+
+
+def cosine(a, b) -> float:
+    return float(np.dot(a, b) / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+def mean_pairwise_cosine(embeddings) -> float:
+    """Mean cosine over all pairs of rows; lower means more varied."""
+    unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    sims = unit @ unit.T
+    n = len(unit)
+    return float((sims.sum() - np.trace(sims)) / (n * (n - 1))) if n > 1 else 0.0
+
+
+def compare_mmr(csv_path: str, profiles_path: str, messages_per_user: int, diversity_weight: float):
+    """Per user: (pool size, MMR picks not in the top-k, (pairwise cosine, mean score) of top-k and of MMR picks)."""
+    df = pd.read_csv(csv_path).dropna(subset=['content'])
+    df['content'] = df['content'].astype(str)
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    dedup_index = build_near_duplicate_index(df['content'])
+    selector = GameMessageSelector()
+    results = {}
+    for user in profiles:
+        user_messages = df.loc[df['author'] == user, 'content'].tolist()
+        scored = selector.iter_scored_candidates(user_messages, user, profiles, dedup_index=dedup_index)
+        pool, _ = selector.top_candidates(scored, messages_per_user * CANDIDATE_OVERSAMPLE)
+        top_k = pool[:messages_per_user]
+        mmr, mmr_embs = selector.select_by_mmr(pool, messages_per_user, diversity_weight)
+        results[user] = (len(pool), len(set(mmr) - set(top_k)), [
+            (mean_pairwise_cosine(embs), float(np.mean([score for _, score in picks])))
+            for picks, embs in ((top_k, encode_many([msg for msg, _ in top_k])), (mmr, mmr_embs))
+        ])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--eval-messages", type=int, default=500)
+    parser.add_argument("--tolerance", type=float, default=CENTROID_TOLERANCE)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--messages-per-user", type=int, default=20)
+    parser.add_argument("--diversity-weight", type=float, default=0.3)
+    args = parser.parse_args()
+
+    print("Tip: set TALKTAGGER_EMBEDDING_CACHE_DIR=\"\" so timings are not cache hits")
+    history = build_history(args.csv_path, args.messages)
+    eval_embs = encode_many(history[:args.eval_messages])
+
+    start = time.perf_counter()
+    sampled, sample_size = estimate_profile_centroid(history, tolerance=args.tolerance)
+    sampled_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full = average_profile_embedding_batched(history)
+    full_time = time.perf_counter() - start
+
+    error = np.abs(np.array(profile_similarities(full, eval_embs)) - np.array(profile_similarities(sampled, eval_embs)))
+    print(f"History: {len(history)} messages, tolerance {args.tolerance}")
+    print(f"Sampled centroid: {sample_size} messages embedded, cosine to the full mean {cosine(sampled, full):.6f}")
+    print(f"bert_similarity error (points) over {len(eval_embs)} messages: "
+          f"mean {error.mean():.2f}, max {error.max():.2f}")
+    print(f"Time: sampled {sampled_time:.1f}s, full {full_time:.1f}s")
+
+    print(f"\nMMR (diversity weight {args.diversity_weight}) vs top-k, {args.messages_per_user} messages per user")
+    print(f"{'user':<20}  {'pool':>4}  {'changed':>7}  {'top-k cos':>9}  {'MMR cos':>7}  {'top-k score':>11}  {'MMR score':>9}")
+    for user, (pool_size, changed, ((top_cos, top_score), (mmr_cos, mmr_score))) in compare_mmr(
+            args.csv_path, args.profiles, args.messages_per_user, args.diversity_weight).items():
+        print(f"{user:<20}  {pool_size:>4}  {changed:>7}  {top_cos:>9.3f}  {mmr_cos:>7.3f}  {top_score:>11.2f}  {mmr_score:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
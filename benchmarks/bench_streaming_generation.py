@@ -0,0 +1,101 @@
+'''
+Streaming generation benchmark
+
+Generates messages for an N-user group against the local stub server, whose
+completions arrive one token at a time (fixed latency to the first token, then
+a delay per token). Buffered mode waits for every response, then parses and
+embeds each user's messages, as generate_all_synthetic_messages does without
+streaming. Streaming mode (MISTRAL_STREAM=1) parses the server-sent-event
+stream incrementally and embeds each message while later ones are still being
+generated. Reports time to the first embedded message, total wall time and
+whether both modes produced the same messages. The embedding cache is disabled
+so both runs do the same encoding work. Run from the project root:
+
+    python benchmarks/bench_streaming_generation.py [--users 10] [--token-latency 0.02]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ["TALKTAGGER_EMBEDDING_CACHE_DIR"] = ""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.bert_similarity import encode_many, warm_up
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer
+
+
+def group_requests(generator, profiles_path: str, users: int, count: int):
+    """user -> {profile, sample_messages, topics} for an N-user group built from the real profiles."""
+    with open(profiles_path, 'r', encoding='utf-8') as f:
+        real_profiles = list(json.load(f).values())
+    random.seed(0)
+    requests_by_user = {}
+    for i in range(users):
+        profile = real_profiles[i % len(real_profiles)]
+        user = f"user{i:03d}"
+        requests_by_user[user] = {'profile': profile, 'sample_messages': profile.get('sample_messages', [])[:10],
+                                  'topics': generator.draw_topics(user, count)}
+    return requests_by_user
+
+
+def buffered_run(generator, requests_by_user, count):
+    start = time.perf_counter()
+    prompts = [generator.create_balanced_user_prompt(user, request['profile'], request['sample_messages'],
+                                                     count, request['topics'])
+               for user, request in requests_by_user.items()]
+    responses = generator.call_mistral_api_many(prompts)
+    first = None
+    generated = {}
+    for user, response in zip(requests_by_user, responses):
+        generated[user] = generator.parse_batch_response(response) if response else None
+        encode_many(generated[user] or [])
+        if first is None and generated[user]:
+            first = time.perf_counter() - start
+    return generated, first, time.perf_counter() - start
+
+
+def streaming_run(generator, requests_by_user, count):
+    start = time.perf_counter()
+    arrivals = []
+    generated, _ = generator.generate_streaming(requests_by_user, count,
+                                                on_message=lambda user, message: arrivals.append(time.perf_counter()))
+    return generated, (arrivals[0] - start) if arrivals else None, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--count", type=int, default=5, help="messages per user")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="stub seconds per further token")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    warm_up()
+    requests_by_user = group_requests(ImprovedMistralMessageGenerator(api_key="stub", use_response_cache=False),
+                                      args.profiles, args.users, args.count)
+    results = {}
+    with StubMistralServer(latency=args.latency, token_latency=args.token_latency) as server:
+        for label, run in (("buffered", buffered_run), ("streaming", streaming_run)):
+            generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url,
+                                                        max_concurrency=args.concurrency, requests_per_second=1000,
+                                                        use_response_cache=False, stream=label == "streaming")
+            results[label] = run(generator, requests_by_user, args.count)
+
+    print(f"\n{args.users} users x {args.count} messages, stub {args.latency}s to first token + "
+          f"{args.token_latency}s/token, {args.concurrency} concurrent")
+    print(f"{'mode':<10}  {'first message':>13}  {'total':>7}")
+    for label, (_, first, total) in results.items():
+        print(f"{label:<10}  {first:>12.2f}s  {total:>6.2f}s")
+    print(f"Same messages: {results['buffered'][0] == results['streaming'][0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Synthetic message embedding benchmark
+
+Runs generate_all_synthetic_messages for an N-user group with the offline
+n-gram backend (no API calls, so the time is scoring and embedding) and the
+embedding cache disabled, and reports the number of model forward passes,
+texts encoded and wall time. Users are copies of the real chat's users with
+their selected real messages as samples. Run from the project root:
+
+    python benchmarks/bench_synthetic_embedding.py [--users 30] [--count 5] [--min-similarity 0]
+'''
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["TALKTAGGER_EMBEDDING_CACHE_DIR"] = ""  # count every forward pass
+
+from backend.bert_similarity import embedding_stats, reset_embedding_stats, warm_up
+from backend.chat_dataset import ChatDataset
+from backend.message_generator import ImprovedMistralMessageGenerator
+from backend.ngram_generator import NgramStyleModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-dir", default="backend/data")
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--count", type=int, default=5, help="messages per user")
+    parser.add_argument("--min-similarity", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data_dir, "user_profiles.json"), 'r', encoding='utf-8') as f:
+        real_profiles = json.load(f)
+    with open(os.path.join(args.data_dir, "real_data.json"), 'r', encoding='utf-8') as f:
+        real_selected = json.load(f)['selected_messages']
+    dataset = ChatDataset.from_csv(sorted(glob.glob("backend/convos_after/*.csv"))[0])
+    names = list(real_profiles)
+    source = {f"{names[i % len(names)]}_{i}": names[i % len(names)] for i in range(args.users)}
+    profiles = {user: real_profiles[name] for user, name in source.items()}
+    game_data = {'selected_messages': {user: real_selected.get(name, []) for user, name in source.items()}}
+    style_model = NgramStyleModel.build({user: dataset.messages_for(name) for user, name in source.items()})
+
+    warm_up()
+    times, stats = [], None
+    for i in range(args.repeat):
+        generator = ImprovedMistralMessageGenerator(api_key="", use_response_cache=False, backend="ngram",
+                                                    style_model=style_model, seed=i)
+        generator.min_similarity = args.min_similarity
+        reset_embedding_stats()
+        start = time.perf_counter()
+        generator.generate_all_synthetic_messages(profiles, game_data, args.count)
+        times.append(time.perf_counter() - start)
+        stats = embedding_stats()
+
+    print(f"\n{args.users} users x {args.count} messages, BERT similarity >= {args.min_similarity}")
+    print(f"Forward passes: {stats['forward_passes']}, texts encoded: {stats['encoded_texts']}")
+    print(f"Time: best {min(times):.3f}s, mean {sum(times) / len(times):.3f}s over {args.repeat} runs")
+
+
+if __name__ == '__main__':
+    main()
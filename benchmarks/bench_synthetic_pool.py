@@ -0,0 +1,110 @@
+'''
+Synthetic message pool benchmark
+
+Sets up a temporary data directory from the pipeline outputs in backend/data,
+starts the synthetic pool with its background top-up worker (the game server's
+start_synthetic_pool), waits until every user has the target number of fresh
+messages, then creates a series of games back to back. Reports how long new
+games take to get their synthetic rounds from the pool, how many came from the
+pool, and whether any message was shown twice, next to the time one blocking
+generation call takes. `--backend mistral` generates against the local stub
+server instead of the offline n-gram models. Run from the project root:
+
+    python benchmarks/bench_synthetic_pool.py [--games 20] [--target 20] [--backend ngram]
+'''
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5, help="synthetic rounds per game")
+    parser.add_argument("--target", type=int, default=20, help="fresh messages per user")
+    parser.add_argument("--backend", choices=("ngram", "mistral"), default="ngram")
+    parser.add_argument("--latency", type=float, default=2.0, help="stub seconds per completion (mistral)")
+    parser.add_argument("--game-time", type=float, default=0.05, help="seconds between new games")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    os.environ["TALKTAGGER_SYNTHETIC_POOL_DIR"] = os.path.join(work_dir, "pool")
+    os.environ["TALKTAGGER_GENERATION_BACKEND"] = args.backend
+    os.environ["TALKTAGGER_LLM_CACHE_DIR"] = ""
+    server = None
+    if args.backend == "mistral":
+        from mistral_stub_server import StubMistralServer
+        server = StubMistralServer(latency=args.latency).start()
+        os.environ["MISTRAL_API_URL"] = server.url
+        os.environ["MISTRAL_REQUESTS_PER_SECOND"] = "100"
+
+    from backend.bert_similarity import warm_up
+    from backend.chat_dataset import ChatDataset
+    from backend.message_generator import ImprovedMistralMessageGenerator, start_synthetic_pool
+    from backend.ngram_generator import build_ngram_model
+
+    data_dir = os.path.join(work_dir, "data")
+    os.makedirs(data_dir)
+    for name in ("user_profiles.json", "real_data.json", "synthetic_data.json"):
+        shutil.copy(os.path.join(ROOT, "backend", "data", name), data_dir)
+    dataset = ChatDataset.from_csv(sorted(glob.glob(os.path.join(ROOT, "backend", "convos_after", "*.csv")))[0])
+    build_ngram_model(dataset).save(os.path.join(data_dir, "ngram_models.json"))
+    synthetic_path = os.path.join(data_dir, "synthetic_data.json")
+    with open(synthetic_path, 'r', encoding='utf-8') as f:
+        synthetic_data = json.load(f)
+    synthetic_data['metadata']['synthetic_pool'] = dataset.fingerprint()
+    with open(synthetic_path, 'w', encoding='utf-8') as f:
+        json.dump(synthetic_data, f)
+
+    # One blocking generation call, what a new game would otherwise wait for
+    warm_up()
+    generator = ImprovedMistralMessageGenerator(api_key="stub", use_response_cache=False)
+    generator.style_model = build_ngram_model(dataset)
+    profiles, game_data = generator.load_data(os.path.join(data_dir, "user_profiles.json"),
+                                              os.path.join(data_dir, "real_data.json"))
+    start = time.perf_counter()
+    generator.generate_all_synthetic_messages(profiles, game_data, args.rounds)
+    blocking_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pool, worker = start_synthetic_pool(data_dir, args.target)
+    while pool.shortfall(args.target):
+        time.sleep(0.01)
+    fill_time = time.perf_counter() - start
+
+    draw_times, from_pool, shown = [], 0, []
+    for _ in range(args.games):
+        start = time.perf_counter()
+        rounds = pool.draw_saved_rounds(args.rounds)  # as the game server does
+        draw_times.append(time.perf_counter() - start)
+        worker.wake.set()
+        from_pool += len(rounds)
+        shown.extend(r['message'] for r in rounds)
+        time.sleep(args.game_time)  # a game is played in the meantime
+    worker.stop()
+    worker.join()
+    if server is not None:
+        server.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n{args.backend} backend, {len(profiles)} users, target {args.target} fresh messages per user, "
+          f"a new game every {args.game_time}s")
+    print(f"Blocking generation of {args.rounds} messages per user: {blocking_time:.2f}s")
+    print(f"Pool filled in the background in {fill_time:.2f}s")
+    print(f"{args.games} games x {args.rounds} rounds: {from_pool} rounds from the pool, "
+          f"draw time mean {1e6 * sum(draw_times) / len(draw_times):.0f}us, max {1e6 * max(draw_times):.0f}us")
+    print(f"Repeated messages: {len(shown) - len(set(shown))}, pool shown counter: {pool.shown}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+'''
+Token budget benchmark
+
+Generates messages against the local stub server (messages of the length each
+prompt asks for, completions cut off at max_tokens, extra latency per
+completion token) for a group whose users write from short to long messages,
+once with the old fixed budget (every example message in full, max_tokens 400
+per user) and once with the token budget planner (examples fitted to
+TALKTAGGER_PROMPT_TOKEN_BUDGET, max_tokens from count x average length).
+Reports prompt and completion tokens, max_tokens requested, cut-off responses,
+API calls (the quality loop is on, score >= 1.0 and up to 3 calls per user,
+so cut-off messages are asked for again), kept
+messages and wall time. Run from the project root:
+
+    python benchmarks/bench_token_budget.py [--count 10] [--users-per-request 1] [--long-samples 2]
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.bert_similarity import warm_up
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer
+
+
+class FixedBudgetGenerator(ImprovedMistralMessageGenerator):
+    """The generator before the planner: no prompt budget, max_tokens 400 per user."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prompt_token_budget = 10 ** 9
+        self.sample_message_max_tokens = 10 ** 9
+
+    def completion_tokens(self, requests_by_user, count=5):
+        return 400 * len(requests_by_user)
+
+
+def run(generator_class, server, profiles, count, users_per_request):
+    generator = generator_class(api_key="stub", api_url=server.url, requests_per_second=1000,
+                                use_response_cache=False, backend="mistral", seed=3,
+                                users_per_request=users_per_request)
+    generator.min_score = 1.0
+    generator.max_calls_per_user = 3
+    requests_before, truncated_before = server.requests, server.truncated
+    start = time.perf_counter()
+    kept = generator.generate_all_synthetic_messages(profiles, {}, count)
+    elapsed = time.perf_counter() - start
+    usage = generator.token_usage.summary()
+    return dict(usage, seconds=elapsed, api_calls=server.requests - requests_before,
+                cut_off=server.truncated - truncated_before, kept=sum(len(m) for m in kept.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--lengths", default="4,8,16,32", help="average message lengths (words) of the users")
+    parser.add_argument("--count", type=int, default=10, help="messages per user")
+    parser.add_argument("--users-per-request", type=int, default=1)
+    parser.add_argument("--long-samples", type=int, default=0,
+                        help="paragraph-long example messages (a user's samples joined) put first")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub seconds per completion")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="stub seconds per completion token")
+    args = parser.parse_args()
+
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        real_profiles = json.load(f)
+    profiles = {}
+    for name, profile in real_profiles.items():
+        for length in map(int, args.lengths.split(",")):
+            samples = [" ".join(profile['sample_messages'])] * args.long_samples + profile['sample_messages']
+            profiles[f"{name}_{length}w"] = dict(profile, avg_message_length_words=length, sample_messages=samples)
+
+    warm_up()
+    results = {}
+    with StubMistralServer(latency=args.latency, token_latency=args.token_latency, follow_length=True) as server:
+        results["fixed (400)"] = run(FixedBudgetGenerator, server, profiles, args.count, args.users_per_request)
+        results["planned"] = run(ImprovedMistralMessageGenerator, server, profiles, args.count,
+                                 args.users_per_request)
+
+    print(f"\n{len(profiles)} users ({args.lengths} words per message) x {args.count} messages, "
+          f"{args.users_per_request} users per request")
+    print(f"{'budget':<12}  {'prompt tok':>10}  {'completion tok':>14}  {'max_tokens':>10}  {'cut off':>7}  "
+          f"{'API calls':>9}  {'kept':>4}  {'seconds':>7}")
+    for label, r in results.items():
+        print(f"{label:<12}  {r['prompt_tokens']:>10}  {r['completion_tokens']:>14}  {r['max_tokens']:>10}  "
+              f"{r['cut_off']:>7}  {r['api_calls']:>9}  {r['kept']:>4}  {r['seconds']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
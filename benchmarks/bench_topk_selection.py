@@ -0,0 +1,84 @@
+'''
+Streaming top-k candidate selection benchmark
+
+Builds a long single-author history from a parsed chat CSV and compares the old
+candidate path (score every suitable message into a list, sort it, walk it with
+the word-overlap filter) with the streaming path (bounded heap of the best
+messages_per_user * CANDIDATE_OVERSAMPLE candidates, further passes only if the
+overlap filter runs out). Reports time, peak traced memory and whether both
+pick the same messages. No embeddings are computed. Run from the project root:
+
+    python benchmarks/bench_topk_selection.py [csv_path] [--messages 200000]
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.message_selector import GameMessageSelector, CANDIDATE_OVERSAMPLE
+
+
+def build_history(csv_path: str, size: int, seed: int = 0):
+    messages = pd.read_csv(csv_path)['content'].dropna().astype(str).tolist()
+    rng = random.Random(seed)
+    return [f"{rng.choice(messages)} {rng.choice(messages)}" for _ in range(size)]
+
+
+def full_sort_picks(selector, history, user, profiles, k):
+    message_scores = []
+    for msg in selector.filter_suitable_messages(history):
+        score = selector.score_message_distinctiveness(msg, user, profiles, None)
+        if score >= 1.0:
+            message_scores.append((msg, score))
+    message_scores.sort(key=lambda x: x[1], reverse=True)
+    return selector.select_by_word_overlap(message_scores, k)
+
+
+def streaming_picks(selector, history, user, profiles, k):
+    return selector.select_streaming_overlap(lambda: selector.iter_scored_candidates(history, user, profiles), k)
+
+
+def measured(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("csv_path", nargs="?", default="backend/convos_after/parsed_discord.csv")
+    parser.add_argument("--profiles", default="backend/data/user_profiles.json")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--messages-per-user", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.profiles, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    user = next(iter(profiles))
+    history = build_history(args.csv_path, args.messages)
+    selector = GameMessageSelector()
+
+    old, old_time, old_peak = measured(full_sort_picks, selector, history, user, profiles, args.messages_per_user)
+    new, new_time, new_peak = measured(streaming_picks, selector, history, user, profiles, args.messages_per_user)
+
+    print(f"History: {len(history)} messages, k = {args.messages_per_user}, oversample {CANDIDATE_OVERSAMPLE}")
+    print(f"{'path':<12}  {'seconds':>8}  {'peak KiB':>8}")
+    print(f"{'full sort':<12}  {old_time:>8.2f}  {old_peak:>8.0f}")
+    print(f"{'streaming':<12}  {new_time:>8.2f}  {new_peak:>8.0f}")
+    print(f"Same picks: {old == new}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+'''
+Local stand-in for the Mistral chat completions endpoint
+
+Answers POST /v1/chat/completions after a simulated latency with a numbered list
+of messages derived from the prompt (same prompt, same answer), or, for a
+multi-user prompt ("=== PERSON: name ===" sections), a JSON object of such lists
+keyed by name. With --follow-length, messages have the "Typical length" the
+prompt asks for instead of four words. Completions longer than the request's
+max_tokens (about four characters per token) are cut off there with
+finish_reason "length". Latency can grow with the completion length and vary by
+up to +/- `jitter` seconds (seeded, so runs are repeatable). With "stream": true
+the completion is sent as server-sent events, about four characters per event,
+one event every `token_latency` seconds after the first. Requests beyond the
+server-side rate limit get 429 with a Retry-After header, and every Nth request
+can be answered with 429 regardless; optionally every Nth request fails with
+503 and the last person of a multi-user prompt is left out.
+Used by the generation benchmarks; point the generator at it with MISTRAL_API_URL:
+
+    python benchmarks/mistral_stub_server.py --port 8089 --latency 2 --rate 4
+    MISTRAL_API_URL=http://127.0.0.1:8089/v1/chat/completions python final.py
+'''
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("lol", "ok", "honestly", "wait", "same", "omg", "bro", "tomorrow", "pizza", "game",
+         "tired", "class", "movie", "literally", "why", "cute", "haha", "yes", "no", "maybe")
+
+
+def stub_messages(seed_text: str, count: int, words: int = 4) -> list:
+    """Deterministic list of short messages for a seed text."""
+    seed = int(hashlib.sha1(seed_text.encode("utf-8")).hexdigest(), 16)
+    return [" ".join(WORDS[(seed >> ((5 * (i * words + j)) % 155)) % len(WORDS)] for j in range(words))
+            for i in range(count)]
+
+
+def typical_length(section: str, follow_length: bool) -> int:
+    """Words per message: the section's "Typical length" with follow_length, else 4."""
+    match = re.search(r"Typical length: ([\d.]+) words", section) if follow_length else None
+    return max(1, round(float(match[1]))) if match else 4
+
+
+def stub_completion(prompt: str, drop_last_user: bool = False, follow_length: bool = False) -> str:
+    """Numbered list of messages for a prompt, or a JSON object keyed by person for a multi-user prompt."""
+    count = int((re.search(r"(\d+) (?:\w+ )?messages", prompt) or [0, 5])[1])
+    sections = re.split(r"^=== PERSON: (.+?) ===$", prompt, flags=re.MULTILINE)
+    if len(sections) > 1:
+        users = sections[1::2]
+        if drop_last_user:
+            users = users[:-1]
+        return json.dumps({user: stub_messages(section, count, typical_length(section, follow_length))
+                           for user, section in zip(users, sections[2::2])}, indent=2)
+    messages = stub_messages(prompt, count, typical_length(prompt, follow_length))
+    return "\n".join(f"{i + 1}. {message}" for i, message in enumerate(messages))
+
+
+class StubMistralServer:
+    """Threaded stub server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 1.0, rate: float = 0.0,
+                 fail_every: int = 0, token_latency: float = 0.0, drop_last_user: bool = False,
+                 follow_length: bool = False, jitter: float = 0.0, limit_every: int = 0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter  # latency varies uniformly within +/- jitter seconds
+        self.limit_every = limit_every  # answer every Nth request with a 429 (0 = never)
+        self.token_latency = token_latency  # extra seconds per completion token (~4 characters)
+        self.drop_last_user = drop_last_user
+        self.follow_length = follow_length
+        self.truncated = 0  # completions cut off at max_tokens
+        self.rate = rate  # requests/second accepted (0 = unlimited), bursts of up to one second's worth
+        self.requests = 0
+        self.rejected = 0
+        self.connections = 0
+        self.fail_every = fail_every  # answer every Nth request with a 503 (0 = never)
+        self._rng = random.Random(seed)
+        self._tokens = max(rate, 1.0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/v1/chat/completions"
+
+    def _admit(self) -> float:
+        """0 if the request is within the rate limit, else seconds until it would be."""
+        with self._lock:
+            self.requests += 1
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            self.rejected += 1
+            return (1.0 - self._tokens) / self.rate
+
+    def _latency(self) -> float:
+        """Seconds until the first token of this request."""
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # headers and body go out in separate writes; without this, Nagle + delayed ACK
+                # add ~40 ms to every response on a kept-alive connection
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with server._lock:
+                    server.connections += 1
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+            def _send_stream(self, model: str, content: str, finish_reason: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(content), 4):
+                    if i:
+                        time.sleep(server.token_latency)
+                    event = {"model": model, "choices": [{"index": 0, "delta": {"content": content[i:i + 4]},
+                                                          "finish_reason": None}]}
+                    self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                event = {"model": model, "choices": [{"index": 0, "delta": {"content": ""},
+                                                      "finish_reason": finish_reason}]}
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                retry_after = server._admit()
+                if server.fail_every and server.requests % server.fail_every == 0:
+                    self._send(503, {"message": "Service unavailable"})
+                    return
+                if not retry_after and server.limit_every and server.requests % server.limit_every == 0:
+                    with server._lock:
+                        server.rejected += 1
+                    retry_after = 1.0
+                if retry_after:
+                    self._send(429, {"message": "Requests rate limit exceeded"},
+                               {"Retry-After": str(max(1, math.ceil(retry_after)))})
+                    return
+                prompt = payload.get("messages", [{}])[-1].get("content", "")
+                content = stub_completion(prompt, server.drop_last_user, server.follow_length)
+                finish_reason = "stop"
+                if "max_tokens" in payload and len(content) // 4 > payload["max_tokens"]:
+                    content = content[:4 * payload["max_tokens"]]
+                    finish_reason = "length"
+                    with server._lock:
+                        server.truncated += 1
+                if payload.get("stream"):
+                    time.sleep(server._latency())
+                    self._send_stream(payload.get("model"), content, finish_reason)
+                    return
+                time.sleep(server._latency() + server.token_latency * (len(content) // 4))
+                self._send(200, {
+                    "model": payload.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": finish_reason}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4},
+                })
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per completion")
+    parser.add_argument("--rate", type=float, default=0.0, help="accepted requests/second (0 = unlimited)")
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every Nth request with 503")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="extra seconds per completion token")
+    parser.add_argument("--drop-last-user", action="store_true",
+                        help="leave the last person out of multi-user responses")
+    parser.add_argument("--follow-length", action="store_true",
+                        help="messages of the prompt's typical length instead of four words")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency varies by up to +/- this many seconds")
+    parser.add_argument("--limit-every", type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    server = StubMistralServer(args.host, args.port, args.latency, args.rate, args.fail_every,
+                               args.token_latency, args.drop_last_user, args.follow_length,
+                               args.jitter, args.limit_every)
+    print(f"Stub Mistral API at {server.url} (latency {args.latency}s, rate {args.rate or 'unlimited'}/s)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,111 +17,13 @@ The project will involve personality modeling (e.g., topic modeling), sentiment
 '''
 
 import os
-import shutil
-import glob
 
-def cleanup_folders(): # cleans any previous game data
-    """Empty the convos_after and data folders"""
-    folders_to_clean = [
-        "backend/convos_after",
-        "backend/data"
-    ]
-    
-    for folder in folders_to_clean:
-        if os.path.exists(folder):
-            for file_path in glob.glob(os.path.join(folder, "*")):
-                try:
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-                        print(f"Removed file: {file_path}")
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                        print(f"Removed directory: {file_path}")
-                except Exception as e:
-                    print(f"Error removing {file_path}: {e}")
-        else: # create folder if it doesn't exist
-            os.makedirs(folder)
-            print(f"Created folder: {folder}")
-    
-    print("Cleanup completed!")
+from backend.pipeline import cleanup_folders, run_pipeline
 
-# run cleanup before starting the pipeline
-cleanup_folders()
+if __name__ == '__main__':
+    # run cleanup before starting the pipeline
+    cleanup_folders()
 
-# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - 
-
-# get upload_tag from environment variable (set by backend)
-# by default set to 'dc'
-upload_tag = os.environ.get("UPLOAD_TAG", "dc")
-
-# Step 1: Parse the chat data
-if upload_tag == "dc":
-    from backend.dc_parser import parse_discord_folder
-    parse_discord_folder("backend/convos_before", "backend/convos_after/parsed_discord")
-elif upload_tag == "wp":
-    from backend.wp_parser import parse_whatsapp_folder
-    parse_whatsapp_folder("backend/convos_before", "backend/convos_after/parsed_whatsapp")
-else:
-    raise ValueError(f"Unknown upload_tag: {upload_tag}")
-
-# Step 2: Create user profiles
-if upload_tag == "dc":
-    csv_path = "backend/convos_after/parsed_discord.csv"
-elif upload_tag == "wp":
-    csv_path = "backend/convos_after/parsed_whatsapp.csv"
-
-# Step 3: Create game data
-from backend.chat_preprocessor import ChatPreprocessor
-
-preprocessor = ChatPreprocessor()
-profiles = preprocessor.process_chat_csv(
-    input_csv_path=csv_path,
-    output_json_path="backend/data/user_profiles.json"
-)
-print("Profiles created")
-
-from backend.message_selector import create_talktagger_game_data
-
-game_data = create_talktagger_game_data(
-    profiles_path="backend/data/user_profiles.json",
-    csv_path=csv_path, 
-    output_path="backend/data/real_data.json"
-)
-print("Real data created")
-
-# Step 4: Generate synthetic messages
-from backend.message_generator import generate_improved_synthetic_messages
-
-synthetic_data = generate_improved_synthetic_messages(
-    profiles_path="backend/data/user_profiles.json",
-    game_data_path="backend/data/real_data.json", 
-    output_path="backend/data/synthetic_data.json",
-    messages_per_user=5,
-    synthetic_rounds=5
-)
-print("Synthetic data created")
-
-# Step 5: Sentiment analysis (currently commented out)
-# from backend.sentiment_classifier import add_sentiment_to_talktagger_data
-# enhanced_profiles = add_sentiment_to_talktagger_data(
-#     profiles_path="backend/data/user_profiles.json",
-#     game_data_path="backend/data/real_data.json",
-#     synthetic_data_path="backend/data/synthetic_data.json",
-#     output_profiles_path="backend/data/user_profiles_with_sentiment.json",
-#     output_game_data_path="backend/data/game_data_with_sentiment.json", 
-#     output_synthetic_data_path="backend/data/synthetic_data_with_sentiment.json",
-# )
-
-# Step 6: Generate superlatives
-from backend.superlatives import main as generate_ending_superlatives
-
-try:
-    generate_ending_superlatives()
-    print("Superlatives generated successfully")
-except Exception as e:
-    print(f"Error generating superlatives: {e}")
-
-# Pipeline Complete
-print("\n" + "="*60)
-print("TALKTAGGER PIPELINE COMPLETE!")
-print("="*60)
\ No newline at end of file
+    # get upload_tag from environment variable (set by backend)
+    # by default set to 'dc'
+    run_pipeline(os.environ.get("UPLOAD_TAG", "dc"))
@@ -55,6 +55,9 @@ class GameState:
             "completed": False
         }
         self.game_data = {}  # will hold the loaded real_data.json
+        self.synthetic_pool = None  # fresh synthetic messages for new games (backend/synthetic_pool.py)
+        self.pool_worker = None  # background thread keeping the pool topped up
+        self.pipeline_worker = None  # warm process running the pipeline for uploads (backend/pipeline_worker.py)
 
     def reset_pipeline_status(self):
         """Reset pipeline status for new upload"""
@@ -92,11 +95,16 @@ CONVOS_BEFORE_DIR = BACKEND_DIR / 'convos_before'
 CONVOS_AFTER_DIR = BACKEND_DIR / 'convos_after'
 UPLOAD_TEMP_DIR = BASE_DIR / 'temp_uploads'
 FINAL_PY_PATH = ROOT_DIR / 'final.py'  # final.py is in the root directory
+# run uploads in a warm pipeline worker process (models loaded once) instead of a new final.py each time
+USE_PIPELINE_WORKER = os.environ.get("TALKTAGGER_PIPELINE_WORKER", "1") == "1"
 
 
 for directory in [DATA_DIR, CONVOS_BEFORE_DIR, CONVOS_AFTER_DIR, UPLOAD_TEMP_DIR]: # ensure directories exist
     directory.mkdir(parents=True, exist_ok=True)
 
+if str(ROOT_DIR) not in sys.path: # backend package (synthetic pool)
+    sys.path.insert(0, str(ROOT_DIR))
+
 def get_available_ips():
     """Get available IP addresses for network access"""
     ips = []
@@ -129,12 +137,32 @@ def load_existing_game_data():
                 game_state.pipeline_status["message"] = "Data ready for game creation"
     except Exception as e:
         print(f"[WARNING] Warning: Could not load existing data: {e}")
+    load_synthetic_pool()
+
+def load_synthetic_pool():
+    """Open the current dataset's synthetic pool and (re)start its background top-up"""
+    if game_state.pool_worker is not None:
+        game_state.pool_worker.stop()
+    game_state.synthetic_pool, game_state.pool_worker = None, None
+    try:
+        from backend.message_generator import start_synthetic_pool
+        game_state.synthetic_pool, game_state.pool_worker = start_synthetic_pool(str(DATA_DIR))
+    except Exception as e:
+        print(f"[WARNING] Synthetic pool unavailable, games replay the pipeline's synthetic rounds: {e}")
 
 def create_game_questions():
     """Return a tuple of (real_questions, generated_questions) from game_data.json."""
     all_questions = game_state.game_data.get('game_rounds', [])
     real_questions = [q for q in all_questions if not q.get('is_synthetic', False)]
     generated_questions = [q for q in all_questions if q.get('is_synthetic', False)]
+    pool = game_state.synthetic_pool
+    if pool is not None: # fresh, never-shown synthetic rounds; the pipeline's rounds fill any shortfall
+        fresh_questions = pool.draw_saved_rounds(len(generated_questions) or 5)
+        fresh_messages = {q['message'] for q in fresh_questions}
+        fallback = [q for q in generated_questions if q['message'] not in fresh_messages]
+        generated_questions = [dict(q, round=number) for number, q in enumerate(
+            fresh_questions + fallback[:max(0, len(generated_questions) - len(fresh_questions))], 1)]
+        game_state.pool_worker.wake.set()
     return real_questions, generated_questions
 
 def run_talktagger_pipeline(upload_path, platform_type="dc"):
@@ -156,20 +184,25 @@ def run_talktagger_pipeline(upload_path, platform_type="dc"):
             shutil.copy2(upload_path, CONVOS_BEFORE_DIR / filename)
         game_state.update_pipeline_status(30, f"Configuring pipeline for {platform_type}...")
         game_state.update_pipeline_status(40, "Running TalkTagger pipeline...") # no longer modify final.py; pass platform as env var
-        print("[RUN] Executing final.py...")
-        env = os.environ.copy()
-        env["UPLOAD_TAG"] = platform_type
-        result = subprocess.run(
-            [sys.executable, str(FINAL_PY_PATH)], 
-            cwd=ROOT_DIR,
-            text=True, 
-            timeout=300,
-            env=env
-        )
-        if result.returncode != 0:
-            error_msg = f"Pipeline failed: {result.stderr}"
-            print(f"[ERROR] {error_msg}")
-            raise Exception(error_msg)
+        if game_state.pipeline_worker is not None:
+            print("[RUN] Running pipeline in the warm worker...")
+            seconds = game_state.pipeline_worker.run(platform_type)
+            print(f"[OK] Pipeline job took {seconds:.1f}s")
+        else:
+            print("[RUN] Executing final.py...")
+            env = os.environ.copy()
+            env["UPLOAD_TAG"] = platform_type
+            result = subprocess.run(
+                [sys.executable, str(FINAL_PY_PATH)], 
+                cwd=ROOT_DIR,
+                text=True, 
+                timeout=300,
+                env=env
+            )
+            if result.returncode != 0:
+                error_msg = f"Pipeline failed: {result.stderr}"
+                print(f"[ERROR] {error_msg}")
+                raise Exception(error_msg)
         game_state.update_pipeline_status(80, "Loading processed data...")
         load_existing_game_data()
         game_state.update_pipeline_status(90, "Validating data...")
@@ -177,7 +210,7 @@ def run_talktagger_pipeline(upload_path, platform_type="dc"):
             raise Exception("Pipeline completed but data validation failed")
         game_state.update_pipeline_status(100, "Pipeline completed successfully!", completed=True)
         print("[OK] TalkTagger pipeline completed successfully!")
-    except subprocess.TimeoutExpired:
+    except (subprocess.TimeoutExpired, TimeoutError):
         error_msg = "Pipeline timed out after 5 minutes"
         print(f"[ERROR] {error_msg}")
         game_state.update_pipeline_status(0, error_msg, error=error_msg)
@@ -1139,6 +1172,11 @@ if __name__ == '__main__':
     # Load existing data
     load_existing_game_data()
     
+    # Start the pipeline worker now so its models are loaded before the first upload
+    if USE_PIPELINE_WORKER:
+        from backend.pipeline_worker import PipelineWorker
+        game_state.pipeline_worker = PipelineWorker(str(ROOT_DIR)).start()
+    
     # Start cleanup task
     start_cleanup_task()
     
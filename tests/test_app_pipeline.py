@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("flask_socketio")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend"))
+import app as server
+
+
+class FakePipelineWorker:
+    """Stands in for PipelineWorker: writes the game data a pipeline run leaves, or raises `error`."""
+
+    def __init__(self, game_data_path, error=None):
+        self.game_data_path = game_data_path
+        self.error = error
+        self.upload_tags = []
+
+    def run(self, upload_tag="dc"):
+        self.upload_tags.append(upload_tag)
+        if self.error is not None:
+            raise self.error
+        with open(self.game_data_path, "w", encoding="utf-8") as f:
+            json.dump({"game_rounds": [{"round": 1, "message": "hi", "correct_answer": "a"}]}, f)
+        return 0.5
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch):
+    for name in ("convos_before", "data"):
+        (tmp_path / name).mkdir()
+    monkeypatch.setattr(server, "CONVOS_BEFORE_DIR", tmp_path / "convos_before")
+    monkeypatch.setattr(server, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(server, "GAME_DATA_PATH", tmp_path / "data" / "game_data.json")
+    monkeypatch.setattr(server, "game_state", server.GameState())
+    path = tmp_path / "chat.txt"
+    path.write_text("[01-Jan-25 10:00 AM] a\nhi\n", encoding="utf-8")
+    return path
+
+
+def test_upload_runs_in_the_pipeline_worker(tmp_path, upload):
+    worker = FakePipelineWorker(server.GAME_DATA_PATH)
+    server.game_state.pipeline_worker = worker
+    server.run_talktagger_pipeline(str(upload), "dc")
+
+    assert worker.upload_tags == ["dc"]
+    assert (tmp_path / "convos_before" / "chat.txt").exists()
+    assert not upload.exists()
+    status = server.game_state.pipeline_status
+    assert status["completed"] and status["error"] is None and not status["running"]
+    assert server.game_state.game_data["game_rounds"]
+
+
+@pytest.mark.parametrize("error, message", [
+    (TimeoutError("Pipeline timed out after 300 seconds"), "Pipeline timed out"),
+    (RuntimeError("Pipeline worker crashed (exit code -9)"), "Pipeline failed: Pipeline worker crashed"),
+])
+def test_worker_failures_are_reported(upload, error, message):
+    server.game_state.pipeline_worker = FakePipelineWorker(server.GAME_DATA_PATH, error)
+    server.run_talktagger_pipeline(str(upload), "dc")
+
+    status = server.game_state.pipeline_status
+    assert status["error"].startswith(message)
+    assert not status["completed"] and not status["running"]
@@ -0,0 +1,136 @@
+import multiprocessing
+
+import numpy as np
+
+from backend import bert_similarity
+from backend.bert_similarity import EmbeddingCache
+
+
+def vectors(*values):
+    return np.array([[value] * 4 for value in values], dtype=np.float32)
+
+
+def test_reput_key_then_insert_new_key(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float32")
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    cache.put_many(["b"], vectors(20))
+    cache.put_many(["d"], vectors(4))
+
+    rows = [row for row, _ in cache.entries.values()]
+    assert len(rows) == len(set(rows))
+    found = cache.get_many(["a", "b", "c", "d"])
+    assert {key: float(found[key][0]) for key in found} == {"a": 1, "b": 20, "c": 3, "d": 4}
+
+    # the same after reopening from disk
+    reopened = EmbeddingCache(str(tmp_path), dtype="float32")
+    assert float(reopened.get_many(["b"])["b"][0]) == 20
+    reopened.put_many(["e"], vectors(5))
+    assert float(reopened.get_many(["d"])["d"][0]) == 4
+
+
+def test_duplicate_keys_in_one_batch_get_one_row(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float32")
+    cache.put_many(["a", "b", "a"], vectors(1, 2, 3))
+    cache.put_many(["c"], vectors(4))
+
+    assert len(cache.entries) == 3
+    assert cache.next_row == 3
+    found = cache.get_many(["a", "b", "c"])
+    assert {key: float(found[key][0]) for key in found} == {"a": 3, "b": 2, "c": 4}
+
+
+def test_eviction_reuses_rows_of_least_recently_used_keys(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float32", max_rows=3)
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    cache.get_many(["a"])
+    cache.put_many(["d"], vectors(4))
+
+    assert set(cache.entries) == {"a", "c", "d"}
+    found = cache.get_many(["a", "c", "d"])
+    assert {key: float(found[key][0]) for key in found} == {"a": 1, "c": 3, "d": 4}
+
+
+def test_two_open_caches_keep_each_others_writes(tmp_path):
+    # e.g. the game server's cache and the pipeline worker's, both opened before either writes
+    server = EmbeddingCache(str(tmp_path), dtype="float32")
+    worker = EmbeddingCache(str(tmp_path), dtype="float32")
+    server.put_many(["a", "b"], vectors(1, 2))
+    worker.put_many(["c"], vectors(3))
+    server.put_many(["d"], vectors(4))
+
+    for cache in (server, worker, EmbeddingCache(str(tmp_path), dtype="float32")):
+        found = cache.get_many(["a", "b", "c", "d"])
+        assert {key: float(found[key][0]) for key in found} == {"a": 1, "b": 2, "c": 3, "d": 4}
+
+
+OFFSETS = {"x": 1000, "y": 2000}
+
+
+def write_batches(cache_dir: str, prefix: str, batches: int):
+    cache = EmbeddingCache(cache_dir, dtype="float32")
+    for i in range(batches):
+        # the other writer stores the shared keys too, with the same vectors
+        cache.put_many([f"{prefix}{i}", f"shared{i}"], vectors(OFFSETS[prefix] + i, -i))
+
+
+def test_two_writer_processes(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=write_batches, args=(str(tmp_path), prefix, 100)) for prefix in ("x", "y")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), dtype="float32")
+    assert len(cache) == 300
+    rows = [row for row, _ in cache.entries.values()]
+    assert len(rows) == len(set(rows))
+    for prefix in ("x", "y"):
+        found = cache.get_many([f"{prefix}{i}" for i in range(100)])
+        assert [float(found[f"{prefix}{i}"][0]) for i in range(100)] == [OFFSETS[prefix] + i for i in range(100)]
+    found = cache.get_many([f"shared{i}" for i in range(100)])
+    assert [float(found[f"shared{i}"][0]) for i in range(100)] == [-i for i in range(100)]
+
+
+def test_empty_batch_does_not_load_the_model(tmp_path, monkeypatch):
+    def load_model(backend=None):
+        raise AssertionError("model loaded")
+
+    monkeypatch.setattr(bert_similarity, "load_model", load_model)
+    monkeypatch.setattr(bert_similarity, "_model", None)
+    monkeypatch.setattr(bert_similarity, "_embedding_cache", None)
+    monkeypatch.setattr(bert_similarity, "EMBEDDING_CACHE_DIR", "")
+    monkeypatch.setattr(bert_similarity, "MODEL_NAME", "all-MiniLM-L6-v2")
+    assert bert_similarity.encode_many([]).shape == (0, 384)
+
+    # an unknown model: the width comes from the cache header
+    cache = EmbeddingCache(str(tmp_path), dtype="float32")
+    cache.put_many(["a"], vectors(1))
+    monkeypatch.setattr(bert_similarity, "MODEL_NAME", "/models/custom")
+    monkeypatch.setattr(bert_similarity, "_embedding_cache", EmbeddingCache(str(tmp_path), dtype="float32"))
+    assert bert_similarity.encode_many([]).shape == (0, 4)
+
+
+def test_recency_of_hits_survives_a_restart(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float32", max_rows=3)
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    cache.get_many(["a"])
+    cache.save_usage()
+
+    restarted = EmbeddingCache(str(tmp_path), dtype="float32", max_rows=3)
+    restarted.put_many(["d"], vectors(4))
+
+    assert sorted(restarted.get_many(["a", "b", "c", "d"])) == ["a", "c", "d"]
+
+
+def test_hits_are_saved_with_the_next_write_after_another_process_wrote(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float32", max_rows=4)
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    cache.get_many(["a"])
+    EmbeddingCache(str(tmp_path), dtype="float32", max_rows=4).put_many(["d"], vectors(4))
+
+    cache.put_many(["e"], vectors(5))
+
+    assert sorted(EmbeddingCache(str(tmp_path), dtype="float32", max_rows=4).get_many(list("abcde"))) == \
+        ["a", "c", "d", "e"]
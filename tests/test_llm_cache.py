@@ -0,0 +1,61 @@
+import os
+
+from backend.llm_cache import ResponseCache
+
+
+def request(i):
+    return {"model": "m", "prompt": f"prompt {i}"}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=10)
+    for i in range(10):
+        cache.put(request(i), f"response {i}")
+        os.utime(cache._path(cache.key(request(i))), (i, i))
+    cache.get(request(0))
+
+    cache.put(request(10), "response 10")
+
+    assert len(os.listdir(tmp_path)) == 9
+    assert cache.get(request(0)) == "response 0"
+    assert cache.get(request(1)) is None and cache.get(request(2)) is None
+    assert cache.get(request(10)) == "response 10"
+
+
+def test_directory_is_listed_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_entries=10)
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+
+    for _ in range(3):
+        for i in range(10):
+            cache.put(request(i), f"response {i}")
+    assert scans == []
+
+    cache.put(request(10), "response 10")
+    assert len(scans) == 1
+
+
+def test_entries_removed_by_another_process_are_skipped(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), max_entries=10)
+    for i in range(10):
+        cache.put(request(i), f"response {i}")
+    # Another process evicts an entry while this one lists the directory or reads the entry
+    scandir, utime = os.scandir, os.utime
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(entries[0].path)
+        return entries
+
+    def racing_utime(path, *args):
+        os.remove(path)
+        utime(path, *args)
+
+    monkeypatch.setattr(os, "scandir", racing_scandir)
+    cache.put(request(10), "response 10")
+    monkeypatch.setattr(os, "utime", racing_utime)
+
+    assert cache.get(request(10)) == "response 10"
+    assert len(os.listdir(tmp_path)) <= 9
@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+import backend.message_selector
+from backend.message_selector import GameMessageSelector
+from backend.near_duplicates import NearDuplicateIndex, build_near_duplicate_index
+
+
+def test_suitable_messages_skip_excluded_clusters():
+    messages = ["see you at the station", "see you at the station!", "pizza again tonight?", "new album is great"]
+    index = build_near_duplicate_index(messages)
+    taken = {index.cluster_id(messages[0]) or NearDuplicateIndex.key(messages[0])}
+
+    suitable = list(GameMessageSelector().iter_suitable_messages(messages, index, excluded_clusters=taken))
+
+    assert suitable == ["pizza again tonight?", "new album is great"]
+
+
+def test_suitable_messages_keep_first_of_each_cluster():
+    messages = ["see you at the station", "see you at the station!", "pizza again tonight?"]
+    index = build_near_duplicate_index(messages)
+
+    suitable = list(GameMessageSelector().iter_suitable_messages(messages, index))
+
+    assert suitable == ["see you at the station", "pizza again tonight?"]
+
+
+def test_cluster_id_does_not_depend_on_insertion_order():
+    messages = ["see you at the station tonight", "see you at the station tonite", "see you all at the station tonight",
+                "pizza again tonight?"]
+    keys = sorted(NearDuplicateIndex.key(msg) for msg in messages[:3])
+
+    for order in ([0, 1, 2, 3], [2, 1, 0, 3], [3, 1, 2, 0]):
+        index = build_near_duplicate_index([messages[i] for i in order])
+        assert {index.cluster_id(msg) for msg in messages[:3]} == {keys[0]}
+
+
+def fake_encode(texts, **kwargs):
+    """Deterministic stand-in embeddings (no model needed)."""
+    return np.array([np.random.default_rng(sum(map(ord, text))).normal(size=8) for text in texts], dtype=np.float32)
+
+
+@pytest.mark.parametrize("selection_mode", ["overlap", "mmr"])
+def test_pick_from_worker_ranking_matches_selection_with_exclusions(monkeypatch, selection_mode):
+    monkeypatch.setattr(backend.message_selector, "encode_many", fake_encode)
+    monkeypatch.setattr(backend.message_selector, "estimate_profile_centroid",
+                        lambda messages: (fake_encode(messages).mean(axis=0), len(messages)))
+    rng = random.Random(0)
+    words = ["pizza", "station", "album", "tonight", "really", "honestly", "lmao", "weekend", "train", "coffee"]
+    messages = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 7))) + "!" * (i % 3) for i in range(120)]
+    profiles = {"ann": {"message_count": len(messages), "avg_message_length_words": 4,
+                        "signature_words": [{"word": "pizza"}, {"word": "lmao"}], "signature_phrases": [],
+                        "most_common_words": [{"word": "really"}]}}
+    index = build_near_duplicate_index(messages)
+    job = dict(user="ann", user_messages=messages, profiles=profiles, messages_per_user=5,
+               selection_mode=selection_mode, dedup_index=index)
+
+    def cluster_of(msg):
+        return index.cluster_id(msg) or NearDuplicateIndex.key(msg)
+
+    selector = GameMessageSelector()
+    ranked = selector.rank_user_candidates(**job)
+    first_picks = {cluster_of(item['message']) for item in selector.select_user_messages(**job)[0]}
+    for excluded in (set(), set(list(first_picks)[:2]), first_picks):
+        expected = selector.select_user_messages(**job, excluded_clusters=excluded)
+        assert selector.finish_user_selection(ranked, excluded, cluster_of, 5, selection_mode) == expected
@@ -0,0 +1,24 @@
+import json
+
+from backend.message_generator import ImprovedMistralMessageGenerator
+
+
+def parse(response, users):
+    return ImprovedMistralMessageGenerator(backend="ngram", use_response_cache=False).parse_multi_user_response(
+        response, users)
+
+
+def test_response_cut_off_inside_a_list_keeps_complete_messages():
+    complete = json.dumps({"ann": ["see you at the station", "pizza again?"],
+                           "bob": ["new album is great", "lol no", "back at 5"]}, indent=2)
+    cut = complete[:complete.index("back at")]
+
+    assert parse(cut, ["ann", "bob"]) == {"ann": ["see you at the station", "pizza again?"],
+                                          "bob": ["new album is great", "lol no"]}
+
+
+def test_response_cut_off_after_the_last_complete_line():
+    # call_mistral_api drops the unfinished last line of a cut-off response
+    response = '```json\n{\n  "ann": [\n    "see you at the station",\n    "pizza again?",'
+
+    assert parse(response, ["ann", "bob"]) == {"ann": ["see you at the station", "pizza again?"]}
@@ -0,0 +1,51 @@
+import numpy as np
+
+import backend.message_generator
+from backend.message_generator import ImprovedMistralMessageGenerator
+
+
+class ScriptedGenerator(ImprovedMistralMessageGenerator):
+    """Generator whose calls return `replies[user]` in turn (None = failed call); a message's score is its first word."""
+
+    def __init__(self, replies):
+        super().__init__(backend="ngram", use_response_cache=False, seed=1)
+        self.replies = replies
+        self.requested = {user: [] for user in replies}
+
+    def generate_round(self, requests_by_user, count=5):
+        generated = {}
+        for user, request in requests_by_user.items():
+            self.requested[user].append(request['count'])
+            generated[user] = self.replies[user].pop(0)
+        return generated, {}
+
+    def score_message_list(self, user, profile, generated_messages):
+        return [{'message': msg, 'distinctiveness_score': float(msg.split()[0]), 'is_synthetic': True}
+                for msg in generated_messages]
+
+
+def generate(generator, monkeypatch):
+    monkeypatch.setattr(backend.message_generator, "encode_many", lambda texts: np.ones((len(texts), 4)))
+    profiles = {user: {'sample_messages': [f"{user} says hi"]} for user in generator.replies}
+    return generator.generate_all_synthetic_messages(profiles, {}, 2)
+
+
+def test_quality_loop_is_off_by_default(monkeypatch):
+    generator = ScriptedGenerator({"ann": [["0 meh", "3 great"]]})
+
+    kept = generate(generator, monkeypatch)
+
+    assert [msg['message'] for msg in kept["ann"]] == ["0 meh", "3 great"]
+    assert generator.requested["ann"] == [2]
+
+
+def test_failed_calls_are_not_quality_retries(monkeypatch):
+    generator = ScriptedGenerator({"ann": [["3 great", "0 meh"], ["3 again"]], "bob": [None], "cy": [[]]})
+    generator.min_score = 1.0
+    generator.max_calls_per_user = 3
+
+    kept = generate(generator, monkeypatch)
+
+    assert [msg['message'] for msg in kept["ann"]] == ["3 great", "3 again"]
+    assert generator.requested == {"ann": [2, 1], "bob": [2], "cy": [2]}
+    assert kept["bob"] == [] and kept["cy"] == []
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from backend.llm_cache import ResponseCache
+from backend.message_generator import ImprovedMistralMessageGenerator
+from mistral_stub_server import StubMistralServer, stub_completion
+
+PROMPT = "Generate 5 text messages in ann's style.\n- Typical length: 8 words"
+
+
+@pytest.fixture
+def generator(tmp_path):
+    with StubMistralServer(latency=0, follow_length=True) as server:
+        generator = ImprovedMistralMessageGenerator(api_key="stub", api_url=server.url, requests_per_second=1000,
+                                                    use_response_cache=False, backend="mistral", stream=True)
+        generator.response_cache = ResponseCache(str(tmp_path))
+        yield generator
+
+
+def test_stream_cut_off_at_max_tokens_drops_unfinished_message(generator, tmp_path):
+    complete = generator.parse_batch_response(stub_completion(PROMPT, follow_length=True))
+    emitted = []
+
+    response = generator.call_mistral_api_streaming(PROMPT, emitted.append, max_tokens=40)
+
+    assert 0 < len(emitted) < len(complete)
+    assert emitted == complete[:len(emitted)]
+    assert generator.parse_batch_response(response) == emitted
+    assert generator.token_usage.summary()["truncated"] == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_complete_stream_is_emitted_and_cached(generator, tmp_path):
+    emitted = []
+
+    generator.call_mistral_api_streaming(PROMPT, emitted.append, max_tokens=400)
+
+    assert emitted == generator.parse_batch_response(stub_completion(PROMPT, follow_length=True))
+    assert generator.token_usage.summary()["truncated"] == 0
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_cut_off_response_is_not_served_from_the_cache(generator, tmp_path):
+    generator.stream = False
+
+    first = generator.call_mistral_api(PROMPT, max_tokens=40)
+    second = generator.call_mistral_api(PROMPT, max_tokens=40)
+
+    assert first == second
+    assert generator.response_cache.stats() == {"hits": 0, "misses": 2}
+    assert generator.token_usage.summary()["truncated"] == 2
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,58 @@
+from backend.synthetic_pool import SyntheticPool
+
+
+def scored(*messages):
+    return [{'message': msg, 'distinctiveness_score': 1.0} for msg in messages]
+
+
+def fresh_messages(pool):
+    return {user: [msg_data['message'] for msg_data in messages] for user, messages in pool.fresh.items()}
+
+
+def test_saves_from_two_copies_keep_both_changes(tmp_path):
+    seeded = SyntheticPool.open("chat", users=["ann", "bob"], pool_dir=str(tmp_path))
+    seeded.add("ann", scored("first one", "second one"))
+    seeded.save()
+    # the game server and the pipeline each hold their own copy of the same pool file
+    server = SyntheticPool.open("chat", pool_dir=str(tmp_path))
+    pipeline = SyntheticPool.open("chat", pool_dir=str(tmp_path))
+
+    drawn = server.draw()['message']
+    pipeline.add("bob", scored("from the pipeline"))
+    pipeline.save()
+    server.save()
+
+    saved = SyntheticPool.open("chat", pool_dir=str(tmp_path))
+    kept = {"first one", "second one"} - {drawn}
+    assert fresh_messages(saved) == {"ann": sorted(kept), "bob": ["from the pipeline"]}
+    assert fresh_messages(server) == fresh_messages(saved)
+    assert saved.shown == 1
+
+
+def test_message_drawn_elsewhere_is_not_added_back(tmp_path):
+    pool = SyntheticPool.open("chat", users=["ann"], pool_dir=str(tmp_path))
+    pool.add("ann", scored("only one"))
+    pool.save()
+    stale = SyntheticPool.open("chat", pool_dir=str(tmp_path))
+
+    assert pool.draw()['message'] == "only one"
+    pool.save()
+    stale.add("ann", scored("new one"))
+    stale.save()
+
+    assert fresh_messages(SyntheticPool.open("chat", pool_dir=str(tmp_path))) == {"ann": ["new one"]}
+    assert stale.draw()['message'] == "new one"
+    assert stale.draw() is None
+
+
+def test_copies_drawing_saved_rounds_never_share_a_message(tmp_path):
+    pool = SyntheticPool.open("chat", users=["ann", "bob"], pool_dir=str(tmp_path))
+    pool.add("ann", scored("one", "two", "three"))
+    pool.add("bob", scored("four", "five"))
+    pool.save()
+    copies = [SyntheticPool.open("chat", pool_dir=str(tmp_path)) for _ in range(2)]
+
+    shown = [game_round['message'] for i in range(3) for game_round in copies[i % 2].draw_saved_rounds(2)]
+
+    assert sorted(shown) == ["five", "four", "one", "three", "two"]
+    assert SyntheticPool.open("chat", pool_dir=str(tmp_path)).shown == 5